@@ -15,6 +15,67 @@ class Settings(BaseSettings):
     secret_key: str = "your-secret-key-change-this-in-production"
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 30
+    token_cache_size: int = 4096
+    # Pool running bcrypt off the event loop: "thread" or "process"
+    password_hash_executor: str = "thread"
+    password_hash_workers: int = 4
+    # Hashes allowed to wait for a worker before new ones are rejected
+    password_hash_queue_depth: int = 64
+    password_hash_retry_after_seconds: int = 1
+    # bcrypt cost; pick with `python manage.py calibrate-bcrypt`. None keeps
+    # the library default and disables rehashing on login.
+    bcrypt_rounds: Optional[int] = None
+    page_size_default: int = 100
+    page_size_max: int = 500
+    search_contains_max_time_ms: int = 2000
+    # Full-text search ranks every match in memory, so it is bounded too
+    search_text_max_time_ms: int = 2000
+    # Search result cache; 0 disables caching but keeps request coalescing
+    search_cache_size: int = 256
+    search_cache_ttl_seconds: float = 30.0
+    # Catalog version bumps are batched and written this long after a write
+    catalog_version_flush_ms: int = 50
+    # How long a worker reuses the version it read, and the window after
+    # which every version (and so every ETag) changes; the window bounds
+    # how long a bump lost in a crashed worker can leave clients stale
+    catalog_version_refresh_ms: int = 250
+    catalog_version_max_age_seconds: int = 60
+    # Live inventory feed: sweets with unsent changes before a client is
+    # dropped as too slow, and idle time between keep-alives
+    feed_max_pending: int = 256
+    feed_heartbeat_seconds: float = 15.0
+    # Collect concurrent purchases of the same sweet for this long and
+    # apply them as one write (0 disables coalescing)
+    purchase_coalesce_window_ms: int = 0
+    purchase_coalesce_max_batch: int = 256
+    # Idempotency-Key records: how long retries are recognised, how long a
+    # duplicate waits for the original, and when an unfinished original is
+    # considered abandoned (e.g. its worker crashed)
+    idempotency_ttl_seconds: int = 24 * 60 * 60
+    idempotency_wait_seconds: float = 10.0
+    idempotency_lease_seconds: float = 60.0
+    # Without transactions, a batch order unfinished after this long is
+    # considered abandoned and rolled back (checked at the same interval)
+    purchase_order_lease_seconds: float = 60.0
+    # Sweets with at most this many units count as low stock in analytics
+    low_stock_threshold: int = 10
+    # Interval of the full recompute correcting drift in the analytics rollups
+    analytics_reconcile_seconds: float = 300.0
+    # Lease held by a reconciliation, so a crashed worker cannot block it forever
+    analytics_reconcile_lease_seconds: float = 120.0
+    # A reconciliation only corrects categories unchanged for this long; it
+    # must exceed analytics_flush_ms so other workers' batches have landed
+    analytics_reconcile_settle_ms: int = 1000
+    # Rollup changes are batched and written this long after a write
+    analytics_flush_ms: int = 50
+    # Cached users; the TTL bounds how long a change made outside this
+    # worker's User hooks (other workers, bulk or raw writes) goes unseen,
+    # e.g. a disabled user keeping access
+    user_cache_size: int = 1024
+    user_cache_ttl_seconds: float = 15.0
+    # Trust signed token claims instead of loading the user on every request
+    auth_stateless: bool = False
+    revocation_refresh_seconds: float = 30.0
     
     class Config:
         env_file = ".env"
@@ -34,16 +95,24 @@ async def connect_to_mongo():
     # Import models here to avoid circular imports
     from app.models.user import User
     from app.models.sweet import Sweet
+    from app.models.idempotency import IdempotencyRecord
     
     mongo_client = AsyncIOMotorClient(settings.mongodb_url)
     database = mongo_client[settings.database_name]
     
+    # init_beanie also ensures the indexes declared on each model
     await init_beanie(
         database=database,
-        document_models=[User, Sweet]
+        document_models=[User, Sweet, IdempotencyRecord]
     )
     
+    # Fill normalized search fields on documents written before they existed
+    from app.services.sweets_service import backfill_search_fields
+    await backfill_search_fields()
+    
     print(f"Connected to MongoDB: {settings.database_name}")
+    index_names = sorted(await Sweet.get_motor_collection().index_information())
+    print(f"Sweet indexes: {', '.join(index_names)}")
 
 
 async def close_mongo_connection():
@@ -1,11 +1,16 @@
 """
 Main FastAPI application for Sweet Shop Management System.
 """
+import asyncio
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
-from app.config.database import connect_to_mongo, close_mongo_connection
-from app.routers import auth, sweets
+from app.config.database import connect_to_mongo, close_mongo_connection, settings
+from app.routers import admin, auth, sweets
+from app.services.analytics_service import rollup_buffer, run_reconciler
+from app.services.catalog_service import catalog_changed, catalog_version
+from app.services.sweets_service import run_order_recovery
+from app.utils.password import shutdown_password_executor
 
 
 @asynccontextmanager
@@ -13,9 +18,21 @@ async def lifespan(app: FastAPI):
     """Application lifespan manager."""
     # Startup
     await connect_to_mongo()
+    # A worker that crashed may have lost unflushed bumps; bumping here
+    # keeps clients from holding data it wrote under an old ETag
+    catalog_changed()
+    await catalog_version.sync()
+    reconciler = asyncio.create_task(run_reconciler(settings.analytics_reconcile_seconds))
+    order_recovery = asyncio.create_task(run_order_recovery(settings.purchase_order_lease_seconds))
     yield
     # Shutdown
+    reconciler.cancel()
+    order_recovery.cancel()
+    # Write batched counters before the connection goes away
+    await catalog_version.sync()
+    await rollup_buffer.sync()
     await close_mongo_connection()
+    shutdown_password_executor()
 
 
 # Create FastAPI application
@@ -33,11 +50,13 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Total-Count", "ETag", "Idempotent-Replayed"],
 )
 
 # Include routers
 app.include_router(auth.router)
 app.include_router(sweets.router)
+app.include_router(admin.router)
 
 
 @app.get("/")
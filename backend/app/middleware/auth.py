@@ -1,20 +1,26 @@
 """
 Authentication middleware for protecting routes.
 """
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Query, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from typing import Optional
+from typing import Optional, Union
+from app.config.database import settings
 from app.models.user import User
+from app.schemas.user import TokenData
 from app.utils.jwt import decode_access_token
 from app.services.auth_service import get_user_by_email
+from app.services.revocation_service import revocation_list
 
 # HTTP Bearer token scheme
 security = HTTPBearer()
 
+# Same scheme for routes that can also take the token from the query string
+optional_security = HTTPBearer(auto_error=False)
+
 
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security)
-) -> User:
+) -> Union[User, TokenData]:
     """
     Get current authenticated user from JWT token.
     
@@ -25,10 +31,62 @@ async def get_current_user(
         Current user
         
     Raises:
-        HTTPException: If token is invalid or user not found
+        HTTPException: If token is invalid, revoked or user not found
+    """
+    return await authenticate_token(credentials.credentials)
+
+
+async def get_stream_user(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security),
+    access_token: Optional[str] = Query(None)
+) -> Union[User, TokenData]:
     """
-    token = credentials.credentials
+    Get current authenticated user for an event stream.
     
+    Browsers' EventSource cannot set an Authorization header, so the token
+    may be passed as the ``access_token`` query parameter instead. Query
+    strings tend to end up in access logs, so use this only on routes that
+    need it.
+    
+    Args:
+        credentials: HTTP Authorization credentials, if sent
+        access_token: Token from the query string, if sent
+        
+    Returns:
+        Current user
+        
+    Raises:
+        HTTPException: If no token was sent, or it is invalid, revoked or
+            its user not found
+    """
+    if credentials is not None:
+        return await authenticate_token(credentials.credentials)
+    if access_token is None:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authenticated"
+        )
+    return await authenticate_token(access_token)
+
+
+async def authenticate_token(token: str) -> Union[User, TokenData]:
+    """
+    Get the user an access token was issued to.
+    
+    In stateless mode (``AUTH_STATELESS=true``) the signed ``sub`` and
+    ``role`` claims are trusted and only checked against the in-memory
+    revocation list, so no database lookup is made; the user is then
+    returned as TokenData rather than a User document.
+    
+    Args:
+        token: Encoded JWT
+        
+    Returns:
+        Token's user
+        
+    Raises:
+        HTTPException: If token is invalid, revoked or user not found
+    """
     # Decode token
     payload = decode_access_token(token)
     if payload is None:
@@ -47,9 +105,23 @@ async def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    if settings.auth_stateless:
+        await revocation_list.ensure_fresh()
+        if revocation_list.is_revoked(email):
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Token has been revoked",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        role = payload.get("role", "user")
+        # Ignore admin claims from users who have since been demoted
+        if role == "admin" and not revocation_list.is_admin(email):
+            role = "user"
+        return TokenData(email=email, role=role)
+    
     # Get user from database
     user = await get_user_by_email(email)
-    if user is None:
+    if user is None or not user.is_active:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User not found",
@@ -60,8 +132,8 @@ async def get_current_user(
 
 
 async def get_current_admin(
-    current_user: User = Depends(get_current_user)
-) -> User:
+    current_user: Union[User, TokenData] = Depends(get_current_user)
+) -> Union[User, TokenData]:
     """
     Verify that current user is an admin.
     
@@ -0,0 +1,32 @@
+"""
+Idempotency record model for MongoDB using Beanie ODM.
+"""
+from beanie import Document
+from pydantic import Field
+from pymongo import ASCENDING, IndexModel
+from datetime import datetime
+from typing import Optional
+from app.config.database import settings
+
+
+class IdempotencyRecord(Document):
+    """Outcome of a request sent with an Idempotency-Key header."""
+    
+    key: str  # "<user email>:<client key>", so users cannot replay each other's keys
+    fingerprint: str  # Hash of the operation and its payload
+    status_code: Optional[int] = None  # None while the original request is in flight
+    body: Optional[bytes] = None  # Encoded response body
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    
+    class Settings:
+        name = "idempotency_keys"
+        indexes = [
+            # Claiming a key is an insert, so concurrent duplicates cannot both win
+            IndexModel([("key", ASCENDING)], name="key", unique=True),
+            # MongoDB removes records once clients can no longer retry them
+            IndexModel(
+                [("created_at", ASCENDING)],
+                name="created_at_ttl",
+                expireAfterSeconds=settings.idempotency_ttl_seconds
+            ),
+        ]
@@ -2,11 +2,17 @@
 Sweet document model for MongoDB using Beanie ODM.
 """
 from beanie import Document
-from pydantic import Field
+from pydantic import Field, model_validator
+from pymongo import ASCENDING, TEXT, IndexModel
 from datetime import datetime
 from typing import Optional
 
 
+def normalize_search_text(value: Optional[str]) -> Optional[str]:
+    """Normalize text for the indexed case-insensitive search fields."""
+    return value.strip().lower() if value is not None else None
+
+
 class Sweet(Document):
     """Sweet document model."""
     
@@ -18,9 +24,48 @@ class Sweet(Document):
     image_url: Optional[str] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
+    version: int = Field(default=0, ge=0)  # Bumped on every write, used for If-Match
+    # Lowercased copies of name/category so prefix and exact searches can use an index
+    name_lower: Optional[str] = None
+    category_lower: Optional[str] = None
     
     class Settings:
         name = "sweets"
+        # Created by init_beanie on startup; background builds avoid
+        # blocking the collection on servers older than MongoDB 4.2
+        indexes = [
+            # Pages are sorted by _id, so it follows the equality fields:
+            # an exact match then walks the index in page order and stops
+            # after one page instead of sorting every match in memory
+            IndexModel(
+                [("name_lower", ASCENDING), ("_id", ASCENDING)],
+                name="name_lower_id",
+                background=True
+            ),
+            # Equality, sort, range: also serves category-only queries
+            IndexModel(
+                [("category_lower", ASCENDING), ("_id", ASCENDING), ("price", ASCENDING)],
+                name="category_lower_id_price",
+                background=True
+            ),
+            IndexModel([("price", ASCENDING)], name="price", background=True),
+            IndexModel([("updated_at", ASCENDING)], name="updated_at", background=True),
+            IndexModel([("quantity", ASCENDING)], name="quantity", background=True),
+            # Full-text search, weighted towards matches in the name
+            IndexModel(
+                [("name", TEXT), ("category", TEXT), ("description", TEXT)],
+                name="sweet_text",
+                weights={"name": 10, "category": 5, "description": 1},
+                background=True
+            ),
+        ]
+    
+    @model_validator(mode="after")
+    def fill_search_fields(self) -> "Sweet":
+        """Keep the normalized search fields in sync with name and category."""
+        self.name_lower = normalize_search_text(self.name)
+        self.category_lower = normalize_search_text(self.category)
+        return self
         
     class Config:
         json_schema_extra = {
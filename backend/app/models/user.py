@@ -1,7 +1,7 @@
 """
 User document model for MongoDB using Beanie ODM.
 """
-from beanie import Document, Indexed
+from beanie import Delete, Document, Indexed, Insert, Replace, Save, SaveChanges, Update, after_event
 from pydantic import EmailStr, Field
 from datetime import datetime
 from typing import Optional
@@ -14,11 +14,29 @@ class User(Document):
     password_hash: str
     name: str
     role: str = Field(default="user")  # "user" or "admin"
+    is_active: bool = Field(default=True)  # Disabled users cannot log in or use their tokens
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
     
     class Settings:
         name = "users"
+    
+    @after_event(Insert, Replace, Save, SaveChanges, Update)
+    def invalidate_cache(self) -> None:
+        """Refresh this user's authentication state after any change."""
+        # Imported here to avoid circular imports with the auth services
+        from app.services.auth_service import invalidate_cached_user
+        from app.services.revocation_service import revocation_list
+        invalidate_cached_user(self.email)
+        revocation_list.note_user_changed(self)
+    
+    @after_event(Delete)
+    def revoke_deleted(self) -> None:
+        """Reject this user's outstanding tokens after deletion."""
+        from app.services.auth_service import invalidate_cached_user
+        from app.services.revocation_service import revocation_list
+        invalidate_cached_user(self.email)
+        revocation_list.note_user_deleted(self.email)
         
     class Config:
         json_schema_extra = {
@@ -0,0 +1,60 @@
+"""
+Admin routes for operational information.
+"""
+from fastapi import APIRouter, Depends
+from app.middleware.auth import get_current_admin
+from app.models.user import User
+from app.schemas.analytics import InventoryAnalytics
+from app.services import analytics_service
+from app.services.auth_service import user_cache
+from app.services.catalog_service import catalog_version, search_cache
+from app.services.feed_service import inventory_feed
+from app.services.purchase_coalescer import purchase_coalescer
+from app.services.revocation_service import revocation_list
+from app.services.snapshot_service import catalog_snapshot
+from app.utils.jwt import token_cache
+from app.utils.password import password_admission
+
+router = APIRouter(prefix="/api/admin", tags=["Admin"])
+
+
+@router.get("/metrics")
+async def get_metrics(current_admin: User = Depends(get_current_admin)):
+    """
+    Get in-process cache and queue metrics for this worker (admin only).
+    
+    Args:
+        current_admin: Current admin user
+        
+    Returns:
+        Metrics grouped by component
+    """
+    return {
+        "user_cache": user_cache.stats(),
+        "revocation_list": revocation_list.stats(),
+        "token_cache": token_cache.stats(),
+        "password_hashing": password_admission.stats(),
+        "search_cache": search_cache.stats(),
+        "catalog_version": catalog_version.stats(),
+        "inventory_rollups": analytics_service.rollup_buffer.writer.stats(),
+        "catalog_snapshot": catalog_snapshot.stats(),
+        "inventory_feed": inventory_feed.stats(),
+        "purchase_coalescer": purchase_coalescer.stats(),
+    }
+
+
+@router.get("/analytics", response_model=InventoryAnalytics)
+async def get_inventory_analytics(current_admin: User = Depends(get_current_admin)):
+    """
+    Get stock value, units per category and low/out-of-stock counts (admin only).
+    
+    Served from per-category rollups maintained on every sweet write, so
+    the cost grows with the number of categories, not of sweets.
+    
+    Args:
+        current_admin: Current admin user
+        
+    Returns:
+        Inventory analytics
+    """
+    return await analytics_service.get_inventory_analytics()
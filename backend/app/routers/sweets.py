@@ -1,15 +1,120 @@
 """
 Sweets routes for CRUD operations and inventory management.
+
+Handlers return sweets through app.utils.serialization, which encodes them
+directly with orjson; ``response_model`` is kept for the OpenAPI schema.
+
+List and search responses carry an ETag derived from the shared catalog
+version and single sweets one derived from the sweet's own version, so
+clients can poll with If-None-Match and get an empty 304 when nothing
+changed. The default list page is served from a pre-encoded snapshot
+(app.services.snapshot_service) in the client's preferred content coding.
 """
-from fastapi import APIRouter, Depends, status
+import asyncio
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
 from typing import List, Optional
-from app.schemas.sweet import SweetCreate, SweetUpdate, SweetResponse, PurchaseRequest, RestockRequest
-from app.services import sweets_service
-from app.middleware.auth import get_current_user, get_current_admin
+from app.schemas.sweet import (
+    SweetCreate, SweetUpdate, SweetResponse, PurchaseRequest, BatchPurchaseRequest, RestockRequest,
+    ImportResult
+)
+from app.services import sweets_service, import_service, export_service, idempotency_service
+from app.services.catalog_service import get_catalog_version
+from app.services.feed_service import inventory_feed, sse_events
+from app.services.purchase_coalescer import purchase_coalescer
+from app.services.snapshot_service import catalog_snapshot, snapshot_response
+from app.middleware.auth import get_current_user, get_current_admin, get_stream_user
 from app.models.user import User
+from app.config.database import settings
+from app.utils.compression import IDENTITY, negotiate_encoding
+from app.utils.serialization import document_to_dict, sweet_to_dict, sweets_response
 
 router = APIRouter(prefix="/api/sweets", tags=["Sweets"])
 
+# Sweets are only visible to signed-in users, and clients must revalidate
+# (cheaply, via If-None-Match) before reusing a stored response
+CACHE_CONTROL = "private, no-cache"
+
+
+def parse_if_match(if_match: Optional[str]) -> Optional[int]:
+    """
+    Extract the expected sweet version from an If-Match header.
+    
+    Args:
+        if_match: Raw If-Match header value (e.g. ``"3"`` or ``W/"3"``)
+        
+    Returns:
+        Expected version, or None if no precondition was sent
+        
+    Raises:
+        HTTPException: If the header does not carry a version number
+    """
+    if if_match is None or if_match.strip() == "*":
+        return None
+    
+    value = if_match.strip()
+    if value.startswith("W/"):
+        value = value[2:]
+    try:
+        return int(value.strip('"'))
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED,
+            detail="Invalid If-Match header"
+        )
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Check an If-None-Match header against the current ETag.
+    
+    Args:
+        if_none_match: Raw If-None-Match header value, possibly a list
+        etag: Current ETag of the resource
+        
+    Returns:
+        True if the client's copy is current
+    """
+    if if_none_match is None:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == "*" or candidate == etag:
+            return True
+    return False
+
+
+def set_cache_headers(response: Response, etag: str) -> None:
+    """
+    Attach validator and caching headers to a response.
+    
+    Args:
+        response: Outgoing response
+        etag: Current ETag of the resource
+    """
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+
+
+def not_modified(etag: str, vary: Optional[str] = None) -> Response:
+    """
+    Build the empty 304 response for a client whose copy is current.
+    
+    Args:
+        etag: Current ETag of the resource
+        vary: Vary header of the full response, if any
+        
+    Returns:
+        304 response carrying the caching headers
+    """
+    response = Response(status_code=status.HTTP_304_NOT_MODIFIED)
+    set_cache_headers(response, etag)
+    if vary is not None:
+        response.headers["Vary"] = vary
+    return response
+
 
 @router.post("", response_model=SweetResponse, status_code=status.HTTP_201_CREATED)
 async def create_sweet(
@@ -27,114 +132,339 @@ async def create_sweet(
         Created sweet
     """
     sweet = await sweets_service.create_sweet(sweet_data)
-    return SweetResponse(
-        id=str(sweet.id),
-        name=sweet.name,
-        category=sweet.category,
-        price=sweet.price,
-        quantity=sweet.quantity,
-        description=sweet.description,
-        image_url=sweet.image_url,
-        created_at=sweet.created_at,
-        updated_at=sweet.updated_at
-    )
+    return sweets_response(sweet_to_dict(sweet), status_code=status.HTTP_201_CREATED)
+
+
+def set_pagination_headers(response: Response, next_cursor: Optional[str]) -> None:
+    """
+    Attach the next-page cursor to a paginated response.
+    
+    Args:
+        response: Outgoing response
+        next_cursor: Cursor for the next page, or None on the last page
+    """
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = next_cursor
+
+
+@router.post("/import", response_model=ImportResult)
+async def import_sweets(
+    request: Request,
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    upsert: bool = False,
+    current_admin: User = Depends(get_current_admin)
+):
+    """
+    Bulk import sweets from an NDJSON or CSV request body (admin only).
+    
+    The body is read as a stream and written in chunks, so uploads of any
+    size use constant memory. Invalid rows are reported, not fatal.
+    
+    Args:
+        request: Incoming request whose body holds the document
+        format: "ndjson" or "csv" (CSV needs a header row)
+        upsert: Update existing sweets matched by name instead of inserting
+        current_admin: Current admin user
+        
+    Returns:
+        Import counts and per-row errors
+    """
+    return await import_service.import_sweets(request.stream(), format=format, upsert=upsert)
 
 
 @router.get("", response_model=List[SweetResponse])
-async def get_all_sweets(current_user: User = Depends(get_current_user)):
+async def get_all_sweets(
+    response: Response,
+    limit: int = Query(settings.page_size_default, ge=1, le=settings.page_size_max),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None),
+    current_user: User = Depends(get_current_user)
+):
     """
-    Get all sweets (protected route).
+    Get one page of sweets (protected route).
+    
+    The cursor for the next page is returned in the X-Next-Cursor header
+    (absent on the last page) and an estimated total in X-Total-Count.
+    
+    The first page at the default size with all fields is served from an
+    in-memory snapshot, compressed with brotli or gzip when accepted.
     
     Args:
+        response: Outgoing response, used to set pagination headers
+        limit: Maximum number of sweets to return
+        cursor: Cursor from the previous page's X-Next-Cursor header
+        fields: Comma-separated fields to return (id is always included)
+        if_none_match: ETag of the client's copy, answered with 304 if current
+        accept_encoding: Content codings the client accepts
         current_user: Current authenticated user
         
     Returns:
-        List of all sweets
-    """
-    sweets = await sweets_service.get_all_sweets()
-    return [
-        SweetResponse(
-            id=str(sweet.id),
-            name=sweet.name,
-            category=sweet.category,
-            price=sweet.price,
-            quantity=sweet.quantity,
-            description=sweet.description,
-            image_url=sweet.image_url,
-            created_at=sweet.created_at,
-            updated_at=sweet.updated_at
-        )
-        for sweet in sweets
-    ]
+        List of sweets on this page
+    """
+    projection = sweets_service.build_projection(fields)
+    version = await get_catalog_version()
+    
+    if cursor is None and projection is None and limit == settings.page_size_default:
+        encoding = negotiate_encoding(accept_encoding)
+        # Each content coding is a different representation, so a different ETag
+        etag = f'"c{version}"' if encoding == IDENTITY else f'"c{version}-{encoding}"'
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag, vary="Accept-Encoding")
+        snapshot = await catalog_snapshot.get(version)
+        return snapshot_response(snapshot, encoding, {
+            "ETag": etag,
+            "Cache-Control": CACHE_CONTROL,
+            "Vary": "Accept-Encoding",
+        })
+    
+    etag = f'"c{version}"'
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    
+    (sweets, next_cursor), total = await asyncio.gather(
+        sweets_service.get_all_sweets(limit, cursor, projection),
+        sweets_service.estimate_sweet_count()
+    )
+    set_pagination_headers(response, next_cursor)
+    set_cache_headers(response, etag)
+    response.headers["X-Total-Count"] = str(total)
+    sparse = projection is not None
+    return sweets_response(
+        [document_to_dict(sweet, sparse=sparse) for sweet in sweets],
+        headers=dict(response.headers)
+    )
 
 
 @router.get("/search", response_model=List[SweetResponse])
 async def search_sweets(
+    response: Response,
+    q: Optional[str] = Query(None, min_length=1),
     name: Optional[str] = None,
     category: Optional[str] = None,
     min_price: Optional[float] = None,
     max_price: Optional[float] = None,
+    match: str = Query(sweets_service.MATCH_PREFIX, pattern="^(exact|prefix|contains)$"),
+    limit: int = Query(settings.page_size_default, ge=1, le=settings.page_size_max),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
     current_user: User = Depends(get_current_user)
 ):
     """
     Search sweets by various criteria (protected route).
     
+    Name and category are matched case-insensitively. ``prefix`` (default)
+    and ``exact`` are served from indexes; ``contains`` scans the collection
+    and is subject to a server-side time limit.
+    
+    Paginated like the list endpoint via ``limit``/``cursor`` and the
+    X-Next-Cursor response header.
+    
+    With ``q``, performs a full-text search over name, category and
+    description instead: results carry a relevance ``score`` and are
+    sorted by it, paginated the same way.
+    
     Args:
+        response: Outgoing response, used to set pagination headers
+        q: Full-text search words
         name: Filter by name
         category: Filter by category
         min_price: Minimum price
         max_price: Maximum price
+        match: How name/category are matched: "exact", "prefix" or "contains"
+        limit: Maximum number of sweets to return
+        cursor: Cursor from the previous page's X-Next-Cursor header
+        fields: Comma-separated fields to return (id is always included)
+        if_none_match: ETag of the client's copy, answered with 304 if current
         current_user: Current authenticated user
         
     Returns:
-        List of matching sweets
-    """
-    sweets = await sweets_service.search_sweets(name, category, min_price, max_price)
-    return [
-        SweetResponse(
-            id=str(sweet.id),
-            name=sweet.name,
-            category=sweet.category,
-            price=sweet.price,
-            quantity=sweet.quantity,
-            description=sweet.description,
-            image_url=sweet.image_url,
-            created_at=sweet.created_at,
-            updated_at=sweet.updated_at
+        List of matching sweets on this page
+    """
+    projection = sweets_service.build_projection(fields)
+    sparse = projection is not None
+    etag = f'"c{await get_catalog_version()}"'
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    set_cache_headers(response, etag)
+    
+    if q:
+        sweets, next_cursor = await sweets_service.text_search_sweets(
+            q, name, category, min_price, max_price,
+            limit=limit, cursor=cursor, match=match, projection=projection
         )
-        for sweet in sweets
-    ]
+    else:
+        sweets, next_cursor = await sweets_service.search_sweets(
+            name, category, min_price, max_price,
+            limit=limit, cursor=cursor, match=match, projection=projection
+        )
+    set_pagination_headers(response, next_cursor)
+    return sweets_response(
+        [document_to_dict(sweet, sparse=sparse) for sweet in sweets],
+        headers=dict(response.headers)
+    )
+
+
+@router.get("/export")
+async def export_sweets(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    name: Optional[str] = None,
+    category: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    match: str = Query(sweets_service.MATCH_PREFIX, pattern="^(exact|prefix|contains)$"),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Stream the sweets catalog as NDJSON or CSV (protected route).
+    
+    Accepts the same filters as the search endpoint. Rows are sent as they
+    are read from the database, so the full catalog is never held in memory.
+    
+    Args:
+        format: "ndjson" or "csv"
+        name: Filter by name
+        category: Filter by category
+        min_price: Minimum price
+        max_price: Maximum price
+        match: How name/category are matched: "exact", "prefix" or "contains"
+        current_user: Current authenticated user
+        
+    Returns:
+        Streaming response with one row per sweet
+    """
+    query = sweets_service.build_search_query(name, category, min_price, max_price, match)
+    max_time_ms = sweets_service.search_time_limit(name, category, match)
+    return StreamingResponse(
+        export_service.export_sweets(query, format=format, max_time_ms=max_time_ms),
+        media_type=export_service.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="sweets.{format}"'}
+    )
+
+
+@router.get("/stream")
+async def stream_inventory(current_user: User = Depends(get_stream_user)):
+    """
+    Stream live catalog changes as Server-Sent Events (protected route).
+    
+    ``delta`` events carry a JSON array of changes: ``stock`` (quantity,
+    price and version), ``upsert`` (the full sweet) or ``delete``. Rapid
+    changes to one sweet are collapsed into a single entry. On a ``reset``
+    event the client should re-fetch the catalog; clients that fall too
+    far behind receive one and are disconnected.
+    
+    Browsers' EventSource cannot send an Authorization header, so this
+    route also accepts the token as an ``access_token`` query parameter.
+    
+    Args:
+        current_user: Current authenticated user
+        
+    Returns:
+        Streaming text/event-stream response
+    """
+    return StreamingResponse(
+        sse_events(inventory_feed, settings.feed_heartbeat_seconds),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.post("/purchase/batch", response_model=List[SweetResponse])
+async def purchase_sweets_batch(
+    purchase_data: BatchPurchaseRequest,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Purchase several sweets in one all-or-nothing order (protected route).
+    
+    Args:
+        purchase_data: Order lines (sweet ID and quantity)
+        current_user: Current authenticated user
+        
+    Returns:
+        Updated sweets with decreased quantities
+    """
+    sweets = await sweets_service.purchase_sweets(purchase_data.items)
+    return sweets_response([sweet_to_dict(sweet) for sweet in sweets])
+
+
+@router.get("/{sweet_id}", response_model=SweetResponse)
+async def get_sweet(
+    sweet_id: str,
+    fields: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Get a single sweet (protected route).
+    
+    The ETag is the sweet's version, so it can also be sent back as the
+    If-Match precondition of an update.
+    
+    Args:
+        sweet_id: Sweet ID
+        fields: Comma-separated fields to return (id is always included)
+        if_none_match: ETag of the client's copy, answered with 304 if current
+        current_user: Current authenticated user
+        
+    Returns:
+        The sweet
+    """
+    projection = sweets_service.build_projection(fields)
+    if if_none_match is not None:
+        # Only the version is read to answer a revalidation
+        version = await sweets_service.get_sweet_version(sweet_id)
+        if version is not None and etag_matches(if_none_match, f'"{version}"'):
+            return not_modified(f'"{version}"')
+    
+    if projection is not None:
+        document = await sweets_service.get_sweet_document(
+            sweet_id, {**projection, "version": 1}
+        )
+        if "version" in projection:
+            version = document.get("version", 0)
+        else:
+            version = document.pop("version", 0)
+        item = document_to_dict(document, sparse=True)
+    else:
+        sweet = await sweets_service.get_sweet_by_id(sweet_id)
+        version = sweet.version
+        item = sweet_to_dict(sweet)
+    
+    return sweets_response(
+        item,
+        headers={"ETag": f'"{version}"', "Cache-Control": CACHE_CONTROL}
+    )
 
 
 @router.put("/{sweet_id}", response_model=SweetResponse)
 async def update_sweet(
     sweet_id: str,
     sweet_data: SweetUpdate,
+    if_match: Optional[str] = Header(None),
     current_user: User = Depends(get_current_user)
 ):
     """
     Update a sweet (protected route).
     
+    Send the sweet's ``version`` in an If-Match header to reject the
+    update with 412 if someone else changed the sweet in the meantime.
+    
     Args:
         sweet_id: Sweet ID
         sweet_data: Sweet update data
+        if_match: Optional expected version precondition
         current_user: Current authenticated user
         
     Returns:
         Updated sweet
     """
-    sweet = await sweets_service.update_sweet(sweet_id, sweet_data)
-    return SweetResponse(
-        id=str(sweet.id),
-        name=sweet.name,
-        category=sweet.category,
-        price=sweet.price,
-        quantity=sweet.quantity,
-        description=sweet.description,
-        image_url=sweet.image_url,
-        created_at=sweet.created_at,
-        updated_at=sweet.updated_at
+    sweet = await sweets_service.update_sweet(
+        sweet_id, sweet_data, expected_version=parse_if_match(if_match)
     )
+    return sweets_response(sweet_to_dict(sweet))
 
 
 @router.delete("/{sweet_id}")
@@ -159,30 +489,36 @@ async def delete_sweet(
 async def purchase_sweet(
     sweet_id: str,
     purchase_data: PurchaseRequest,
+    idempotency_key: Optional[str] = Header(None),
     current_user: User = Depends(get_current_user)
 ):
     """
     Purchase a sweet (protected route).
     
+    With PURCHASE_COALESCE_WINDOW_MS set, concurrent purchases of the same
+    sweet are applied together in arrival order.
+    
+    Retries sent with the same Idempotency-Key get the original response
+    back instead of purchasing again.
+    
     Args:
         sweet_id: Sweet ID
         purchase_data: Purchase quantity
+        idempotency_key: Optional client-chosen key identifying this purchase
         current_user: Current authenticated user
         
     Returns:
         Updated sweet with decreased quantity
     """
-    sweet = await sweets_service.purchase_sweet(sweet_id, purchase_data.quantity)
-    return SweetResponse(
-        id=str(sweet.id),
-        name=sweet.name,
-        category=sweet.category,
-        price=sweet.price,
-        quantity=sweet.quantity,
-        description=sweet.description,
-        image_url=sweet.image_url,
-        created_at=sweet.created_at,
-        updated_at=sweet.updated_at
+    async def purchase() -> Response:
+        sweet = await purchase_coalescer.purchase(sweet_id, purchase_data.quantity)
+        return sweets_response(sweet_to_dict(sweet))
+    
+    return await idempotency_service.run_idempotent(
+        idempotency_key,
+        current_user.email,
+        idempotency_service.request_fingerprint("purchase", sweet_id, purchase_data.quantity),
+        purchase
     )
 
 
@@ -190,28 +526,31 @@ async def purchase_sweet(
 async def restock_sweet(
     sweet_id: str,
     restock_data: RestockRequest,
+    idempotency_key: Optional[str] = Header(None),
     current_admin: User = Depends(get_current_admin)
 ):
     """
     Restock a sweet (admin only).
     
+    Retries sent with the same Idempotency-Key get the original response
+    back instead of restocking again.
+    
     Args:
         sweet_id: Sweet ID
         restock_data: Restock quantity
+        idempotency_key: Optional client-chosen key identifying this restock
         current_admin: Current admin user
         
     Returns:
         Updated sweet with increased quantity
     """
-    sweet = await sweets_service.restock_sweet(sweet_id, restock_data.quantity)
-    return SweetResponse(
-        id=str(sweet.id),
-        name=sweet.name,
-        category=sweet.category,
-        price=sweet.price,
-        quantity=sweet.quantity,
-        description=sweet.description,
-        image_url=sweet.image_url,
-        created_at=sweet.created_at,
-        updated_at=sweet.updated_at
+    async def restock() -> Response:
+        sweet = await sweets_service.restock_sweet(sweet_id, restock_data.quantity)
+        return sweets_response(sweet_to_dict(sweet))
+    
+    return await idempotency_service.run_idempotent(
+        idempotency_key,
+        current_admin.email,
+        idempotency_service.request_fingerprint("restock", sweet_id, restock_data.quantity),
+        restock
     )
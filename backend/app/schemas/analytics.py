@@ -0,0 +1,26 @@
+"""
+Pydantic schemas for inventory analytics responses.
+"""
+from pydantic import BaseModel
+from typing import List
+
+
+class CategoryAnalytics(BaseModel):
+    """Stock figures for one category."""
+    category: str
+    sweets: int
+    units: int
+    value: float
+    low_stock: int
+    out_of_stock: int
+
+
+class InventoryAnalytics(BaseModel):
+    """Stock figures for the whole catalog and per category."""
+    total_sweets: int
+    total_units: int
+    total_value: float
+    low_stock: int
+    out_of_stock: int
+    low_stock_threshold: int
+    categories: List[CategoryAnalytics]
@@ -2,7 +2,7 @@
 Pydantic schemas for sweet-related requests and responses.
 """
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 
 
@@ -37,6 +37,8 @@ class SweetResponse(BaseModel):
     image_url: Optional[str] = None
     created_at: datetime
     updated_at: datetime
+    version: int = 0
+    score: Optional[float] = None  # Relevance, only set by full-text search
     
     class Config:
         from_attributes = True
@@ -47,6 +49,32 @@ class PurchaseRequest(BaseModel):
     quantity: int = Field(gt=0, description="Purchase quantity must be greater than 0")
 
 
+class PurchaseItem(BaseModel):
+    """Schema for a single line of a batch purchase."""
+    sweet_id: str
+    quantity: int = Field(gt=0, description="Purchase quantity must be greater than 0")
+
+
+class BatchPurchaseRequest(BaseModel):
+    """Schema for purchasing several sweets in one order."""
+    items: List[PurchaseItem] = Field(min_length=1, max_length=100)
+
+
 class RestockRequest(BaseModel):
     """Schema for restocking a sweet."""
     quantity: int = Field(gt=0, description="Restock quantity must be greater than 0")
+
+
+class ImportRowError(BaseModel):
+    """Schema for a row rejected during bulk import."""
+    row: int
+    error: str
+
+
+class ImportResult(BaseModel):
+    """Schema for the outcome of a bulk import."""
+    processed: int = 0
+    inserted: int = 0
+    updated: int = 0
+    failed: int = 0
+    errors: List[ImportRowError] = []
@@ -0,0 +1,374 @@
+"""
+Inventory analytics kept as incrementally maintained per-category rollups.
+
+Each category has one rollup document holding its sweet count, units in
+stock, stock value and low/out-of-stock counts. Sweet writes apply the
+difference between the sweet before and after the write with ``$inc``,
+batched per worker off the request path, so reading the analytics costs
+O(categories) instead of a catalog scan. A periodic reconciler recomputes
+the rollups from the sweets and corrects any drift (float rounding, writes
+that bypassed the service, bulk imports).
+Reconciliation is serialized across workers by a lease document, since two
+runs applying the same correction would double the drift, and only
+corrects categories that stayed quiet for a settle period (see
+_reconcile).
+"""
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+from pymongo import DeleteOne, InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from app.config.database import settings
+from app.models.sweet import Sweet, normalize_search_text
+from app.utils.write_behind import WriteBehind
+
+ROLLUP_COLLECTION = "inventory_rollups"
+
+# Collection and document of the lease held by the running reconciliation
+LEASE_COLLECTION = "inventory_rollup_lease"
+LEASE_ID = "reconcile"
+
+# How often a reconciliation waiting for the lease retries
+LEASE_POLL_SECONDS = 0.1
+
+# Error code of a duplicate key
+DUPLICATE_KEY = 11000
+
+# Counters kept per category
+ROLLUP_FIELDS = ("sweets", "units", "value", "low_stock", "out_of_stock")
+
+# Differences below this are float noise, not drift
+VALUE_TOLERANCE = 1e-6
+
+
+def _rollups():
+    """Get the collection holding the per-category rollups."""
+    return Sweet.get_motor_collection().database[ROLLUP_COLLECTION]
+
+
+def _leases():
+    """Get the collection holding the reconciliation lease."""
+    return Sweet.get_motor_collection().database[LEASE_COLLECTION]
+
+
+async def _acquire_lease(owner: str) -> bool:
+    """
+    Take the reconciliation lease unless another run holds it.
+    
+    A lease left behind by a crashed worker can be taken once it expires.
+    
+    Args:
+        owner: Token identifying this run
+    
+    Returns:
+        True if the lease was taken
+    """
+    now = datetime.utcnow()
+    try:
+        await _leases().update_one(
+            {"_id": LEASE_ID, "expires_at": {"$lt": now}},
+            {"$set": {
+                "owner": owner,
+                "expires_at": now + timedelta(seconds=settings.analytics_reconcile_lease_seconds)
+            }},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        # The lease exists and has not expired
+        return False
+    return True
+
+
+async def _release_lease(owner: str) -> None:
+    """Give the lease back, unless it expired and was taken over."""
+    await _leases().delete_one({"_id": LEASE_ID, "owner": owner})
+
+
+def _counters(price: float, quantity: int) -> Dict[str, float]:
+    """Contribution of one sweet to its category's counters."""
+    return {
+        "sweets": 1,
+        "units": quantity,
+        "value": price * quantity,
+        "low_stock": int(0 < quantity <= settings.low_stock_threshold),
+        "out_of_stock": int(quantity == 0),
+    }
+
+
+class RollupBuffer:
+    """
+    Collects this worker's rollup changes and writes them in batches.
+    
+    Changes to the same category are summed in memory, so a burst of
+    purchases costs one ``$inc`` per category instead of one awaited write
+    per purchase. Every write also increments the rollup's ``rev``, which
+    the reconciler uses to tell whether a rollup changed under it.
+    """
+    
+    def __init__(self, delay: float):
+        """
+        Create an empty buffer.
+        
+        Args:
+            delay: Seconds a change may wait before it is written
+        """
+        self.deltas: Dict[str, Dict[str, float]] = {}
+        self.names: Dict[str, str] = {}
+        self.writer = WriteBehind(delay, self._flush, name="Inventory rollups")
+    
+    def add(self, key: str, category: str, delta: Dict[str, float]) -> None:
+        """
+        Buffer a change to one category's counters.
+        
+        Args:
+            key: Normalized category
+            category: Category as written on the sweet
+            delta: Counter increments
+        """
+        self.names[key] = category
+        pending = self.deltas.setdefault(key, dict.fromkeys(ROLLUP_FIELDS, 0))
+        for field, value in delta.items():
+            pending[field] += value
+        self.writer.mark()
+    
+    async def _flush(self) -> None:
+        """Write the buffered changes in one bulk write."""
+        deltas, self.deltas = self.deltas, {}
+        names, self.names = self.names, {}
+        
+        operations = []
+        for key, delta in deltas.items():
+            increments = {field: value for field, value in delta.items() if value}
+            if increments:
+                operations.append(UpdateOne(
+                    {"_id": key},
+                    {"$inc": {**increments, "rev": 1}, "$setOnInsert": {"category": names[key]}},
+                    upsert=True
+                ))
+        if not operations:
+            return
+        try:
+            await _rollups().bulk_write(operations, ordered=False)
+        except Exception:
+            # Put the changes back for the next flush; with ordered=False some
+            # may have been applied, which the reconciler corrects
+            for key, delta in deltas.items():
+                self.add(key, names[key], delta)
+            raise
+    
+    async def sync(self) -> None:
+        """Write every change buffered so far."""
+        await self.writer.sync()
+
+
+rollup_buffer = RollupBuffer(delay=settings.analytics_flush_ms / 1000)
+
+
+def record_change(before: Optional[Sweet], after: Optional[Sweet]) -> None:
+    """
+    Apply a sweet write to the rollups.
+    
+    The change is buffered and written shortly after, so the write being
+    recorded does not wait for it.
+    
+    Args:
+        before: Sweet as it was before the write (None if it was created)
+        after: Sweet as it is after the write (None if it was deleted)
+    """
+    for sweet, sign in ((before, -1), (after, 1)):
+        if sweet is None:
+            continue
+        rollup_buffer.add(
+            normalize_search_text(sweet.category),
+            sweet.category,
+            {
+                field: sign * value
+                for field, value in _counters(sweet.price, sweet.quantity).items()
+            }
+        )
+
+
+async def reconcile(wait: bool = True) -> Optional[int]:
+    """
+    Recompute the rollups from the sweets and correct any drift.
+    
+    Only one reconciliation runs at a time across all workers.
+    
+    Args:
+        wait: Wait for a reconciliation running elsewhere to finish instead
+            of skipping this one
+    
+    Returns:
+        Number of categories that needed a correction, or None if skipped
+        because another reconciliation was running
+    """
+    owner = uuid.uuid4().hex
+    while not await _acquire_lease(owner):
+        if not wait:
+            return None
+        await asyncio.sleep(LEASE_POLL_SECONDS)
+    try:
+        return await _reconcile()
+    finally:
+        await _release_lease(owner)
+
+
+async def _aggregate() -> Dict[str, dict]:
+    """Recompute every category's counters from the sweets."""
+    threshold = settings.low_stock_threshold
+    pipeline = [{
+        "$group": {
+            "_id": "$category_lower",
+            "category": {"$first": "$category"},
+            "sweets": {"$sum": 1},
+            "units": {"$sum": "$quantity"},
+            "value": {"$sum": {"$multiply": ["$price", "$quantity"]}},
+            "low_stock": {"$sum": {"$cond": [
+                {"$and": [{"$gt": ["$quantity", 0]}, {"$lte": ["$quantity", threshold]}]}, 1, 0
+            ]}},
+            "out_of_stock": {"$sum": {"$cond": [{"$eq": ["$quantity", 0]}, 1, 0]}},
+        }
+    }]
+    return {
+        group["_id"]: group
+        async for group in Sweet.get_motor_collection().aggregate(pipeline)
+    }
+
+
+async def _read_rollups() -> Dict[str, dict]:
+    """Read every category's rollup."""
+    return {rollup["_id"]: rollup async for rollup in _rollups().find()}
+
+
+def _corrections(want: dict, have: dict) -> Dict[str, float]:
+    """Counter increments turning the rollup ``have`` into ``want``."""
+    corrections = {}
+    for field in ROLLUP_FIELDS:
+        difference = want.get(field, 0) - have.get(field, 0)
+        if abs(difference) > VALUE_TOLERANCE:
+            corrections[field] = difference
+    return corrections
+
+
+async def _reconcile() -> int:
+    """
+    Apply the corrections of one reconciliation; the caller holds the lease.
+    
+    The aggregate and the rollups cannot be read as one snapshot, and other
+    workers may still hold changes for writes the aggregate already sees;
+    correcting a category in either state would count those changes twice.
+    The rollups and the aggregate are therefore read twice, the second time
+    after a settle period longer than the other workers' flush delay, and
+    only categories whose rollup ``rev`` and aggregate did not change in
+    between are corrected. Each correction is also conditional on ``rev``,
+    so a change written after the second read voids it. Busy categories
+    are corrected by a later run, once they go quiet for a settle period.
+    
+    Returns:
+        Number of categories that needed a correction
+    """
+    await rollup_buffer.sync()
+    first_rollups = await _read_rollups()
+    first_expected = await _aggregate()
+    await asyncio.sleep(settings.analytics_reconcile_settle_ms / 1000)
+    await rollup_buffer.sync()
+    # Rollups before the aggregate: a change flushed in between is for a
+    # write the aggregate may see, and shows up as a changed rev
+    current = await _read_rollups()
+    expected = await _aggregate()
+    
+    operations = []
+    corrected = 0
+    for key in expected.keys() | current.keys():
+        want = expected.get(key)
+        have = current.get(key)
+        first_want = first_expected.get(key)
+        first_have = first_rollups.get(key)
+        if (want is None) != (first_want is None) or (want and _corrections(want, first_want)):
+            continue
+        if (have is None) != (first_have is None) or (have and have.get("rev") != first_have.get("rev")):
+            continue
+        if have is None:
+            corrected += 1
+            operations.append(InsertOne({
+                "_id": key,
+                "category": want["category"],
+                "rev": 1,
+                **{field: want[field] for field in ROLLUP_FIELDS},
+            }))
+        elif want is None:
+            # The category's last sweet is gone
+            operations.append(DeleteOne({"_id": key, "rev": have.get("rev")}))
+            corrected += bool(_corrections({}, have))
+        else:
+            corrections = _corrections(want, have)
+            if corrections:
+                corrected += 1
+                operations.append(UpdateOne(
+                    {"_id": key, "rev": have.get("rev")},
+                    {"$inc": {**corrections, "rev": 1}}
+                ))
+    
+    if not operations:
+        return 0
+    try:
+        await _rollups().bulk_write(operations, ordered=False)
+    except BulkWriteError as error:
+        # A rollup created by a flush since the second read: next run
+        if any(write_error["code"] != DUPLICATE_KEY for write_error in error.details["writeErrors"]):
+            raise
+    return corrected
+
+
+async def run_reconciler(interval_seconds: float) -> None:
+    """
+    Reconcile the rollups now and then every ``interval_seconds``.
+    
+    Runs until cancelled; errors are reported and retried next interval.
+    Every worker runs this loop, and a run is skipped while another worker
+    is reconciling.
+    
+    Args:
+        interval_seconds: Time between runs
+    """
+    while True:
+        try:
+            corrected = await reconcile(wait=False)
+            if corrected:
+                print(f"Inventory rollups: corrected {corrected} categories")
+        except Exception as error:
+            print(f"Inventory rollup reconciliation failed: {error}")
+        await asyncio.sleep(interval_seconds)
+
+
+async def get_inventory_analytics() -> dict:
+    """
+    Read the inventory analytics from the rollups.
+    
+    Returns:
+        Totals across the catalog and the counters of each category
+    """
+    await rollup_buffer.sync()
+    rollups = await _rollups().find({"sweets": {"$gt": 0}}).sort("_id", 1).to_list(length=None)
+    total_value = sum(rollup.get("value", 0) for rollup in rollups)
+    categories = [
+        {
+            "category": rollup.get("category", rollup["_id"]),
+            "sweets": rollup.get("sweets", 0),
+            "units": rollup.get("units", 0),
+            "value": round(rollup.get("value", 0), 2),
+            "low_stock": rollup.get("low_stock", 0),
+            "out_of_stock": rollup.get("out_of_stock", 0),
+        }
+        for rollup in rollups
+    ]
+    return {
+        "total_sweets": sum(category["sweets"] for category in categories),
+        "total_units": sum(category["units"] for category in categories),
+        "total_value": round(total_value, 2),
+        "low_stock": sum(category["low_stock"] for category in categories),
+        "out_of_stock": sum(category["out_of_stock"] for category in categories),
+        "low_stock_threshold": settings.low_stock_threshold,
+        "categories": categories,
+    }
@@ -1,13 +1,39 @@
 """
 Authentication service for user registration and login.
 """
+from datetime import datetime
 from typing import Optional
 from fastapi import HTTPException, status
+from app.config.database import settings
 from app.models.user import User
 from app.schemas.user import UserRegister, UserLogin, Token
-from app.utils.password import hash_password, verify_password
+from app.utils.cache import TTLCache
+from app.utils.password import HashingOverloaded, hash_password_async, verify_and_update_password_async
 from app.utils.jwt import create_access_token
 
+# Authenticated users by email, so protected routes skip the user lookup.
+# Entries are dropped when a User instance is saved, updated or deleted in
+# this worker (see User hooks). Query-level and bulk updates (e.g.
+# User.find(...).update()), raw Motor writes and writes made by other
+# workers bypass those hooks: such code must call invalidate_cached_user or
+# invalidate_cached_users, and otherwise the change is only seen once the
+# entry expires after user_cache_ttl_seconds.
+user_cache = TTLCache(maxsize=settings.user_cache_size, ttl=settings.user_cache_ttl_seconds)
+
+
+def _hashing_overloaded_error() -> HTTPException:
+    """
+    Build the error returned when password hashing is saturated.
+    
+    Returns:
+        503 HTTPException with a Retry-After header
+    """
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many authentication requests, please retry shortly",
+        headers={"Retry-After": str(settings.password_hash_retry_after_seconds)},
+    )
+
 
 async def register_user(user_data: UserRegister) -> User:
     """
@@ -20,7 +46,7 @@ async def register_user(user_data: UserRegister) -> User:
         Created user document
         
     Raises:
-        HTTPException: If email is already registered
+        HTTPException: If email is already registered or hashing is saturated
     """
     # Check if user already exists
     existing_user = await User.find_one(User.email == user_data.email)
@@ -31,7 +57,10 @@ async def register_user(user_data: UserRegister) -> User:
         )
     
     # Hash the password
-    password_hash = hash_password(user_data.password)
+    try:
+        password_hash = await hash_password_async(user_data.password)
+    except HashingOverloaded:
+        raise _hashing_overloaded_error()
     
     # Create new user
     user = User(
@@ -48,6 +77,9 @@ async def login_user(login_data: UserLogin) -> Token:
     """
     Authenticate user and return JWT token.
     
+    If the stored hash was made with a different bcrypt cost than the one
+    configured, it is replaced with a fresh hash of the verified password.
+    
     Args:
         login_data: User login credentials
         
@@ -55,18 +87,36 @@ async def login_user(login_data: UserLogin) -> Token:
         JWT access token
         
     Raises:
-        HTTPException: If credentials are invalid
+        HTTPException: If credentials are invalid or hashing is saturated
     """
     # Find user by email
     user = await User.find_one(User.email == login_data.email)
     
-    if not user or not verify_password(login_data.password, user.password_hash):
+    password_valid, new_hash = False, None
+    try:
+        if user is not None:
+            password_valid, new_hash = await verify_and_update_password_async(
+                login_data.password, user.password_hash
+            )
+    except HashingOverloaded:
+        raise _hashing_overloaded_error()
+    
+    if not password_valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    if not user.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="User account is disabled"
+        )
+    
+    if new_hash is not None:
+        await user.set({User.password_hash: new_hash, User.updated_at: datetime.utcnow()})
+    
     # Create access token
     access_token = create_access_token(
         data={"sub": user.email, "role": user.role}
@@ -77,7 +127,7 @@ async def login_user(login_data: UserLogin) -> Token:
 
 async def get_user_by_email(email: str) -> Optional[User]:
     """
-    Get user by email.
+    Get user by email, served from the user cache when possible.
     
     Args:
         email: User email
@@ -85,4 +135,24 @@ async def get_user_by_email(email: str) -> Optional[User]:
     Returns:
         User document or None if not found
     """
-    return await User.find_one(User.email == email)
+    user = user_cache.get(email)
+    if user is None:
+        user = await User.find_one(User.email == email)
+        if user is not None:
+            user_cache.set(email, user)
+    return user
+
+
+def invalidate_cached_user(email: str) -> None:
+    """
+    Drop a user from the user cache after their record changed.
+    
+    Args:
+        email: User email
+    """
+    user_cache.pop(email)
+
+
+def invalidate_cached_users() -> None:
+    """Drop every user from the user cache, e.g. after a bulk update of users."""
+    user_cache.clear()
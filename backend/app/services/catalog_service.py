@@ -0,0 +1,292 @@
+"""
+Catalog version tracking and the search result cache built on it.
+
+The catalog version counts writes to the sweets collection. It is kept in
+the database so every worker agrees on it, which makes it usable as the
+ETag of list and search responses. Writes do not wait for it: each worker
+batches its bumps into one increment written shortly after (see
+WriteBehind), and a read in the worker that wrote flushes them first.
+"""
+import asyncio
+import json
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+from pymongo import ReturnDocument
+from app.config.database import settings
+from app.models.sweet import Sweet
+from app.utils.cache import TTLCache
+from app.utils.write_behind import WriteBehind
+
+_MISSING = object()
+
+# Collection and document holding the catalog version shared by all workers
+CATALOG_STATE_COLLECTION = "catalog_state"
+CATALOG_STATE_ID = "catalog"
+
+
+class SearchCache:
+    """
+    Cache of search results keyed on the normalized query.
+    
+    Every write to the catalog bumps ``version`` and drops all cached
+    results, so a search never returns data older than the last write made
+    through this worker. Writes made by other workers are picked up when
+    this worker next reads the shared version (see observe), or at the
+    latest once the entry's TTL expires. Identical searches that miss at
+    the same time share a single database query.
+    """
+    
+    def __init__(self, maxsize: int, ttl: float):
+        """
+        Create an empty cache.
+        
+        Args:
+            maxsize: Maximum number of cached result pages (0 disables caching)
+            ttl: Time to live of a cached result, in seconds
+        """
+        self.version = 0
+        self._results = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.coalesced = 0
+        self.shared_version: Optional[str] = None
+    
+    def bump(self) -> None:
+        """Record a catalog change, invalidating every cached result."""
+        self.version += 1
+        self._results.clear()
+    
+    def observe(self, shared_version: str) -> None:
+        """
+        Invalidate the cache if the shared catalog version moved.
+        
+        Catches writes made by other workers as soon as this worker reads
+        the shared version, instead of waiting for entries to expire.
+        
+        Args:
+            shared_version: Catalog version token, see get_catalog_version
+        """
+        if shared_version != self.shared_version:
+            self.shared_version = shared_version
+            self.bump()
+    
+    async def get_or_load(self, key: Hashable, load: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Return the cached result for a key, loading it on a miss.
+        
+        Args:
+            key: Normalized search key, see search_key
+            load: Coroutine function running the query
+        
+        Returns:
+            The (possibly shared) search result; callers must not modify it
+        """
+        result = self._results.get(key, _MISSING)
+        if result is not _MISSING:
+            return result
+        
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.coalesced += 1
+            return await asyncio.shield(inflight)
+        
+        version = self.version
+        task = asyncio.ensure_future(load())
+        self._inflight[key] = task
+        try:
+            # Shielded so a disconnecting first caller does not cancel the
+            # query for the callers waiting on it
+            result = await asyncio.shield(task)
+        finally:
+            if self._inflight.get(key) is task:
+                del self._inflight[key]
+        
+        # A write during the query may have made the result stale
+        if version == self.version:
+            self._results.set(key, result)
+        return result
+    
+    def clear(self) -> None:
+        """Drop all cached results."""
+        self._results.clear()
+    
+    def stats(self) -> dict:
+        """
+        Report cache counters.
+        
+        Returns:
+            TTLCache counters plus the catalog version and coalesced misses
+        """
+        return {
+            **self._results.stats(),
+            "coalesced": self.coalesced,
+            "catalog_version": self.version,
+        }
+
+
+def search_key(kind: str, query: dict, limit: int, **options: Optional[Any]) -> str:
+    """
+    Build a cache key from a search query and its paging options.
+    
+    The query built by sweets_service.build_search_query is already
+    normalized (lowercased, trimmed), so equivalent searches share a key.
+    
+    Args:
+        kind: Search flavour, e.g. "filter" or "text"
+        query: MongoDB filter
+        limit: Page size
+        **options: Other parameters affecting the result (cursor, projection...)
+    
+    Returns:
+        Canonical string key
+    """
+    return json.dumps([kind, query, limit, options], sort_keys=True, default=str)
+
+
+search_cache = SearchCache(
+    maxsize=settings.search_cache_size,
+    ttl=settings.search_cache_ttl_seconds
+)
+
+
+def _catalog_state():
+    """Get the collection holding the shared catalog version."""
+    return Sweet.get_motor_collection().database[CATALOG_STATE_COLLECTION]
+
+
+class CatalogVersion:
+    """
+    Batches this worker's catalog version bumps into single increments.
+    
+    Other workers see a write's new version at most ``delay`` plus
+    ``refresh`` seconds after it; this worker sees it on its next read.
+    Bumps are only held in memory until flushed, so a worker that dies
+    first loses them: the version token therefore also changes every
+    ``max_age`` seconds, which bounds how long a lost bump can keep
+    clients on stale data, and each worker bumps the version on startup.
+    """
+    
+    def __init__(self, delay: float, refresh: float, max_age: int):
+        """
+        Create a tracker with nothing to write.
+        
+        Args:
+            delay: Seconds a bump may wait before it is written
+            refresh: Seconds the shared version read from the database is reused
+            max_age: Seconds after which every version token changes
+        """
+        self.refresh = refresh
+        self.max_age = max_age
+        self.pending = 0
+        self.shared: Optional[int] = None
+        self.read_at = 0.0
+        self.reads = 0
+        self.writer = WriteBehind(delay, self._flush, name="Catalog version")
+    
+    def changed(self) -> None:
+        """Record a catalog write without waiting for the database."""
+        search_cache.bump()
+        self.pending += 1
+        self.writer.mark()
+    
+    async def _flush(self) -> None:
+        """Add the pending bumps to the shared version in one update."""
+        count, self.pending = self.pending, 0
+        if not count:
+            return
+        try:
+            state = await _catalog_state().find_one_and_update(
+                {"_id": CATALOG_STATE_ID},
+                {"$inc": {"version": count}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except Exception:
+            self.pending += count
+            raise
+        self._remember(state["version"])
+        search_cache.shared_version = self.token(state["version"])
+    
+    def _remember(self, version: int) -> None:
+        """Keep a freshly read shared version for ``refresh`` seconds."""
+        self.shared = version
+        self.read_at = time.monotonic()
+    
+    def token(self, version: int) -> str:
+        """
+        Combine the shared version with the current max-age window.
+        
+        Args:
+            version: Shared catalog version
+            
+        Returns:
+            Token identifying the catalog state, e.g. "42.28547120"
+        """
+        return f"{version}.{int(time.time() // self.max_age)}"
+    
+    async def current(self) -> str:
+        """
+        Get the current version token.
+        
+        Bumps still pending in this worker are written first, so a client
+        reading back its own write never gets the previous token. Without
+        local writes the database is read at most once per ``refresh``.
+        
+        Returns:
+            Version token
+        """
+        await self.writer.sync()
+        if self.shared is None or time.monotonic() - self.read_at >= self.refresh:
+            state = await _catalog_state().find_one({"_id": CATALOG_STATE_ID})
+            self.reads += 1
+            self._remember(state["version"] if state else 0)
+        return self.token(self.shared)
+    
+    async def sync(self) -> None:
+        """Write every bump recorded so far."""
+        await self.writer.sync()
+    
+    def clear(self) -> None:
+        """Forget the shared version read last, so the next read refreshes it."""
+        self.shared = None
+    
+    def stats(self) -> dict:
+        """
+        Report version tracking counters.
+        
+        Returns:
+            WriteBehind counters plus the database reads of the shared version
+        """
+        return {**self.writer.stats(), "reads": self.reads, "version": self.shared}
+
+
+catalog_version = CatalogVersion(
+    delay=settings.catalog_version_flush_ms / 1000,
+    refresh=settings.catalog_version_refresh_ms / 1000,
+    max_age=settings.catalog_version_max_age_seconds
+)
+
+
+def catalog_changed() -> None:
+    """
+    Record that the sweets catalog was modified.
+    
+    Must be called after the write is applied: a reader that sees the old
+    version with the new data only re-downloads once more, while the
+    reverse would let clients keep stale data under a current ETag.
+    """
+    catalog_version.changed()
+
+
+async def get_catalog_version() -> str:
+    """
+    Get the catalog version token shared by all workers.
+    
+    Read it before the data it describes, for the reason given in
+    catalog_changed.
+    
+    Returns:
+        Version token, usable as (part of) an ETag
+    """
+    token = await catalog_version.current()
+    search_cache.observe(token)
+    return token
@@ -0,0 +1,99 @@
+"""
+Export service for streaming the sweets catalog as NDJSON or CSV.
+"""
+import csv
+import io
+import json
+from datetime import datetime
+from typing import AsyncIterator, List, Optional
+from fastapi import HTTPException, status
+from app.models.sweet import Sweet
+
+# Documents fetched per cursor batch; one output chunk is emitted per batch
+EXPORT_BATCH_SIZE = 500
+
+# Columns written by the export, in order
+EXPORT_FIELDS = [
+    "id", "name", "category", "price", "quantity",
+    "description", "image_url", "created_at", "updated_at"
+]
+
+# Projection fetching only the exported columns
+EXPORT_PROJECTION = {"_id": 1, **{field: 1 for field in EXPORT_FIELDS if field != "id"}}
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+def _to_row(document: dict) -> dict:
+    """Convert a raw sweet document into an export row."""
+    row = {field: document.get(field) for field in EXPORT_FIELDS}
+    row["id"] = str(document["_id"])
+    for field in ("created_at", "updated_at"):
+        if isinstance(row[field], datetime):
+            row[field] = row[field].isoformat()
+    return row
+
+
+def _encode_ndjson(rows: List[dict]) -> bytes:
+    """Encode rows as newline-delimited JSON."""
+    return "".join(json.dumps(row) + "\n" for row in rows).encode()
+
+
+def _encode_csv(rows: List[dict]) -> bytes:
+    """Encode rows as CSV lines (without header)."""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+    writer.writerows(rows)
+    return buffer.getvalue().encode()
+
+
+async def export_sweets(
+    query: dict,
+    format: str = "ndjson",
+    max_time_ms: Optional[int] = None
+) -> AsyncIterator[bytes]:
+    """
+    Stream sweets matching a query as encoded chunks.
+    
+    The Motor cursor is consumed one batch at a time and each batch is
+    yielded as a single chunk, so the next batch is only fetched once the
+    client has taken the previous one and memory stays bounded.
+    
+    Args:
+        query: MongoDB filter, as built by sweets_service.build_search_query
+        format: "ndjson" or "csv"
+        max_time_ms: Optional server-side time limit for the query, see
+            sweets_service.search_time_limit; exceeding it ends the stream
+        
+    Yields:
+        Encoded chunks of the export
+        
+    Raises:
+        HTTPException: If the format is unsupported
+    """
+    if format not in MEDIA_TYPES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported export format: {format}"
+        )
+    
+    encode = _encode_ndjson if format == "ndjson" else _encode_csv
+    if format == "csv":
+        yield (",".join(EXPORT_FIELDS) + "\r\n").encode()
+    
+    find_kwargs = {"max_time_ms": max_time_ms} if max_time_ms else {}
+    cursor = Sweet.get_motor_collection().find(
+        query, EXPORT_PROJECTION, batch_size=EXPORT_BATCH_SIZE, **find_kwargs
+    ).sort("_id", 1)
+    rows: List[dict] = []
+    async for document in cursor:
+        rows.append(_to_row(document))
+        if len(rows) >= EXPORT_BATCH_SIZE:
+            yield encode(rows)
+            rows = []
+    
+    if rows:
+        yield encode(rows)
@@ -0,0 +1,245 @@
+"""
+Live inventory feed pushed to dashboards over Server-Sent Events.
+
+Writes in sweets_service publish compact deltas to the worker's
+broadcaster, which fans them out to every connected client. Each client
+has a bounded set of pending deltas keyed by sweet, so rapid updates to
+the same sweet collapse into one and a client that stops reading is
+disconnected instead of buffering without limit.
+
+The broadcaster lives in the worker process: with several workers each
+client only sees writes handled by the worker it is connected to, plus a
+``reset`` event whenever it should re-fetch the catalog.
+"""
+import asyncio
+from collections import OrderedDict
+from typing import AsyncIterator, List, Optional, Set
+from app.config.database import settings
+from app.models.sweet import Sweet
+from app.utils.serialization import encode_json
+
+# Delta operations
+OP_UPSERT = "upsert"
+OP_STOCK = "stock"
+OP_DELETE = "delete"
+
+
+def upsert_delta(sweet: Sweet) -> dict:
+    """Delta carrying every field of a created or edited sweet."""
+    return {
+        "op": OP_UPSERT,
+        "id": str(sweet.id),
+        "name": sweet.name,
+        "category": sweet.category,
+        "price": sweet.price,
+        "quantity": sweet.quantity,
+        "description": sweet.description,
+        "image_url": sweet.image_url,
+        "version": sweet.version,
+    }
+
+
+def stock_delta(sweet: Sweet) -> dict:
+    """Compact delta for a quantity change."""
+    return {
+        "op": OP_STOCK,
+        "id": str(sweet.id),
+        "quantity": sweet.quantity,
+        "price": sweet.price,
+        "version": sweet.version,
+    }
+
+
+def delete_delta(sweet_id: str) -> dict:
+    """Delta for a removed sweet."""
+    return {"op": OP_DELETE, "id": sweet_id}
+
+
+def _merge(pending: dict, delta: dict) -> dict:
+    """
+    Collapse a new delta into the one already pending for the same sweet.
+    
+    Args:
+        pending: Delta not yet sent to the client
+        delta: Newer delta for the same sweet
+    
+    Returns:
+        Single delta equivalent to applying both
+    """
+    if delta["op"] == OP_STOCK and pending["op"] == OP_UPSERT:
+        # Keep the full record the client has not seen yet
+        return {**pending, **delta, "op": OP_UPSERT}
+    return delta
+
+
+class Subscriber:
+    """One connected client and the deltas waiting to be sent to it."""
+    
+    def __init__(self, max_pending: int):
+        """
+        Create a subscriber.
+        
+        Args:
+            max_pending: Most sweets with unsent changes before the client
+                is considered too slow and dropped
+        """
+        self.max_pending = max_pending
+        self.pending: "OrderedDict[str, dict]" = OrderedDict()
+        self.reset = False
+        self.dropped = False
+        self._ready = asyncio.Event()
+    
+    def push(self, delta: dict) -> bool:
+        """
+        Queue a delta, merging it with a pending one for the same sweet.
+        
+        Args:
+            delta: Delta to send
+        
+        Returns:
+            False if the client fell too far behind and was dropped
+        """
+        if self.dropped:
+            return False
+        
+        sweet_id = delta["id"]
+        current = self.pending.get(sweet_id)
+        self.pending[sweet_id] = delta if current is None else _merge(current, delta)
+        if len(self.pending) > self.max_pending:
+            self.drop()
+            return False
+        self._ready.set()
+        return True
+    
+    def push_reset(self) -> None:
+        """Tell the client to re-fetch the catalog; pending deltas are moot."""
+        self.pending.clear()
+        self.reset = True
+        self._ready.set()
+    
+    def drop(self) -> None:
+        """Disconnect a client that cannot keep up."""
+        self.dropped = True
+        self.pending.clear()
+        self._ready.set()
+    
+    async def next_batch(self, timeout: float) -> Optional[List[dict]]:
+        """
+        Wait for pending deltas and take them all.
+        
+        Args:
+            timeout: Seconds to wait before returning an empty batch
+        
+        Returns:
+            Pending deltas (empty on timeout), or None if a reset is due
+        """
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return []
+        
+        self._ready.clear()
+        if self.reset:
+            self.reset = False
+            return None
+        batch = list(self.pending.values())
+        self.pending.clear()
+        return batch
+
+
+class InventoryBroadcaster:
+    """Fans catalog deltas out to every subscriber of this worker."""
+    
+    def __init__(self, max_pending: int):
+        """
+        Create a broadcaster with no subscribers.
+        
+        Args:
+            max_pending: Per-client bound on sweets with unsent changes
+        """
+        self.max_pending = max_pending
+        self.subscribers: Set[Subscriber] = set()
+        self.published = 0
+        self.dropped = 0
+    
+    def subscribe(self) -> Subscriber:
+        """Register a new client."""
+        subscriber = Subscriber(self.max_pending)
+        self.subscribers.add(subscriber)
+        return subscriber
+    
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        """Forget a disconnected client."""
+        self.subscribers.discard(subscriber)
+    
+    def publish(self, delta: dict) -> None:
+        """
+        Send a delta to every client without waiting on any of them.
+        
+        Args:
+            delta: Delta from upsert_delta, stock_delta or delete_delta
+        """
+        self.published += 1
+        for subscriber in list(self.subscribers):
+            if not subscriber.push(delta):
+                self.subscribers.discard(subscriber)
+                self.dropped += 1
+    
+    def publish_reset(self) -> None:
+        """Ask every client to re-fetch, e.g. after a bulk import."""
+        for subscriber in self.subscribers:
+            subscriber.push_reset()
+    
+    def stats(self) -> dict:
+        """
+        Report feed counters.
+        
+        Returns:
+            Dict with connected subscribers, published deltas and dropped clients
+        """
+        return {
+            "subscribers": len(self.subscribers),
+            "published": self.published,
+            "dropped": self.dropped,
+        }
+
+
+async def sse_events(
+    broadcaster: InventoryBroadcaster,
+    heartbeat_seconds: float
+) -> AsyncIterator[bytes]:
+    """
+    Subscribe to a broadcaster and encode its deltas as Server-Sent Events.
+    
+    Each event carries a JSON array of deltas. A comment line is sent when
+    idle so proxies keep the connection open. The stream ends, after a
+    ``reset`` event, if the client is dropped for being too slow.
+    
+    The subscription is made when the stream starts and removed when it
+    ends, so a response that is never sent leaves no subscriber behind.
+    
+    Args:
+        broadcaster: Broadcaster to subscribe to
+        heartbeat_seconds: Idle time before a keep-alive comment
+    
+    Yields:
+        Encoded SSE frames
+    """
+    subscriber = broadcaster.subscribe()
+    try:
+        yield b"retry: 3000\n\n"
+        while True:
+            batch = await subscriber.next_batch(heartbeat_seconds)
+            if subscriber.dropped or batch is None:
+                yield b"event: reset\ndata: {}\n\n"
+                if subscriber.dropped:
+                    return
+            elif batch:
+                yield b"event: delta\ndata: " + encode_json(batch) + b"\n\n"
+            else:
+                yield b": keep-alive\n\n"
+    finally:
+        broadcaster.unsubscribe(subscriber)
+
+
+inventory_feed = InventoryBroadcaster(max_pending=settings.feed_max_pending)
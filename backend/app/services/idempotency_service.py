@@ -0,0 +1,188 @@
+"""
+Idempotency-Key handling for retried inventory requests.
+
+The first request with a key claims it by inserting a pending record
+(the unique index makes the claim atomic), runs, and stores its response.
+Retries with the same key get the stored response back without running
+again; a retry arriving while the original is still running waits for it.
+"""
+import asyncio
+import hashlib
+import time
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Optional
+from fastapi import HTTPException, Response, status
+from pymongo.errors import DuplicateKeyError
+from app.config.database import settings
+from app.models.idempotency import IdempotencyRecord
+from app.utils.serialization import FastJSONResponse, encode_json
+
+MAX_KEY_LENGTH = 255
+
+# How often a duplicate re-reads a record owned by another worker
+POLL_INTERVAL_SECONDS = 0.05
+
+# Client errors that are worth retrying: the key is released instead of
+# storing them as the request's final outcome
+RETRYABLE_STATUS_CODES = {
+    status.HTTP_408_REQUEST_TIMEOUT,
+    status.HTTP_409_CONFLICT,
+    status.HTTP_425_TOO_EARLY,
+    status.HTTP_429_TOO_MANY_REQUESTS,
+}
+
+# Originals running in this worker, so local duplicates wait without polling
+_inflight: Dict[str, asyncio.Future] = {}
+
+
+def request_fingerprint(operation: str, *parts: object) -> str:
+    """
+    Hash an operation and its arguments.
+    
+    A key reused for a different request is rejected instead of replaying
+    an unrelated response.
+    
+    Args:
+        operation: Operation name, e.g. "purchase"
+        *parts: Values identifying the request (sweet ID, payload...)
+    
+    Returns:
+        Hex digest
+    """
+    return hashlib.sha256(encode_json([operation, *parts])).hexdigest()
+
+
+def _replay(record: IdempotencyRecord) -> Response:
+    """Rebuild the stored response of a completed request."""
+    return Response(
+        content=record.body,
+        status_code=record.status_code,
+        media_type="application/json",
+        headers={"Idempotent-Replayed": "true"}
+    )
+
+
+async def _wait_for_outcome(key: str, fingerprint: str) -> Optional[IdempotencyRecord]:
+    """
+    Wait until the request that claimed a key has finished.
+    
+    Args:
+        key: Scoped idempotency key
+        fingerprint: Fingerprint of the waiting request
+    
+    Returns:
+        The completed record, or None if the key was released and can be
+        claimed again
+    
+    Raises:
+        HTTPException: 422 if the key belongs to a different request, 409
+            if the original is still running after the wait limit
+    """
+    deadline = time.monotonic() + settings.idempotency_wait_seconds
+    while True:
+        local = _inflight.get(key)
+        if local is not None:
+            try:
+                await asyncio.wait_for(asyncio.shield(local), max(deadline - time.monotonic(), 0))
+            except asyncio.TimeoutError:
+                pass
+        
+        record = await IdempotencyRecord.find_one(IdempotencyRecord.key == key)
+        if record is None:
+            return None
+        if record.fingerprint != fingerprint:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="Idempotency-Key was already used for a different request"
+            )
+        if record.status_code is not None:
+            return record
+        
+        lease_expiry = datetime.utcnow() - timedelta(seconds=settings.idempotency_lease_seconds)
+        if record.created_at < lease_expiry:
+            # The original never finished; release the key so it can be retried
+            await IdempotencyRecord.get_motor_collection().delete_one(
+                {"_id": record.id, "status_code": None}
+            )
+            return None
+        
+        if time.monotonic() >= deadline:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="A request with this Idempotency-Key is still in progress"
+            )
+        await asyncio.sleep(POLL_INTERVAL_SECONDS)
+
+
+async def run_idempotent(
+    idempotency_key: Optional[str],
+    owner: str,
+    fingerprint: str,
+    operation: Callable[[], Awaitable[Response]]
+) -> Response:
+    """
+    Run an operation at most once per idempotency key.
+    
+    Successful responses and final client errors (400, 404, 422...) are
+    stored and replayed. If the operation fails otherwise, or with a
+    retryable status such as 409 or 429, the key is released so the client
+    can retry it.
+    
+    Args:
+        idempotency_key: Idempotency-Key header value, or None to just run
+        owner: Identity of the caller the key is scoped to
+        fingerprint: Fingerprint of the request, see request_fingerprint
+        operation: Coroutine function producing the response
+    
+    Returns:
+        The operation's response, or the stored one for a repeated key
+    
+    Raises:
+        HTTPException: If the key is invalid, reused for another request or
+            still in progress
+    """
+    if idempotency_key is None:
+        return await operation()
+    if not idempotency_key or len(idempotency_key) > MAX_KEY_LENGTH:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters"
+        )
+    
+    key = f"{owner}:{idempotency_key}"
+    while True:
+        record = IdempotencyRecord(key=key, fingerprint=fingerprint)
+        try:
+            await record.insert()
+            break
+        except DuplicateKeyError:
+            existing = await _wait_for_outcome(key, fingerprint)
+            if existing is not None:
+                return _replay(existing)
+    
+    done = asyncio.get_running_loop().create_future()
+    _inflight[key] = done
+    try:
+        try:
+            response = await operation()
+        except HTTPException as error:
+            if error.status_code >= 500 or error.status_code in RETRYABLE_STATUS_CODES:
+                await record.delete()
+                raise
+            response = FastJSONResponse(
+                {"detail": error.detail},
+                status_code=error.status_code,
+                headers=error.headers
+            )
+        except BaseException:
+            await record.delete()
+            raise
+        
+        await record.set({
+            IdempotencyRecord.status_code: response.status_code,
+            IdempotencyRecord.body: response.body
+        })
+        return response
+    finally:
+        del _inflight[key]
+        done.set_result(None)
@@ -0,0 +1,267 @@
+"""
+Bulk import service for loading sweets from NDJSON or CSV streams.
+"""
+import csv
+import io
+import json
+from datetime import datetime
+from typing import AsyncIterator, List, Optional, Tuple
+from fastapi import HTTPException, status
+from pymongo import UpdateOne
+from app.models.sweet import Sweet, normalize_search_text
+from app.schemas.sweet import SweetCreate, ImportResult, ImportRowError
+from app.services import analytics_service
+from app.services.catalog_service import catalog_changed
+from app.services.feed_service import inventory_feed
+
+# Number of validated rows written per bulk operation
+CHUNK_SIZE = 500
+
+# Longest accepted line (or CSV record), so a file without newlines cannot
+# exhaust memory; longer ones are reported as failed rows
+MAX_LINE_BYTES = 64 * 1024
+
+# Only the first errors are returned in full, the rest are just counted
+MAX_REPORTED_ERRORS = 100
+
+SUPPORTED_FORMATS = ("ndjson", "csv")
+
+
+async def _iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, Optional[bytes]]]:
+    """
+    Split a byte stream into numbered lines without buffering the whole stream.
+    
+    A line longer than MAX_LINE_BYTES is dropped as it arrives and yielded
+    as None, so the import can report it and carry on with the next line.
+    
+    Args:
+        chunks: Raw byte chunks
+        
+    Yields:
+        Tuples of (1-based line number, line bytes or None if too long)
+    """
+    buffer = b""
+    line_number = 0
+    # Inside a line that was already too long
+    skipping = False
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            line_number += 1
+            too_long = skipping or len(line) > MAX_LINE_BYTES
+            skipping = False
+            yield line_number, None if too_long else line
+        if len(buffer) > MAX_LINE_BYTES:
+            buffer = b""
+            skipping = True
+    if buffer or skipping:
+        yield line_number + 1, None if skipping else buffer
+
+
+async def _iter_csv_records(
+    lines: AsyncIterator[Tuple[int, Optional[bytes]]]
+) -> AsyncIterator[Tuple[int, Optional[bytes]]]:
+    """
+    Join CSV lines that break inside a quoted field back into one record.
+    
+    A record is complete once its double quotes are balanced. Records longer
+    than MAX_LINE_BYTES are yielded as None, like over-long lines.
+    
+    Args:
+        lines: Numbered lines from _iter_lines
+        
+    Yields:
+        Tuples of (number of the record's first line, record bytes or None)
+    """
+    record: Optional[bytes] = None
+    start = 0
+    async for line_number, line in lines:
+        if line is None:
+            yield (start, None) if record is not None else (line_number, None)
+            record = None
+            continue
+        if record is None:
+            record, start = line, line_number
+        else:
+            record += b"\n" + line
+        if record.count(b'"') % 2 == 0:
+            yield start, record
+            record = None
+        elif len(record) > MAX_LINE_BYTES:
+            yield start, None
+            record = None
+    if record is not None:
+        # Unbalanced quote at the end of the file, left for the parser to reject
+        yield start, record
+
+
+def _parse_ndjson(line: str, header: Optional[List[str]]) -> dict:
+    """Parse one NDJSON line into a row dict."""
+    row = json.loads(line)
+    if not isinstance(row, dict):
+        raise ValueError("Each line must be a JSON object")
+    return row
+
+
+def _parse_csv(line: str, header: Optional[List[str]]) -> dict:
+    """Parse one CSV record into a row dict using the header columns."""
+    values = next(csv.reader(io.StringIO(line, newline="")))
+    if len(values) != len(header):
+        raise ValueError(f"Expected {len(header)} columns, got {len(values)}")
+    # Empty cells mean "not provided" so optional fields fall back to defaults
+    return {column: value for column, value in zip(header, values) if value != ""}
+
+
+def _upsert_operation(row: SweetCreate, now: datetime) -> UpdateOne:
+    """
+    Build the upsert of one row, matched on the indexed lowercase name.
+    
+    Only the columns the row provided are overwritten; defaults of the
+    missing ones are applied to new sweets only.
+    
+    Names are not unique: the API lets several sweets share one (e.g. the
+    same product in different categories), so name_lower has no unique
+    index. If several sweets match, only one of them is updated, and two
+    imports upserting the same new name at once can both insert it.
+    
+    Args:
+        row: Validated sweet
+        now: Timestamp of the import chunk
+        
+    Returns:
+        Bulk write operation
+    """
+    provided = row.model_dump(exclude_unset=True, exclude={"name"})
+    defaults = {
+        field: value
+        for field, value in row.model_dump(exclude={"name"}).items()
+        if field not in provided
+    }
+    return UpdateOne(
+        {"name_lower": normalize_search_text(row.name)},
+        {
+            "$set": {
+                **provided,
+                "category_lower": normalize_search_text(row.category),
+                "updated_at": now
+            },
+            "$setOnInsert": {**defaults, "name": row.name, "created_at": now},
+            "$inc": {"version": 1}
+        },
+        upsert=True
+    )
+
+
+async def _write_chunk(rows: List[SweetCreate], upsert: bool, result: ImportResult) -> None:
+    """
+    Write a chunk of validated rows in a single bulk operation.
+    
+    Args:
+        rows: Validated sweets
+        upsert: Update existing sweets matched by name (case-insensitive) instead
+            of inserting duplicates
+        result: Import result to update with counts
+    """
+    if not rows:
+        return
+    
+    if not upsert:
+        await Sweet.insert_many([Sweet(**row.model_dump()) for row in rows])
+        result.inserted += len(rows)
+        return
+    
+    now = datetime.utcnow()
+    write_result = await Sweet.get_motor_collection().bulk_write(
+        [_upsert_operation(row, now) for row in rows],
+        ordered=False
+    )
+    result.inserted += write_result.upserted_count
+    result.updated += write_result.matched_count
+
+
+async def import_sweets(
+    chunks: AsyncIterator[bytes],
+    format: str = "ndjson",
+    upsert: bool = False,
+    chunk_size: int = CHUNK_SIZE
+) -> ImportResult:
+    """
+    Import sweets from a streamed NDJSON or CSV document.
+    
+    Rows are validated with SweetCreate and written in chunks, so memory use
+    does not grow with the size of the upload. Invalid rows, including
+    lines longer than MAX_LINE_BYTES, are reported and skipped without
+    aborting the import. CSV fields may contain quoted line breaks.
+    
+    Args:
+        chunks: Raw byte chunks of the document
+        format: "ndjson" (one JSON object per line) or "csv" (with a header row)
+        upsert: Update existing sweets matched by name instead of inserting duplicates
+        chunk_size: Number of rows written per bulk operation
+        
+    Returns:
+        Counts of processed, inserted, updated and failed rows
+        
+    Raises:
+        HTTPException: If the format is unsupported or the CSV header is too long
+    """
+    if format not in SUPPORTED_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported import format: {format}"
+        )
+    
+    parse_row = _parse_ndjson if format == "ndjson" else _parse_csv
+    result = ImportResult()
+    pending: List[SweetCreate] = []
+    header: Optional[List[str]] = None
+    
+    lines = _iter_lines(chunks)
+    if format == "csv":
+        lines = _iter_csv_records(lines)
+    
+    written = False
+    try:
+        async for line_number, raw_line in lines:
+            if raw_line is not None and not raw_line.strip():
+                continue
+            if format == "csv" and header is None:
+                if raw_line is None:
+                    raise HTTPException(
+                        status_code=status.HTTP_400_BAD_REQUEST,
+                        detail=f"CSV header exceeds {MAX_LINE_BYTES} bytes"
+                    )
+                line = raw_line.decode("utf-8-sig", errors="replace")
+                header = [column.strip() for column in next(csv.reader([line]))]
+                continue
+            
+            result.processed += 1
+            try:
+                if raw_line is None:
+                    raise ValueError(f"Line exceeds {MAX_LINE_BYTES} bytes")
+                line = raw_line.decode("utf-8-sig" if line_number == 1 else "utf-8")
+                pending.append(SweetCreate(**parse_row(line.strip(), header)))
+            except (ValueError, csv.Error) as e:
+                # Covers bad UTF-8, malformed JSON/CSV and SweetCreate validation
+                result.failed += 1
+                if len(result.errors) < MAX_REPORTED_ERRORS:
+                    result.errors.append(ImportRowError(row=line_number, error=str(e)))
+                continue
+            
+            if len(pending) >= chunk_size:
+                written = True
+                await _write_chunk(pending, upsert, result)
+                pending = []
+        
+        written = written or bool(pending)
+        await _write_chunk(pending, upsert, result)
+    finally:
+        # Chunks already written stay written if the import fails later on,
+        # so caches, rollups and live clients must learn about them either way
+        if written:
+            # Upserts do not report what they replaced, so recompute the rollups
+            await analytics_service.reconcile()
+            catalog_changed()
+            inventory_feed.publish_reset()
+    return result
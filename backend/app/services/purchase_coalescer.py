@@ -0,0 +1,151 @@
+"""
+Write coalescing for purchases of hot items.
+
+During flash sales many purchases target the same sweet at once and would
+each contend for the same document. With coalescing enabled, purchases of
+a sweet arriving within a short window are queued and applied together by
+sweets_service.purchase_sweet_many, so throughput on a hot item grows with
+the batch size rather than being bound by write latency.
+"""
+import asyncio
+from typing import Coroutine, Dict, List, Set, Tuple
+from fastapi import HTTPException, status
+from app.config.database import settings
+from app.models.sweet import Sweet
+from app.services import sweets_service
+
+
+class PurchaseCoalescer:
+    """
+    Groups concurrent purchases per sweet into single writes.
+    
+    The first purchase of a sweet opens a batch that is applied after
+    ``window`` seconds, or as soon as it holds ``max_batch`` purchases.
+    Every caller still gets its own result: the updated sweet, or the same
+    error an uncoalesced purchase would have raised.
+    """
+    
+    def __init__(self, window: float, max_batch: int):
+        """
+        Create a coalescer.
+        
+        Args:
+            window: Seconds to collect purchases of a sweet (0 disables coalescing)
+            max_batch: Most purchases applied in one write
+        """
+        self.window = window
+        self.max_batch = max_batch
+        self._batches: Dict[str, List[Tuple[int, asyncio.Future]]] = {}
+        # Strong references so pending flushes are not garbage collected
+        self._tasks: Set[asyncio.Task] = set()
+        self.batches = 0
+        self.purchases = 0
+        self.largest_batch = 0
+    
+    async def purchase(self, sweet_id: str, quantity: int) -> Sweet:
+        """
+        Purchase a sweet, sharing the write with concurrent purchases.
+        
+        Args:
+            sweet_id: Sweet ID
+            quantity: Quantity to purchase
+        
+        Returns:
+            Updated sweet document
+        
+        Raises:
+            HTTPException: If sweet not found or insufficient quantity
+        """
+        if self.window <= 0:
+            return await sweets_service.purchase_sweet(sweet_id, quantity)
+        
+        future = asyncio.get_running_loop().create_future()
+        batch = self._batches.get(sweet_id)
+        if batch is None:
+            batch = []
+            self._batches[sweet_id] = batch
+            self._spawn(self._flush_later(sweet_id, batch))
+        batch.append((quantity, future))
+        
+        if len(batch) >= self.max_batch:
+            self._batches.pop(sweet_id, None)
+            self._spawn(self._apply(sweet_id, batch))
+        
+        return await future
+    
+    def _spawn(self, coroutine: Coroutine) -> None:
+        """Run a flush in the background, keeping a reference until it ends."""
+        task = asyncio.ensure_future(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+    
+    async def _flush_later(self, sweet_id: str, batch: List[Tuple[int, asyncio.Future]]) -> None:
+        """Apply a batch once its window has elapsed, unless already applied."""
+        await asyncio.sleep(self.window)
+        if self._batches.get(sweet_id) is batch:
+            del self._batches[sweet_id]
+            await self._apply(sweet_id, batch)
+    
+    async def _apply(self, sweet_id: str, batch: List[Tuple[int, asyncio.Future]]) -> None:
+        """
+        Apply a batch in one write and resolve every caller's future.
+        
+        Args:
+            sweet_id: Sweet ID
+            batch: Queued (quantity, future) pairs in arrival order
+        """
+        # Callers that went away no longer get stock
+        batch = [(quantity, future) for quantity, future in batch if not future.done()]
+        if not batch:
+            return
+        
+        self.batches += 1
+        self.purchases += len(batch)
+        self.largest_batch = max(self.largest_batch, len(batch))
+        
+        try:
+            sweet, accepted = await sweets_service.purchase_sweet_many(
+                sweet_id, [quantity for quantity, _ in batch]
+            )
+        except Exception as error:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(error)
+            return
+        
+        for (quantity, future), ok in zip(batch, accepted):
+            if future.done():
+                continue
+            if ok:
+                future.set_result(sweet)
+            elif quantity > sweet.quantity:
+                future.set_exception(HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Insufficient quantity. Available: {sweet.quantity}, Requested: {quantity}"
+                ))
+            else:
+                # Would fit, but an earlier purchase that did not is first in line
+                future.set_exception(HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="Stock is allocated in arrival order to an earlier purchase, please retry"
+                ))
+    
+    def stats(self) -> dict:
+        """
+        Report coalescing counters.
+        
+        Returns:
+            Dict with applied batches, coalesced purchases and the largest batch
+        """
+        return {
+            "enabled": self.window > 0,
+            "batches": self.batches,
+            "purchases": self.purchases,
+            "largest_batch": self.largest_batch,
+        }
+
+
+purchase_coalescer = PurchaseCoalescer(
+    window=settings.purchase_coalesce_window_ms / 1000,
+    max_batch=settings.purchase_coalesce_max_batch
+)
@@ -0,0 +1,124 @@
+"""
+Revocation list backing the stateless JWT authorization mode.
+"""
+import asyncio
+import time
+from typing import Dict, Optional, Set
+from app.config.database import settings
+from app.models.user import User
+
+
+class RevocationList:
+    """
+    In-memory view of the users whose token claims can no longer be trusted.
+    
+    Holds the emails of disabled users and the set of current admins (so
+    an ``admin`` role claim from a demoted user is ignored). Both sets are
+    small and are reloaded from the database at most once per refresh
+    interval; changes made through this worker apply immediately.
+    """
+    
+    def __init__(self, refresh_seconds: float):
+        """
+        Create an empty revocation list.
+        
+        Args:
+            refresh_seconds: Maximum age of the loaded state before a reload
+        """
+        self.refresh_seconds = refresh_seconds
+        self.disabled: Set[str] = set()
+        self.admins: Set[str] = set()
+        # Deleted users are not in the database, so remember them until
+        # every token they could hold has expired
+        self.deleted: Dict[str, float] = {}
+        self.refreshed_at: Optional[float] = None
+        self.refreshes = 0
+        self._lock = asyncio.Lock()
+    
+    async def refresh(self) -> None:
+        """Reload disabled users and admins from the database."""
+        disabled: Set[str] = set()
+        admins: Set[str] = set()
+        users = User.get_motor_collection().find(
+            {"$or": [{"is_active": False}, {"role": "admin"}]},
+            {"email": 1, "role": 1, "is_active": 1}
+        )
+        async for user in users:
+            if user.get("is_active") is False:
+                disabled.add(user["email"])
+            elif user.get("role") == "admin":
+                admins.add(user["email"])
+        
+        now = time.monotonic()
+        self.disabled = disabled
+        self.admins = admins
+        self.deleted = {email: expiry for email, expiry in self.deleted.items() if expiry > now}
+        self.refreshed_at = now
+        self.refreshes += 1
+    
+    async def ensure_fresh(self) -> None:
+        """Reload the lists if they are older than the refresh interval."""
+        if self._is_fresh():
+            return
+        async with self._lock:
+            # Another request may have refreshed while we waited
+            if not self._is_fresh():
+                await self.refresh()
+    
+    def _is_fresh(self) -> bool:
+        return (
+            self.refreshed_at is not None
+            and time.monotonic() - self.refreshed_at < self.refresh_seconds
+        )
+    
+    def is_revoked(self, email: str) -> bool:
+        """Check whether tokens for this email must be rejected."""
+        return email in self.disabled or email in self.deleted
+    
+    def is_admin(self, email: str) -> bool:
+        """Check whether this email currently belongs to an admin."""
+        return email in self.admins
+    
+    def note_user_changed(self, user: User) -> None:
+        """
+        Apply a user change made in this worker without waiting for a refresh.
+        
+        Args:
+            user: Updated user document
+        """
+        self.deleted.pop(user.email, None)
+        if user.is_active:
+            self.disabled.discard(user.email)
+        else:
+            self.disabled.add(user.email)
+        if user.role == "admin" and user.is_active:
+            self.admins.add(user.email)
+        else:
+            self.admins.discard(user.email)
+    
+    def note_user_deleted(self, email: str) -> None:
+        """
+        Revoke a deleted user's tokens until they have expired.
+        
+        Args:
+            email: Deleted user's email
+        """
+        self.admins.discard(email)
+        self.deleted[email] = time.monotonic() + settings.access_token_expire_minutes * 60
+    
+    def stats(self) -> dict:
+        """
+        Report the size of the revocation state.
+        
+        Returns:
+            Dict with set sizes and refresh count
+        """
+        return {
+            "disabled": len(self.disabled),
+            "deleted": len(self.deleted),
+            "admins": len(self.admins),
+            "refreshes": self.refreshes,
+        }
+
+
+revocation_list = RevocationList(refresh_seconds=settings.revocation_refresh_seconds)
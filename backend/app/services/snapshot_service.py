@@ -0,0 +1,157 @@
+"""
+Pre-encoded snapshot of the default sweets list page.
+
+``GET /api/sweets`` without parameters is by far the most requested
+payload. Instead of querying and encoding it per request, the encoded body
+is kept in memory for the current catalog version and served as bytes,
+with compressed variants built on first use.
+"""
+import asyncio
+from typing import Dict, Optional
+from fastapi import Response
+from app.config.database import settings
+from app.services import sweets_service
+from app.utils.compression import IDENTITY, compress
+from app.utils.serialization import document_to_dict, encode_json
+
+
+class CatalogSnapshot:
+    """Encoded first page of the catalog for one catalog version."""
+    
+    def __init__(self, version: str, body: bytes, headers: Dict[str, str]):
+        """
+        Create a snapshot.
+        
+        Args:
+            version: Catalog version token the snapshot was built from
+            body: JSON body, uncompressed
+            headers: Pagination headers sent with the page
+        """
+        self.version = version
+        self.headers = headers
+        self.variants: Dict[str, bytes] = {IDENTITY: body}
+    
+    def body(self, encoding: str) -> bytes:
+        """
+        Get the body in a content coding, compressing it on first use.
+        
+        Args:
+            encoding: "br", "gzip" or "identity"
+            
+        Returns:
+            Encoded body
+        """
+        body = self.variants.get(encoding)
+        if body is None:
+            body = compress(self.variants[IDENTITY], encoding)
+            self.variants[encoding] = body
+        return body
+
+
+class SnapshotStore:
+    """
+    Holds the snapshot for the latest catalog version seen.
+    
+    The snapshot is rebuilt lazily: a request carrying a different catalog
+    version than the stored one rebuilds it, and concurrent requests wait
+    for that single rebuild.
+    """
+    
+    def __init__(self):
+        """Create an empty store."""
+        self.snapshot: Optional[CatalogSnapshot] = None
+        self.builds = 0
+        self.hits = 0
+        self._lock = asyncio.Lock()
+    
+    async def get(self, version: str) -> CatalogSnapshot:
+        """
+        Get the snapshot for a catalog version, building it if needed.
+        
+        Args:
+            version: Current catalog version token, read before calling
+            
+        Returns:
+            Snapshot at least as new as ``version``
+        """
+        snapshot = self.snapshot
+        if snapshot is not None and snapshot.version == version:
+            self.hits += 1
+            return snapshot
+        
+        async with self._lock:
+            snapshot = self.snapshot
+            if snapshot is None or snapshot.version != version:
+                snapshot = await _build_snapshot(version)
+                self.snapshot = snapshot
+                self.builds += 1
+            else:
+                self.hits += 1
+        return snapshot
+    
+    def clear(self) -> None:
+        """Drop the stored snapshot."""
+        self.snapshot = None
+    
+    def stats(self) -> dict:
+        """
+        Report snapshot counters.
+        
+        Returns:
+            Dict with builds, hits, the snapshot version and variant sizes
+        """
+        snapshot = self.snapshot
+        return {
+            "builds": self.builds,
+            "hits": self.hits,
+            "version": snapshot.version if snapshot else None,
+            "sizes": {
+                encoding: len(body) for encoding, body in snapshot.variants.items()
+            } if snapshot else {},
+        }
+
+
+async def _build_snapshot(version: str) -> CatalogSnapshot:
+    """
+    Query and encode the default sweets list page.
+    
+    Args:
+        version: Catalog version the data is read at
+        
+    Returns:
+        New snapshot
+    """
+    (sweets, next_cursor), total = await asyncio.gather(
+        sweets_service.get_all_sweets(settings.page_size_default),
+        sweets_service.estimate_sweet_count()
+    )
+    body = encode_json([document_to_dict(sweet) for sweet in sweets])
+    headers = {"X-Total-Count": str(total)}
+    if next_cursor is not None:
+        headers["X-Next-Cursor"] = next_cursor
+    return CatalogSnapshot(version, body, headers)
+
+
+def snapshot_response(snapshot: CatalogSnapshot, encoding: str, headers: Dict[str, str]) -> Response:
+    """
+    Serve a snapshot variant as a raw bytes response.
+    
+    Args:
+        snapshot: Snapshot to serve
+        encoding: Negotiated content coding
+        headers: Extra headers (ETag, Cache-Control, Vary)
+        
+    Returns:
+        Response carrying the encoded body
+    """
+    headers = {**snapshot.headers, **headers}
+    if encoding != IDENTITY:
+        headers["Content-Encoding"] = encoding
+    return Response(
+        content=snapshot.body(encoding),
+        media_type="application/json",
+        headers=headers
+    )
+
+
+catalog_snapshot = SnapshotStore()
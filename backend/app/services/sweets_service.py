@@ -1,11 +1,51 @@
 """
 Sweets service for CRUD operations and inventory management.
 """
-from typing import List, Optional
+import asyncio
+import base64
+import binascii
+import re
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
 from fastapi import HTTPException, status
-from beanie import PydanticObjectId
-from app.models.sweet import Sweet
-from app.schemas.sweet import SweetCreate, SweetUpdate
+from beanie import PydanticObjectId, UpdateResponse
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import UpdateOne
+from pymongo.errors import ExecutionTimeout
+from app.config.database import settings
+from app.models.sweet import Sweet, normalize_search_text
+from app.schemas.sweet import SweetCreate, SweetUpdate, PurchaseItem
+from app.services.catalog_service import catalog_changed, search_cache, search_key
+from app.services.feed_service import inventory_feed, upsert_delta, stock_delta, delete_delta
+from app.services import analytics_service
+
+# Whether the connected deployment supports multi-document transactions
+# (replica set or sharded cluster). Detected lazily on first batch purchase.
+_transactions_supported: Optional[bool] = None
+
+# Without transactions, batch orders in progress are journaled here, and
+# each sweet an order has taken stock from lists the order's ID in
+# PENDING_ORDERS_FIELD, so a crashed order can be rolled back
+ORDER_COLLECTION = "purchase_orders"
+PENDING_ORDERS_FIELD = "pending_orders"
+
+# Text match modes for name/category search
+MATCH_EXACT = "exact"
+MATCH_PREFIX = "prefix"
+MATCH_CONTAINS = "contains"
+MATCH_MODES = (MATCH_EXACT, MATCH_PREFIX, MATCH_CONTAINS)
+
+# Fields a client may select with ``fields=``; the ID is always returned
+SELECTABLE_FIELDS = (
+    "name", "category", "price", "quantity", "description",
+    "image_url", "created_at", "updated_at", "version"
+)
+
+# Projection for read-only list/search queries: every response field, but
+# not the normalized search fields, which are never returned
+READ_PROJECTION = {"_id": 1, **{field: 1 for field in SELECTABLE_FIELDS}}
 
 
 async def create_sweet(sweet_data: SweetCreate) -> Sweet:
@@ -20,44 +60,267 @@ async def create_sweet(sweet_data: SweetCreate) -> Sweet:
     """
     sweet = Sweet(**sweet_data.model_dump())
     await sweet.insert()
+    analytics_service.record_change(None, sweet)
+    catalog_changed()
+    inventory_feed.publish(upsert_delta(sweet))
     return sweet
 
 
-async def get_all_sweets() -> List[Sweet]:
+def build_projection(fields: Optional[str]) -> Optional[dict]:
     """
-    Get all sweets.
+    Turn a comma-separated ``fields`` parameter into a MongoDB projection.
     
+    Args:
+        fields: Requested fields, e.g. "name,price,quantity", or None for all
+        
     Returns:
-        List of all sweets
+        Projection document, or None when all fields were requested
+        
+    Raises:
+        HTTPException: If an unknown field is requested
     """
-    return await Sweet.find_all().to_list()
+    if not fields:
+        return None
+    
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in requested if field not in SELECTABLE_FIELDS and field != "id"]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields: {', '.join(unknown)}"
+        )
+    
+    projection = {"_id": 1}
+    projection.update({field: 1 for field in requested if field != "id"})
+    return projection
 
 
-async def search_sweets(
+def encode_cursor(object_id: ObjectId) -> str:
+    """
+    Encode the last seen sweet ID as an opaque pagination cursor.
+    
+    Args:
+        object_id: ID of the last sweet on the current page
+        
+    Returns:
+        URL-safe cursor string
+    """
+    return base64.urlsafe_b64encode(object_id.binary).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> ObjectId:
+    """
+    Decode a pagination cursor back into the sweet ID it points after.
+    
+    Args:
+        cursor: Cursor returned with the previous page
+        
+    Returns:
+        ObjectId to continue after
+        
+    Raises:
+        HTTPException: If the cursor is malformed
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        return ObjectId(base64.urlsafe_b64decode(padded))
+    except (binascii.Error, InvalidId, TypeError, ValueError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+
+def encode_rank_cursor(offset: int) -> str:
+    """
+    Encode a position in ranked results as an opaque pagination cursor.
+    
+    Relevance scores cannot be filtered on, so ranked pages are addressed
+    by offset rather than by the last seen ID.
+    
+    Args:
+        offset: Number of results on this and the previous pages
+        
+    Returns:
+        URL-safe cursor string
+    """
+    return base64.urlsafe_b64encode(f"r{offset}".encode()).decode().rstrip("=")
+
+
+def decode_rank_cursor(cursor: str) -> int:
+    """
+    Decode a ranked-results cursor back into the offset it points at.
+    
+    Args:
+        cursor: Cursor returned with the previous page
+        
+    Returns:
+        Number of results to skip
+        
+    Raises:
+        HTTPException: If the cursor is malformed
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        value = base64.urlsafe_b64decode(padded).decode()
+        if value[:1] == "r" and value[1:].isdigit():
+            return int(value[1:])
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        pass
+    raise HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail="Invalid cursor"
+    )
+
+
+def _search_timeout() -> HTTPException:
+    """Error returned when a search query exceeds its time limit."""
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Search took too long, try a more specific query or the prefix match mode"
+    )
+
+
+async def _find_page(
+    query: dict,
+    limit: int,
+    cursor: Optional[str],
+    max_time_ms: Optional[int] = None,
+    projection: Optional[dict] = None
+) -> Tuple[List[dict], Optional[str]]:
+    """
+    Fetch one page of sweets using keyset pagination on ``_id``.
+    
+    Reads go straight to the Motor collection and return raw documents:
+    list and search results are only serialized, never modified, so they
+    skip Beanie model validation entirely.
+    
+    Args:
+        query: Filter to apply
+        limit: Maximum number of sweets to return
+        cursor: Cursor from the previous page, or None for the first page
+        max_time_ms: Optional server-side time limit for the query
+        projection: Optional projection; defaults to READ_PROJECTION
+        
+    Returns:
+        Tuple of (raw sweet documents on this page, cursor for the next page or None)
+        
+    Raises:
+        HTTPException: If the query exceeds its time limit
+    """
+    if cursor:
+        query = {**query, "_id": {"$gt": decode_cursor(cursor)}}
+    
+    find_kwargs = {"max_time_ms": max_time_ms} if max_time_ms else {}
+    
+    # Fetch one extra document to learn whether another page exists
+    try:
+        sweets = await Sweet.get_motor_collection().find(
+            query, projection or READ_PROJECTION, **find_kwargs
+        ).sort("_id", 1).limit(limit + 1).to_list(length=None)
+    except ExecutionTimeout:
+        raise _search_timeout()
+    
+    next_cursor = None
+    if len(sweets) > limit:
+        sweets = sweets[:limit]
+        next_cursor = encode_cursor(sweets[-1]["_id"])
+    return sweets, next_cursor
+
+
+async def get_all_sweets(
+    limit: int = settings.page_size_default,
+    cursor: Optional[str] = None,
+    projection: Optional[dict] = None
+) -> Tuple[List[dict], Optional[str]]:
+    """
+    Get one page of sweets.
+    
+    Args:
+        limit: Maximum number of sweets to return
+        cursor: Cursor from the previous page
+        projection: Optional projection from build_projection
+        
+    Returns:
+        Tuple of (raw sweet documents, next page cursor or None)
+    """
+    return await _find_page({}, limit, cursor, projection=projection)
+
+
+async def estimate_sweet_count() -> int:
+    """
+    Estimate the number of sweets from collection metadata.
+    
+    Returns:
+        Approximate total number of sweets
+    """
+    return await Sweet.get_motor_collection().estimated_document_count()
+
+
+def _text_condition(field: str, value: str, match: str) -> Tuple[str, dict]:
+    """
+    Build the condition matching a text field in the given mode.
+    
+    User input is always escaped, so it is matched literally and can never
+    be interpreted as a regular expression.
+    
+    Args:
+        field: Field name ("name" or "category")
+        value: User supplied search text
+        match: One of MATCH_MODES
+        
+    Returns:
+        Tuple of (field to query, condition)
+    """
+    if match == MATCH_CONTAINS:
+        # Unanchored, so it cannot use an index: scans the collection
+        return field, {"$regex": re.escape(value), "$options": "i"}
+    
+    normalized = normalize_search_text(value)
+    if match == MATCH_EXACT:
+        return f"{field}_lower", {"$eq": normalized}
+    # Anchored, case-sensitive regex on the lowercased field is an index range scan
+    return f"{field}_lower", {"$regex": "^" + re.escape(normalized)}
+
+
+def build_search_query(
     name: Optional[str] = None,
     category: Optional[str] = None,
     min_price: Optional[float] = None,
-    max_price: Optional[float] = None
-) -> List[Sweet]:
+    max_price: Optional[float] = None,
+    match: str = MATCH_PREFIX
+) -> dict:
     """
-    Search sweets by various criteria.
+    Build the MongoDB filter for the sweet search criteria.
     
     Args:
-        name: Filter by name (case-insensitive partial match)
-        category: Filter by category (case-insensitive partial match)
+        name: Filter by name (case-insensitive)
+        category: Filter by category (case-insensitive)
         min_price: Minimum price filter
         max_price: Maximum price filter
+        match: How name/category are matched: "exact", "prefix" or "contains"
         
     Returns:
-        List of matching sweets
+        MongoDB query document
+        
+    Raises:
+        HTTPException: If the match mode is unknown
     """
+    if match not in MATCH_MODES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported match mode: {match}"
+        )
+    
     query = {}
     
     if name:
-        query["name"] = {"$regex": name, "$options": "i"}
+        field, condition = _text_condition("name", name, match)
+        query[field] = condition
     
     if category:
-        query["category"] = {"$regex": category, "$options": "i"}
+        field, condition = _text_condition("category", category, match)
+        query[field] = condition
     
     if min_price is not None or max_price is not None:
         price_query = {}
@@ -67,7 +330,237 @@ async def search_sweets(
             price_query["$lte"] = max_price
         query["price"] = price_query
     
-    return await Sweet.find(query).to_list()
+    return query
+
+
+def search_time_limit(name: Optional[str], category: Optional[str], match: str) -> Optional[int]:
+    """
+    Get the server-side time limit for a search.
+    
+    Only the "contains" mode runs unanchored regexes that cannot use the
+    indexes, so only it is bounded.
+    
+    Args:
+        name: Name filter
+        category: Category filter
+        match: Match mode
+        
+    Returns:
+        Limit in milliseconds, or None for no limit
+    """
+    if match == MATCH_CONTAINS and (name or category):
+        return settings.search_contains_max_time_ms
+    return None
+
+
+async def search_sweets(
+    name: Optional[str] = None,
+    category: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    limit: int = settings.page_size_default,
+    cursor: Optional[str] = None,
+    match: str = MATCH_PREFIX,
+    projection: Optional[dict] = None
+) -> Tuple[List[dict], Optional[str]]:
+    """
+    Search sweets by various criteria.
+    
+    Prefix and exact matching use the indexed lowercase fields. Contains
+    matching cannot use an index, so it runs with a server-side time limit.
+    Results are served from the search cache when possible.
+    
+    Args:
+        name: Filter by name (case-insensitive)
+        category: Filter by category (case-insensitive)
+        min_price: Minimum price filter
+        max_price: Maximum price filter
+        limit: Maximum number of sweets to return
+        cursor: Cursor from the previous page
+        match: How name/category are matched: "exact", "prefix" or "contains"
+        projection: Optional projection from build_projection
+        
+    Returns:
+        Tuple of (matching raw sweet documents, next page cursor or None)
+    """
+    query = build_search_query(name, category, min_price, max_price, match)
+    max_time_ms = search_time_limit(name, category, match)
+    
+    key = search_key("filter", query, limit, cursor=cursor, projection=projection)
+    return await search_cache.get_or_load(
+        key, lambda: _find_page(query, limit, cursor, max_time_ms, projection)
+    )
+
+
+async def text_search_sweets(
+    text: str,
+    name: Optional[str] = None,
+    category: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    limit: int = settings.page_size_default,
+    cursor: Optional[str] = None,
+    match: str = MATCH_PREFIX,
+    projection: Optional[dict] = None
+) -> Tuple[List[dict], Optional[str]]:
+    """
+    Full-text search over name, category and description, ranked by relevance.
+    
+    Uses the weighted text index and can be combined with the regular
+    search filters, which are applied in the same query. Runs with a
+    server-side time limit, since ranking sorts every match in memory.
+    Results are served from the search cache when possible.
+    
+    Pages are addressed by offset, so a result can be skipped or repeated
+    across pages if the catalog changes in between.
+    
+    Args:
+        text: Words to search for
+        name: Filter by name (case-insensitive)
+        category: Filter by category (case-insensitive)
+        min_price: Minimum price filter
+        max_price: Maximum price filter
+        limit: Maximum number of sweets to return
+        cursor: Cursor from the previous page
+        match: How name/category filters are matched
+        projection: Optional projection from build_projection
+        
+    Returns:
+        Tuple of (best matching raw sweet documents with a ``score`` key,
+        highest relevance first; next page cursor or None)
+    """
+    query = build_search_query(name, category, min_price, max_price, match)
+    query["$text"] = {"$search": text}
+    offset = decode_rank_cursor(cursor) if cursor else 0
+    
+    key = search_key("text", query, limit, cursor=cursor, projection=projection)
+    return await search_cache.get_or_load(
+        key, lambda: _find_ranked(query, limit, offset, projection)
+    )
+
+
+async def _find_ranked(
+    query: dict,
+    limit: int,
+    offset: int,
+    projection: Optional[dict]
+) -> Tuple[List[dict], Optional[str]]:
+    """
+    Fetch one page of a full-text query, best matches first.
+    
+    Args:
+        query: Filter including a ``$text`` clause
+        limit: Maximum number of sweets to return
+        offset: Number of better matches returned on previous pages
+        projection: Optional projection; defaults to READ_PROJECTION
+        
+    Returns:
+        Tuple of (raw sweet documents with a ``score`` key, cursor for the
+        next page or None)
+        
+    Raises:
+        HTTPException: If the query exceeds its time limit
+    """
+    score = {"$meta": "textScore"}
+    # Fetch one extra document to learn whether another page exists
+    try:
+        sweets = await Sweet.get_motor_collection().find(
+            query,
+            {**(projection or READ_PROJECTION), "score": score},
+            max_time_ms=settings.search_text_max_time_ms
+        ).sort([("score", score), ("_id", 1)]).skip(offset).limit(limit + 1).to_list(length=None)
+    except ExecutionTimeout:
+        raise _search_timeout()
+    
+    next_cursor = None
+    if len(sweets) > limit:
+        sweets = sweets[:limit]
+        next_cursor = encode_rank_cursor(offset + limit)
+    return sweets, next_cursor
+
+
+async def backfill_search_fields() -> int:
+    """
+    Populate the normalized search fields on sweets that lack them.
+    
+    Returns:
+        Number of sweets updated
+    """
+    result = await Sweet.get_motor_collection().update_many(
+        {"$or": [{"name_lower": None}, {"category_lower": None}]},
+        [{
+            "$set": {
+                "name_lower": {"$trim": {"input": {"$toLower": "$name"}}},
+                "category_lower": {"$trim": {"input": {"$toLower": "$category"}}}
+            }
+        }]
+    )
+    return result.modified_count
+
+
+async def get_sweet_document(sweet_id: str, projection: dict) -> dict:
+    """
+    Get the projected fields of a sweet as a raw document.
+    
+    Args:
+        sweet_id: Sweet ID
+        projection: Projection from build_projection
+        
+    Returns:
+        Raw document holding only the projected fields
+        
+    Raises:
+        HTTPException: If sweet not found
+    """
+    document = await Sweet.get_motor_collection().find_one(
+        {"_id": _parse_sweet_id(sweet_id)}, projection
+    )
+    if document is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Sweet not found"
+        )
+    return document
+
+
+async def get_sweet_version(sweet_id: str) -> Optional[int]:
+    """
+    Read only the version of a sweet, for cheap conditional requests.
+    
+    Args:
+        sweet_id: Sweet ID
+        
+    Returns:
+        Current version, or None if the sweet does not exist
+    """
+    document = await Sweet.get_motor_collection().find_one(
+        {"_id": _parse_sweet_id(sweet_id)}, {"version": 1}
+    )
+    if document is None:
+        return None
+    return document.get("version", 0)
+
+
+def _parse_sweet_id(sweet_id: str) -> PydanticObjectId:
+    """
+    Convert a sweet ID string into an ObjectId.
+    
+    Args:
+        sweet_id: Sweet ID
+        
+    Returns:
+        Parsed ObjectId
+        
+    Raises:
+        HTTPException: If the ID is not a valid ObjectId
+    """
+    try:
+        return PydanticObjectId(sweet_id)
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Sweet not found"
+        )
 
 
 async def get_sweet_by_id(sweet_id: str) -> Sweet:
@@ -98,28 +591,85 @@ async def get_sweet_by_id(sweet_id: str) -> Sweet:
         )
 
 
-async def update_sweet(sweet_id: str, sweet_data: SweetUpdate) -> Sweet:
+# SweetUpdate fields that may be explicitly cleared with null
+NULLABLE_FIELDS = {"description", "image_url"}
+
+
+def _version_filter(expected_version: int) -> dict:
+    """
+    Build the filter clause matching a given sweet version.
+    
+    Documents written before versioning was introduced have no
+    ``version`` field, which is treated as version 0.
+    
+    Args:
+        expected_version: Version the client last saw
+        
+    Returns:
+        Query fragment for the ``version`` field
+    """
+    if expected_version == 0:
+        return {"$in": [0, None]}
+    return expected_version
+
+
+async def update_sweet(
+    sweet_id: str,
+    sweet_data: SweetUpdate,
+    expected_version: Optional[int] = None
+) -> Sweet:
     """
     Update a sweet.
     
+    Only the provided fields are written, in a single ``$set`` that also
+    refreshes ``updated_at`` and bumps ``version``.
+    
     Args:
         sweet_id: Sweet ID
         sweet_data: Sweet update data
+        expected_version: If given, only update when the stored version matches
         
     Returns:
         Updated sweet document
         
     Raises:
-        HTTPException: If sweet not found
+        HTTPException: If sweet not found or the version precondition fails
     """
-    sweet = await get_sweet_by_id(sweet_id)
+    object_id = _parse_sweet_id(sweet_id)
     
     # Update only provided fields
-    update_data = sweet_data.model_dump(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(sweet, field, value)
+    update_data = {
+        field: value
+        for field, value in sweet_data.model_dump(exclude_unset=True).items()
+        if value is not None or field in NULLABLE_FIELDS
+    }
+    for field in ("name", "category"):
+        if field in update_data:
+            update_data[f"{field}_lower"] = normalize_search_text(update_data[field])
+    update_data["updated_at"] = datetime.utcnow()
+    
+    query = {"_id": object_id}
+    if expected_version is not None:
+        query["version"] = _version_filter(expected_version)
     
-    await sweet.save()
+    # The previous state is needed to update the analytics rollups; the new
+    # one follows from it and the fields written
+    previous = await Sweet.find_one(query).update(
+        {"$set": update_data, "$inc": {"version": 1}},
+        response_type=UpdateResponse.OLD_DOCUMENT
+    )
+    
+    if previous is None:
+        current = await get_sweet_by_id(sweet_id)
+        raise HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED,
+            detail=f"Sweet was modified concurrently. Current version: {current.version}"
+        )
+    
+    sweet = previous.model_copy(update={**update_data, "version": previous.version + 1})
+    analytics_service.record_change(previous, sweet)
+    catalog_changed()
+    inventory_feed.publish(upsert_delta(sweet))
     return sweet
 
 
@@ -127,6 +677,10 @@ async def delete_sweet(sweet_id: str) -> dict:
     """
     Delete a sweet.
     
+    The delete returns the document it removed, so the analytics are
+    updated from exactly what was deleted, and only by the one request
+    that deleted it.
+    
     Args:
         sweet_id: Sweet ID
         
@@ -136,8 +690,18 @@ async def delete_sweet(sweet_id: str) -> dict:
     Raises:
         HTTPException: If sweet not found
     """
-    sweet = await get_sweet_by_id(sweet_id)
-    await sweet.delete()
+    document = await Sweet.get_motor_collection().find_one_and_delete(
+        {"_id": _parse_sweet_id(sweet_id)}
+    )
+    if document is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Sweet not found"
+        )
+    sweet = Sweet.model_validate(document)
+    analytics_service.record_change(sweet, None)
+    catalog_changed()
+    inventory_feed.publish(delete_delta(str(sweet.id)))
     return {"message": "Sweet deleted successfully"}
 
 
@@ -145,6 +709,9 @@ async def purchase_sweet(sweet_id: str, quantity: int) -> Sweet:
     """
     Purchase a sweet (decrease quantity).
     
+    The stock check and the decrement are a single conditional
+    find-and-update, so concurrent purchases can never oversell.
+    
     Args:
         sweet_id: Sweet ID
         quantity: Quantity to purchase
@@ -155,23 +722,353 @@ async def purchase_sweet(sweet_id: str, quantity: int) -> Sweet:
     Raises:
         HTTPException: If sweet not found or insufficient quantity
     """
-    sweet = await get_sweet_by_id(sweet_id)
+    object_id = _parse_sweet_id(sweet_id)
     
-    if sweet.quantity < quantity:
+    sweet = await Sweet.find_one(
+        {"_id": object_id, "quantity": {"$gte": quantity}}
+    ).update(
+        {
+            "$inc": {"quantity": -quantity, "version": 1},
+            "$set": {"updated_at": datetime.utcnow()}
+        },
+        response_type=UpdateResponse.NEW_DOCUMENT
+    )
+    
+    if sweet is None:
+        # Only the failure path pays for a second read, to tell
+        # "not found" apart from "not enough stock"
+        current = await get_sweet_by_id(sweet_id)
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Insufficient quantity. Available: {sweet.quantity}, Requested: {quantity}"
+            detail=f"Insufficient quantity. Available: {current.quantity}, Requested: {quantity}"
         )
     
-    sweet.quantity -= quantity
-    await sweet.save()
+    analytics_service.record_change(
+        sweet.model_copy(update={"quantity": sweet.quantity + quantity}), sweet
+    )
+    catalog_changed()
+    inventory_feed.publish(stock_delta(sweet))
     return sweet
 
 
+# Attempts at applying a coalesced purchase before giving up on contention
+COALESCED_PURCHASE_ATTEMPTS = 3
+
+
+async def purchase_sweet_many(sweet_id: str, quantities: List[int]) -> Tuple[Sweet, List[bool]]:
+    """
+    Apply several purchases of one sweet as a single conditional decrement.
+    
+    Stock is allocated first come, first served: purchases are accepted in
+    the order of ``quantities`` up to the first one that does not fit, and
+    that one and every later one are rejected, so a small late purchase
+    never takes stock ahead of a larger earlier one. The common case where
+    everything fits is one write.
+    
+    Args:
+        sweet_id: Sweet ID
+        quantities: Requested quantities, in arrival order
+        
+    Returns:
+        Tuple of (sweet after the write, whether each purchase was accepted)
+        
+    Raises:
+        HTTPException: If the sweet is not found or stock kept changing
+    """
+    object_id = _parse_sweet_id(sweet_id)
+    accepted = [True] * len(quantities)
+    total = sum(quantities)
+    
+    for _ in range(COALESCED_PURCHASE_ATTEMPTS):
+        sweet = await Sweet.find_one(
+            {"_id": object_id, "quantity": {"$gte": total}}
+        ).update(
+            {
+                "$inc": {"quantity": -total, "version": 1},
+                "$set": {"updated_at": datetime.utcnow()}
+            },
+            response_type=UpdateResponse.NEW_DOCUMENT
+        )
+        if sweet is not None:
+            break
+        
+        # Not everything fits: accept the purchases up to the first that does not
+        current = await get_sweet_by_id(sweet_id)
+        total = 0
+        fits = True
+        for index, quantity in enumerate(quantities):
+            fits = fits and total + quantity <= current.quantity
+            accepted[index] = fits
+            if fits:
+                total += quantity
+        if total == 0:
+            return current, accepted
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Inventory changed during checkout, please retry"
+        )
+    
+    analytics_service.record_change(
+        sweet.model_copy(update={"quantity": sweet.quantity + total}), sweet
+    )
+    catalog_changed()
+    inventory_feed.publish(stock_delta(sweet))
+    return sweet, accepted
+
+
+async def _supports_transactions() -> bool:
+    """
+    Check whether the connected MongoDB deployment supports transactions.
+    
+    Returns:
+        True for replica sets and sharded clusters, False for standalone servers
+    """
+    global _transactions_supported
+    if _transactions_supported is None:
+        client = Sweet.get_motor_collection().database.client
+        hello = await client.admin.command("hello")
+        _transactions_supported = "setName" in hello or hello.get("msg") == "isdbgrid"
+    return _transactions_supported
+
+
+async def _raise_batch_failure(quantities: Dict[PydanticObjectId, int]) -> None:
+    """
+    Raise the error explaining why a batch purchase could not be applied.
+    
+    Args:
+        quantities: Requested quantity per sweet ID
+        
+    Raises:
+        HTTPException: 404 for a missing sweet, 400 for insufficient quantity
+    """
+    found = {
+        sweet.id: sweet
+        for sweet in await Sweet.find({"_id": {"$in": list(quantities)}}).to_list()
+    }
+    for object_id, quantity in quantities.items():
+        sweet = found.get(object_id)
+        if sweet is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Sweet not found: {object_id}"
+            )
+        if sweet.quantity < quantity:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Insufficient quantity for {sweet.name}. Available: {sweet.quantity}, Requested: {quantity}"
+            )
+    # Stock was restored between the failed write and this check
+    raise HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail="Inventory changed during checkout, please retry"
+    )
+
+
+async def purchase_sweets(items: List[PurchaseItem]) -> List[Sweet]:
+    """
+    Purchase several sweets as one all-or-nothing order.
+    
+    On a replica set all decrements are sent as a single bulk write inside
+    a transaction, retried on transient errors. On a standalone server the
+    order is journaled and applied line by line (see
+    _purchase_without_transaction).
+    
+    Args:
+        items: Order lines (sweet ID and quantity)
+        
+    Returns:
+        Updated sweet documents, in the order the sweets first appear in ``items``
+        
+    Raises:
+        HTTPException: If any sweet is not found or has insufficient quantity
+    """
+    # Merge repeated lines for the same sweet into one decrement
+    quantities: Dict[PydanticObjectId, int] = {}
+    for item in items:
+        object_id = _parse_sweet_id(item.sweet_id)
+        quantities[object_id] = quantities.get(object_id, 0) + item.quantity
+    
+    now = datetime.utcnow()
+    updates = [
+        (
+            {"_id": object_id, "quantity": {"$gte": quantity}},
+            {"$inc": {"quantity": -quantity, "version": 1}, "$set": {"updated_at": now}}
+        )
+        for object_id, quantity in quantities.items()
+    ]
+    collection = Sweet.get_motor_collection()
+    
+    if await _supports_transactions():
+        async def apply_order(session) -> List[Sweet]:
+            result = await collection.bulk_write(
+                [UpdateOne(query, update) for query, update in updates],
+                ordered=True,
+                session=session
+            )
+            if result.matched_count != len(updates):
+                await session.abort_transaction()
+                await _raise_batch_failure(quantities)
+            return await Sweet.find(
+                {"_id": {"$in": list(quantities)}}, session=session
+            ).to_list()
+        
+        # with_transaction retries the whole order on transient errors such
+        # as write conflicts with concurrent orders for the same sweets
+        async with await collection.database.client.start_session() as session:
+            sweets = await session.with_transaction(apply_order)
+    else:
+        sweets = await _purchase_without_transaction(updates, quantities)
+    
+    for sweet in sweets:
+        analytics_service.record_change(
+            sweet.model_copy(update={"quantity": sweet.quantity + quantities[sweet.id]}), sweet
+        )
+    catalog_changed()
+    for sweet in sweets:
+        inventory_feed.publish(stock_delta(sweet))
+    by_id = {sweet.id: sweet for sweet in sweets}
+    return [by_id[object_id] for object_id in quantities if object_id in by_id]
+
+
+def _orders():
+    """Get the collection journaling batch orders applied without a transaction."""
+    return Sweet.get_motor_collection().database[ORDER_COLLECTION]
+
+
+async def _purchase_without_transaction(
+    updates: List[Tuple[dict, dict]],
+    quantities: Dict[PydanticObjectId, int]
+) -> List[Sweet]:
+    """
+    Apply a batch order line by line, journaled so it can be rolled back.
+    
+    The order is recorded before any stock is taken, and each decrement
+    tags its sweet with the order's ID in the same write. If a line fails
+    the tagged lines are restored right away; if the worker dies first,
+    recover_pending_orders restores them once the order's lease expires.
+    Other requests can see the order partly applied while it runs.
+    
+    Args:
+        updates: Conditional decrement (query, update) of each line
+        quantities: Requested quantity per sweet ID
+        
+    Returns:
+        Updated sweet documents
+        
+    Raises:
+        HTTPException: If any line cannot be applied, or the order outlived
+            its lease and was rolled back
+    """
+    collection = Sweet.get_motor_collection()
+    order_id = uuid.uuid4().hex
+    order = {
+        "_id": order_id,
+        "lines": [
+            {"sweet_id": object_id, "quantity": quantity}
+            for object_id, quantity in quantities.items()
+        ],
+        "expires_at": datetime.utcnow() + timedelta(seconds=settings.purchase_order_lease_seconds),
+    }
+    await _orders().insert_one(order)
+    for query, update in updates:
+        result = await collection.update_one(
+            query, {**update, "$addToSet": {PENDING_ORDERS_FIELD: order_id}}
+        )
+        if result.matched_count == 0:
+            await _roll_back_order(order)
+            await _raise_batch_failure(quantities)
+    
+    # Only complete an order that no recovery has started rolling back
+    result = await _orders().delete_one({"_id": order_id, "recovering": {"$exists": False}})
+    if result.deleted_count != 1:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Order took too long and was rolled back, please retry"
+        )
+    await collection.update_many(
+        {"_id": {"$in": list(quantities)}},
+        {"$pull": {PENDING_ORDERS_FIELD: order_id}}
+    )
+    return await Sweet.find({"_id": {"$in": list(quantities)}}).to_list()
+
+
+async def _roll_back_order(order: dict) -> None:
+    """
+    Restore the stock a journaled order took and drop its journal entry.
+    
+    Each line is restored only if its sweet is still tagged with the order,
+    so rolling back twice (e.g. by two recovering workers) is harmless.
+    
+    Args:
+        order: Journal entry of the order
+    """
+    for line in order["lines"]:
+        sweet = await Sweet.find_one(
+            {"_id": line["sweet_id"], PENDING_ORDERS_FIELD: order["_id"]}
+        ).update(
+            {
+                "$inc": {"quantity": line["quantity"], "version": 1},
+                "$pull": {PENDING_ORDERS_FIELD: order["_id"]},
+                "$set": {"updated_at": datetime.utcnow()}
+            },
+            response_type=UpdateResponse.NEW_DOCUMENT
+        )
+        if sweet is not None:
+            catalog_changed()
+            inventory_feed.publish(stock_delta(sweet))
+    await _orders().delete_one({"_id": order["_id"]})
+
+
+async def recover_pending_orders() -> int:
+    """
+    Roll back journaled batch orders whose worker died before finishing.
+    
+    An order is only touched once its lease has expired. It is first
+    marked as recovering, so its worker, if it is merely slow, fails the
+    order instead of completing it.
+    
+    Returns:
+        Number of orders rolled back
+    """
+    recovered = 0
+    while True:
+        order = await _orders().find_one_and_update(
+            {"expires_at": {"$lt": datetime.utcnow()}},
+            {"$set": {"recovering": True}}
+        )
+        if order is None:
+            return recovered
+        await _roll_back_order(order)
+        recovered += 1
+
+
+async def run_order_recovery(interval_seconds: float) -> None:
+    """
+    Recover abandoned batch orders now and then every ``interval_seconds``.
+    
+    Runs until cancelled; errors are reported and retried next interval.
+    
+    Args:
+        interval_seconds: Time between runs
+    """
+    while True:
+        try:
+            recovered = await recover_pending_orders()
+            if recovered:
+                print(f"Batch purchases: rolled back {recovered} abandoned orders")
+        except Exception as error:
+            print(f"Batch purchase recovery failed: {error}")
+        await asyncio.sleep(interval_seconds)
+
+
 async def restock_sweet(sweet_id: str, quantity: int) -> Sweet:
     """
     Restock a sweet (increase quantity).
     
+    The increment is applied server-side with ``$inc``, so concurrent
+    restocks and purchases never overwrite each other.
+    
     Args:
         sweet_id: Sweet ID
         quantity: Quantity to add
@@ -182,7 +1079,25 @@ async def restock_sweet(sweet_id: str, quantity: int) -> Sweet:
     Raises:
         HTTPException: If sweet not found
     """
-    sweet = await get_sweet_by_id(sweet_id)
-    sweet.quantity += quantity
-    await sweet.save()
+    object_id = _parse_sweet_id(sweet_id)
+    
+    sweet = await Sweet.find_one({"_id": object_id}).update(
+        {
+            "$inc": {"quantity": quantity, "version": 1},
+            "$set": {"updated_at": datetime.utcnow()}
+        },
+        response_type=UpdateResponse.NEW_DOCUMENT
+    )
+    
+    if sweet is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Sweet not found"
+        )
+    
+    analytics_service.record_change(
+        sweet.model_copy(update={"quantity": sweet.quantity - quantity}), sweet
+    )
+    catalog_changed()
+    inventory_feed.publish(stock_delta(sweet))
     return sweet
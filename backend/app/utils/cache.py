@@ -0,0 +1,98 @@
+"""
+Bounded in-process cache with TTL expiry and LRU eviction.
+"""
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+
+class TTLCache:
+    """
+    Mapping with a maximum size and per-entry expiry.
+    
+    Expired entries are dropped when they are looked up; when the cache is
+    full the least recently used entry is evicted. Not thread-safe, which
+    is fine for use from a single asyncio event loop.
+    """
+    
+    def __init__(self, maxsize: int, ttl: float, timer: Callable[[], float] = time.monotonic):
+        """
+        Create a cache.
+        
+        Args:
+            maxsize: Maximum number of entries kept
+            ttl: Default time to live of an entry, in seconds
+            timer: Monotonic clock, replaceable in tests
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.timer = timer
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Look up a key, counting a hit or a miss.
+        
+        Args:
+            key: Cache key
+            default: Value returned when the key is missing or expired
+            
+        Returns:
+            Cached value or default
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > self.timer():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._entries[key]
+        self.misses += 1
+        return default
+    
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """
+        Store a value, evicting the least recently used entry if full.
+        
+        Args:
+            key: Cache key
+            value: Value to store
+            ttl: Time to live in seconds, defaults to the cache TTL
+        """
+        if self.maxsize <= 0:
+            return
+        self._entries[key] = (self.timer() + (self.ttl if ttl is None else ttl), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+    
+    def pop(self, key: Hashable) -> None:
+        """Remove a key if present."""
+        self._entries.pop(key, None)
+    
+    def clear(self) -> None:
+        """Remove all entries."""
+        self._entries.clear()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def stats(self) -> dict:
+        """
+        Report cache counters.
+        
+        Returns:
+            Dict with hits, misses, evictions, size and maxsize
+        """
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+        }
@@ -0,0 +1,71 @@
+"""
+Content-coding negotiation and compression for pre-encoded responses.
+"""
+import gzip
+from typing import Optional
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is optional
+    brotli = None
+
+IDENTITY = "identity"
+GZIP = "gzip"
+BROTLI = "br"
+
+# Codings offered to clients, most preferred first
+SUPPORTED_ENCODINGS = ([BROTLI] if brotli is not None else []) + [GZIP]
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> str:
+    """
+    Pick the content coding for a response from an Accept-Encoding header.
+    
+    Args:
+        accept_encoding: Raw Accept-Encoding header value
+        
+    Returns:
+        "br", "gzip" or "identity"
+    """
+    if not accept_encoding:
+        return IDENTITY
+    
+    accepted = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip().lower()] = quality
+    
+    wildcard = accepted.get("*")
+    for coding in SUPPORTED_ENCODINGS:
+        quality = accepted.get(coding, wildcard)
+        if quality:
+            return coding
+    return IDENTITY
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    """
+    Encode a response body with the given content coding.
+    
+    Args:
+        body: Uncompressed body
+        encoding: "br", "gzip" or "identity"
+        
+    Returns:
+        Encoded body
+    """
+    if encoding == BROTLI:
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    if encoding == GZIP:
+        return gzip.compress(body, compresslevel=GZIP_LEVEL)
+    return body
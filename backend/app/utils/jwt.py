@@ -1,10 +1,16 @@
 """
 JWT token utilities for authentication.
 """
+import hashlib
+import time
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
 from app.config.database import settings
+from app.utils.cache import TTLCache
+
+# Verified payloads by token digest; each entry lives until its token's exp
+token_cache = TTLCache(maxsize=settings.token_cache_size, ttl=0)
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
@@ -35,14 +41,27 @@ def decode_access_token(token: str) -> Optional[dict]:
     """
     Decode and verify a JWT access token.
     
+    Successfully verified tokens are memoized until they expire, so a
+    client reusing its token only pays for a hash lookup.
+    
     Args:
         token: JWT token to decode
         
     Returns:
         Decoded token data or None if invalid
     """
+    digest = hashlib.sha256(token.encode()).digest()
+    payload = token_cache.get(digest)
+    if payload is not None:
+        return dict(payload)
+    
     try:
         payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
-        return payload
     except JWTError:
         return None
+    
+    # Only tokens with an expiry are cached, and never past it
+    expires_in = payload.get("exp", 0) - time.time()
+    if expires_in > 0:
+        token_cache.set(digest, payload, ttl=expires_in)
+    return dict(payload)
@@ -1,10 +1,43 @@
 """
 Password hashing utilities using passlib.
 """
+import asyncio
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
 from passlib.context import CryptContext
+from app.config.database import settings
+
+
+def build_crypt_context(rounds: Optional[int] = None) -> CryptContext:
+    """
+    Build the password hashing context.
+    
+    With an explicit cost, hashes made with any other cost are reported as
+    needing an update, so they get rehashed on the next successful login.
+    
+    Args:
+        rounds: bcrypt cost (log2 rounds), or None for the library default
+        
+    Returns:
+        Configured CryptContext
+    """
+    if rounds is None:
+        return CryptContext(schemes=["bcrypt"], deprecated="auto")
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__default_rounds=rounds,
+        bcrypt__min_rounds=rounds,
+        bcrypt__max_rounds=rounds
+    )
+
 
 # Password hashing context
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = build_crypt_context(settings.bcrypt_rounds)
+
+# Pool that runs bcrypt so it never blocks the event loop, created on first use
+_executor: Optional[Executor] = None
 
 
 def hash_password(password: str) -> str:
@@ -41,3 +74,238 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
         hashed_password = str(hashed_password)
     return pwd_context.verify(plain_password, hashed_password)
 
+
+def get_password_executor() -> Executor:
+    """
+    Get the pool used for password hashing, creating it on first use.
+    
+    bcrypt releases the GIL, so a thread pool gives real parallelism; a
+    process pool can be configured to keep hashing off this process entirely.
+    
+    Returns:
+        Thread or process pool executor
+    """
+    global _executor
+    if _executor is None:
+        if settings.password_hash_executor == "process":
+            _executor = ProcessPoolExecutor(max_workers=settings.password_hash_workers)
+        else:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.password_hash_workers,
+                thread_name_prefix="password-hash"
+            )
+    return _executor
+
+
+def shutdown_password_executor() -> None:
+    """Shut down the password hashing pool, if it was started."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def verify_and_update_password(
+    plain_password: str,
+    hashed_password: str
+) -> Tuple[bool, Optional[str]]:
+    """
+    Verify a password and rehash it if its cost is out of date.
+    
+    Args:
+        plain_password: Plain text password
+        hashed_password: Hashed password to verify against
+        
+    Returns:
+        Tuple of (password matches, new hash or None if no rehash is needed)
+    """
+    if not isinstance(plain_password, str):
+        plain_password = str(plain_password)
+    if not isinstance(hashed_password, str):
+        hashed_password = str(hashed_password)
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
+def calibrate_bcrypt_rounds(
+    target_seconds: float,
+    min_rounds: int = 8,
+    max_rounds: int = 16,
+    samples: int = 3
+) -> Tuple[int, Dict[int, float]]:
+    """
+    Find the highest bcrypt cost whose hash time fits a time budget.
+    
+    Each extra round doubles the work, so costs are measured in increasing
+    order and measuring stops once the budget is exceeded.
+    
+    Args:
+        target_seconds: Time budget for one hash on this host
+        min_rounds: Lowest cost considered (returned even if over budget)
+        max_rounds: Highest cost considered
+        samples: Hashes timed per cost; the fastest is used
+        
+    Returns:
+        Tuple of (chosen cost, measured seconds per cost)
+    """
+    timings: Dict[int, float] = {}
+    chosen = min_rounds
+    for rounds in range(min_rounds, max_rounds + 1):
+        context = build_crypt_context(rounds)
+        durations = []
+        for _ in range(samples):
+            started = time.perf_counter()
+            context.hash("calibration-password")
+            durations.append(time.perf_counter() - started)
+        timings[rounds] = min(durations)
+        if timings[rounds] > target_seconds:
+            break
+        chosen = rounds
+    return chosen, timings
+
+
+class HashingOverloaded(Exception):
+    """Raised when the password hashing queue is full."""
+
+
+class HashAdmission:
+    """
+    Bounded admission control for password hashing work.
+    
+    At most ``concurrency`` hashes run at once and at most ``queue_depth``
+    wait for a free slot; further requests are rejected immediately
+    instead of queueing unbounded CPU work.
+    """
+    
+    def __init__(self, concurrency: int, queue_depth: int):
+        """
+        Create an admission controller.
+        
+        Args:
+            concurrency: Maximum hashes running at once
+            queue_depth: Maximum hashes waiting for a slot
+        """
+        self.concurrency = concurrency
+        self.queue_depth = queue_depth
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self.waiting = 0
+        self.running = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+    
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        """
+        Run a hashing function in the password pool once a slot is free.
+        
+        Args:
+            func: Synchronous hashing function
+            *args: Arguments for func
+            
+        Returns:
+            The function's result
+            
+        Raises:
+            HashingOverloaded: If all slots are busy and the queue is full
+        """
+        if self._semaphore.locked() and self.waiting >= self.queue_depth:
+            self.rejected += 1
+            raise HashingOverloaded()
+        
+        started = time.monotonic()
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        
+        waited = time.monotonic() - started
+        self.admitted += 1
+        self.wait_seconds_total += waited
+        self.wait_seconds_max = max(self.wait_seconds_max, waited)
+        
+        self.running += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(get_password_executor(), func, *args)
+        finally:
+            self.running -= 1
+            self._semaphore.release()
+    
+    def stats(self) -> dict:
+        """
+        Report admission counters and queue wait times.
+        
+        Returns:
+            Dict of counters, current queue state and wait times in seconds
+        """
+        return {
+            "concurrency": self.concurrency,
+            "queue_depth": self.queue_depth,
+            "running": self.running,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "wait_seconds_avg": self.wait_seconds_total / self.admitted if self.admitted else 0.0,
+            "wait_seconds_max": self.wait_seconds_max,
+        }
+
+
+# Concurrency matches the pool size so work never queues inside the executor
+password_admission = HashAdmission(
+    concurrency=settings.password_hash_workers,
+    queue_depth=settings.password_hash_queue_depth
+)
+
+
+async def hash_password_async(password: str) -> str:
+    """
+    Hash a plain password without blocking the event loop.
+    
+    Args:
+        password: Plain text password
+        
+    Returns:
+        Hashed password
+        
+    Raises:
+        HashingOverloaded: If the hashing queue is full
+    """
+    return await password_admission.run(hash_password, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """
+    Verify a password against a hash without blocking the event loop.
+    
+    Args:
+        plain_password: Plain text password
+        hashed_password: Hashed password to verify against
+        
+    Returns:
+        True if password matches, False otherwise
+        
+    Raises:
+        HashingOverloaded: If the hashing queue is full
+    """
+    return await password_admission.run(verify_password, plain_password, hashed_password)
+
+
+async def verify_and_update_password_async(
+    plain_password: str,
+    hashed_password: str
+) -> Tuple[bool, Optional[str]]:
+    """
+    Verify a password, rehashing an outdated hash, without blocking the event loop.
+    
+    Args:
+        plain_password: Plain text password
+        hashed_password: Hashed password to verify against
+        
+    Returns:
+        Tuple of (password matches, new hash or None if no rehash is needed)
+        
+    Raises:
+        HashingOverloaded: If the hashing queue is full
+    """
+    return await password_admission.run(verify_and_update_password, plain_password, hashed_password)
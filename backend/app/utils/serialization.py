@@ -0,0 +1,127 @@
+"""
+Fast JSON serialization for sweet responses.
+
+Handlers build plain dicts straight from stored documents and return them
+in an orjson-encoded response, skipping the SweetResponse construction,
+response_model re-validation and stdlib json encoding passes.
+"""
+from typing import Any, Optional
+import orjson
+from bson import ObjectId
+from fastapi.responses import ORJSONResponse
+from app.models.sweet import Sweet
+
+# Response fields other than the ID, with their defaults for documents
+# written before the field existed
+SWEET_FIELD_DEFAULTS = {
+    "name": None,
+    "category": None,
+    "price": None,
+    "quantity": 0,
+    "description": None,
+    "image_url": None,
+    "created_at": None,
+    "updated_at": None,
+    "version": 0,
+}
+
+
+def _default(value: Any) -> Any:
+    """Encode types orjson does not handle natively."""
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def encode_json(content: Any) -> bytes:
+    """
+    Encode content as JSON with orjson.
+    
+    Args:
+        content: Dicts/lists from sweet_to_dict or document_to_dict
+        
+    Returns:
+        UTF-8 JSON bytes
+    """
+    return orjson.dumps(content, default=_default)
+
+
+class FastJSONResponse(ORJSONResponse):
+    """FastAPI's orjson response, also encoding ObjectId."""
+    
+    def render(self, content: Any) -> bytes:
+        # Same options as ORJSONResponse, plus the ObjectId hook
+        return orjson.dumps(
+            content,
+            default=_default,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        )
+
+
+def sweet_to_dict(sweet: Sweet) -> dict:
+    """
+    Build the API representation of a Sweet document.
+    
+    Args:
+        sweet: Sweet document
+        
+    Returns:
+        Dict with the SweetResponse fields
+    """
+    return {
+        "id": str(sweet.id),
+        "name": sweet.name,
+        "category": sweet.category,
+        "price": sweet.price,
+        "quantity": sweet.quantity,
+        "description": sweet.description,
+        "image_url": sweet.image_url,
+        "created_at": sweet.created_at,
+        "updated_at": sweet.updated_at,
+        "version": sweet.version,
+    }
+
+
+def document_to_dict(document: dict, sparse: bool = False) -> dict:
+    """
+    Build the API representation of a raw sweet document.
+    
+    Args:
+        document: Raw MongoDB document
+        sparse: Only include fields present in the document (projected
+            reads); otherwise missing fields get their defaults
+        
+    Returns:
+        Dict with ``_id`` exposed as ``id`` and the response fields
+    """
+    item = {"id": str(document["_id"])}
+    if sparse:
+        for field in SWEET_FIELD_DEFAULTS:
+            if field in document:
+                item[field] = document[field]
+    else:
+        for field, default in SWEET_FIELD_DEFAULTS.items():
+            item[field] = document.get(field, default)
+    if "score" in document:
+        item["score"] = document["score"]
+    return item
+
+
+def sweets_response(
+    content: Any,
+    headers: Optional[dict] = None,
+    status_code: int = 200
+) -> FastJSONResponse:
+    """
+    Wrap already-serialized sweet dicts in a fast JSON response.
+    
+    Args:
+        content: A dict from sweet_to_dict/document_to_dict or a list of them
+        headers: Extra response headers
+        status_code: HTTP status code
+        
+    Returns:
+        orjson-encoded response
+    """
+    return FastJSONResponse(content=content, headers=headers, status_code=status_code)
+
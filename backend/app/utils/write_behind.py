@@ -0,0 +1,115 @@
+"""
+Write-behind batching of counters kept in the database.
+
+Shared counters (the catalog version, the analytics rollups) would
+otherwise cost every request an extra awaited write to the same hot
+document. Changes are recorded in memory instead and written in one batch
+shortly after, off the request path.
+"""
+import asyncio
+from typing import Awaitable, Callable, Optional
+
+
+class WriteBehind:
+    """
+    Schedules batched flushes of changes buffered by its owner.
+    
+    The owner buffers a change, then calls mark(). A background flush runs
+    ``delay`` seconds after the first unflushed change and writes every
+    change buffered by then. A reader that must see all changes recorded
+    so far calls sync(), which flushes right away and waits for it.
+    
+    The flush callback takes the buffered changes and writes them; if the
+    write fails it must put them back so the next flush retries them.
+    """
+    
+    def __init__(self, delay: float, flush: Callable[[], Awaitable[None]], name: str):
+        """
+        Create a write-behind scheduler.
+        
+        Args:
+            delay: Seconds a change may wait before it is written
+            flush: Coroutine function writing the buffered changes
+            name: Label used when reporting failed flushes
+        """
+        self.delay = delay
+        self.name = name
+        self._flush = flush
+        self._task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Future] = None
+        self.recorded = 0
+        self.flushed = 0
+        self.flushes = 0
+        self.failures = 0
+    
+    def mark(self) -> None:
+        """Note that a change was buffered, scheduling a flush if none is."""
+        self.recorded += 1
+        if self._task is None:
+            self._schedule()
+    
+    def _schedule(self) -> None:
+        """Start the background flush, with a future that can cut its delay short."""
+        self._wake = asyncio.get_running_loop().create_future()
+        self._task = asyncio.ensure_future(self._run(self._wake))
+    
+    async def _run(self, wake: asyncio.Future) -> Optional[Exception]:
+        """
+        Wait out the delay (or a sync) and flush.
+        
+        Args:
+            wake: Future resolved by sync() to flush without waiting
+        
+        Returns:
+            The error of a failed flush, None on success
+        """
+        await asyncio.wait([wake], timeout=self.delay)
+        
+        target = self.recorded
+        error = None
+        try:
+            await self._flush()
+            self.flushed = target
+            self.flushes += 1
+        except Exception as flush_error:
+            error = flush_error
+            self.failures += 1
+            print(f"{self.name} flush failed: {flush_error}")
+        finally:
+            self._task = None
+            # Changes recorded during the flush, or put back by a failed one
+            if self.recorded > self.flushed:
+                self._schedule()
+        return error
+    
+    async def sync(self) -> None:
+        """
+        Flush every change recorded so far and wait until it is written.
+        
+        Raises:
+            Exception: The error of the flush, if it failed
+        """
+        target = self.recorded
+        while self.flushed < target:
+            if self._task is None:
+                self._schedule()
+            task = self._task
+            if not self._wake.done():
+                self._wake.set_result(None)
+            # Shielded so a disconnecting reader does not cancel the flush
+            error = await asyncio.shield(task)
+            if error is not None:
+                raise error
+    
+    def stats(self) -> dict:
+        """
+        Report flush counters.
+        
+        Returns:
+            Dict with unflushed changes, completed flushes and failures
+        """
+        return {
+            "pending": self.recorded - self.flushed,
+            "flushes": self.flushes,
+            "failures": self.failures,
+        }
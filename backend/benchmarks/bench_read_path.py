@@ -0,0 +1,90 @@
+"""
+Benchmark the raw-document read path against Beanie model construction.
+
+Seeds a scratch ``<DATABASE_NAME>_bench`` database on the MongoDB server
+from .env, then times reading one page of sweets both ways:
+
+- before: ``Sweet.find(...).to_list()`` (one validated Beanie model per
+  document), then sweet_to_dict
+- after:  sweets_service.get_all_sweets (raw Motor documents with the read
+  projection), then document_to_dict
+
+The scratch database is dropped afterwards.
+
+Usage (from the backend directory):
+    python benchmarks/bench_read_path.py [--items 1000] [--repeat 20]
+"""
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+from typing import Awaitable, Callable
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.config import database  # noqa: E402
+from app.models.sweet import Sweet  # noqa: E402
+from app.services import sweets_service  # noqa: E402
+from app.utils.serialization import document_to_dict, sweet_to_dict  # noqa: E402
+
+
+async def seed(count: int) -> None:
+    """Insert ``count`` sweets into the scratch database."""
+    await Sweet.insert_many([
+        Sweet(
+            name=f"Sweet {i}",
+            category="Chocolate",
+            price=2.99,
+            quantity=100,
+            description="Delicious milk chocolate bar with hazelnuts",
+            image_url="https://example.com/chocolate.jpg"
+        )
+        for i in range(count)
+    ])
+
+
+async def measure(read: Callable[[], Awaitable[int]], repeat: int) -> float:
+    """Return the best per-item time in microseconds over several runs."""
+    best = float("inf")
+    count = 1
+    for _ in range(repeat):
+        started = time.perf_counter()
+        count = max(await read(), 1)
+        best = min(best, time.perf_counter() - started)
+    return best / count * 1_000_000
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=1000, help="Sweets per page")
+    parser.add_argument("--repeat", type=int, default=20, help="Runs per path")
+    args = parser.parse_args()
+    
+    database.settings.database_name = f"{database.settings.database_name}_bench"
+    await database.connect_to_mongo()
+    try:
+        await Sweet.get_motor_collection().delete_many({})
+        await seed(args.items)
+        
+        async def beanie_read() -> int:
+            sweets = await Sweet.find({}).sort("+_id").limit(args.items).to_list()
+            return len([sweet_to_dict(sweet) for sweet in sweets])
+        
+        async def raw_read() -> int:
+            documents, _ = await sweets_service.get_all_sweets(limit=args.items)
+            return len([document_to_dict(document) for document in documents])
+        
+        before_us = await measure(beanie_read, args.repeat)
+        after_us = await measure(raw_read, args.repeat)
+        
+        print(f"items per page: {args.items}")
+        print(f"before: {before_us:8.2f} us/item")
+        print(f"after:  {after_us:8.2f} us/item  ({before_us / after_us:.1f}x faster)")
+    finally:
+        await database.mongo_client.drop_database(database.settings.database_name)
+        await database.close_mongo_connection()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
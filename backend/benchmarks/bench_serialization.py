@@ -0,0 +1,106 @@
+"""
+Benchmark the per-item cost of serializing sweet list responses.
+
+Compares the previous pipeline (SweetResponse built field by field,
+re-validated through response_model and encoded with the stdlib json
+encoder) against the shared orjson serializer in app.utils.serialization.
+No database is needed.
+
+Usage (from the backend directory):
+    python benchmarks/bench_serialization.py [--items 1000] [--repeat 20]
+"""
+import argparse
+import asyncio
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import List
+
+from bson import ObjectId
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fastapi.responses import JSONResponse  # noqa: E402
+from fastapi.routing import serialize_response  # noqa: E402
+from fastapi.utils import create_response_field  # noqa: E402
+from app.models.sweet import Sweet  # noqa: E402
+from app.schemas.sweet import SweetResponse  # noqa: E402
+from app.utils.serialization import sweet_to_dict, sweets_response  # noqa: E402
+
+
+def make_sweets(count: int) -> List[Sweet]:
+    """Build in-memory Sweet documents without touching the database."""
+    now = datetime.utcnow()
+    return [
+        Sweet.model_construct(
+            id=ObjectId(),
+            name=f"Sweet {i}",
+            category="Chocolate",
+            price=2.99,
+            quantity=100,
+            description="Delicious milk chocolate bar with hazelnuts",
+            image_url="https://example.com/chocolate.jpg",
+            created_at=now,
+            updated_at=now,
+            version=3,
+        )
+        for i in range(count)
+    ]
+
+
+async def before(sweets: List[Sweet], field) -> bytes:
+    """Previous pipeline: DTO construction, response_model validation, stdlib json."""
+    content = [
+        SweetResponse(
+            id=str(sweet.id),
+            name=sweet.name,
+            category=sweet.category,
+            price=sweet.price,
+            quantity=sweet.quantity,
+            description=sweet.description,
+            image_url=sweet.image_url,
+            created_at=sweet.created_at,
+            updated_at=sweet.updated_at,
+            version=sweet.version
+        )
+        for sweet in sweets
+    ]
+    serialized = await serialize_response(field=field, response_content=content)
+    return JSONResponse(serialized).body
+
+
+async def after(sweets: List[Sweet], field) -> bytes:
+    """Current pipeline: plain dicts encoded once with orjson."""
+    return sweets_response([sweet_to_dict(sweet) for sweet in sweets]).body
+
+
+async def measure(func, sweets: List[Sweet], field, repeat: int) -> float:
+    """Return the best per-item time in microseconds over several runs."""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await func(sweets, field)
+        best = min(best, time.perf_counter() - started)
+    return best / len(sweets) * 1_000_000
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=1000, help="Sweets per response")
+    parser.add_argument("--repeat", type=int, default=20, help="Runs per pipeline")
+    args = parser.parse_args()
+    
+    sweets = make_sweets(args.items)
+    field = create_response_field(name="bench_response", type_=List[SweetResponse])
+    
+    before_us = await measure(before, sweets, field, args.repeat)
+    after_us = await measure(after, sweets, field, args.repeat)
+    
+    print(f"items per response: {args.items}")
+    print(f"before: {before_us:8.2f} us/item")
+    print(f"after:  {after_us:8.2f} us/item  ({before_us / after_us:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
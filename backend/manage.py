@@ -0,0 +1,166 @@
+"""
+Command line tools for administering the Sweet Shop backend.
+
+Usage:
+    python manage.py import-sweets catalog.ndjson
+    python manage.py import-sweets catalog.csv --format csv --upsert
+    python manage.py explain-indexes
+    python manage.py calibrate-bcrypt --target-ms 250
+    python manage.py reconcile-analytics
+"""
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+from typing import AsyncIterator
+
+from app.config.database import connect_to_mongo, close_mongo_connection
+
+# Bytes read from disk per chunk when streaming files
+READ_CHUNK_BYTES = 64 * 1024
+
+
+async def read_file_chunks(path: Path) -> AsyncIterator[bytes]:
+    """Yield a file's contents in fixed-size chunks."""
+    with path.open("rb") as f:
+        while chunk := f.read(READ_CHUNK_BYTES):
+            yield chunk
+
+
+async def import_sweets_command(args: argparse.Namespace) -> int:
+    """Stream a catalog file into the sweets collection."""
+    from app.services.import_service import import_sweets
+    
+    path = Path(args.file)
+    fmt = args.format or ("csv" if path.suffix.lower() == ".csv" else "ndjson")
+    
+    result = await import_sweets(read_file_chunks(path), format=fmt, upsert=args.upsert)
+    
+    print(f"Processed: {result.processed}")
+    print(f"Inserted:  {result.inserted}")
+    print(f"Updated:   {result.updated}")
+    print(f"Failed:    {result.failed}")
+    for error in result.errors:
+        print(f"  row {error.row}: {error.error}")
+    return 1 if result.failed else 0
+
+
+def collect_plan_indexes(plan: dict) -> list:
+    """Walk a query plan tree and list the index names (or COLLSCAN/SORT) it uses."""
+    found = []
+    stage = plan.get("stage")
+    if stage == "IXSCAN":
+        found.append(plan.get("indexName"))
+    elif stage == "COLLSCAN":
+        found.append("COLLSCAN")
+    elif stage == "SORT":
+        # Blocking in-memory sort: the index does not deliver _id order
+        found.append("SORT")
+    for child_key in ("inputStage", "queryPlan"):
+        if child_key in plan:
+            found.extend(collect_plan_indexes(plan[child_key]))
+    for child in plan.get("inputStages", []):
+        found.extend(collect_plan_indexes(child))
+    return found
+
+
+async def explain_indexes_command(args: argparse.Namespace) -> int:
+    """Report which indexes the planner picks for each search shape."""
+    from app.models.sweet import Sweet
+    from app.services.sweets_service import build_search_query
+    
+    shapes = {
+        "list": {},
+        "name (prefix)": {"name": "chocolate"},
+        "name (exact)": {"name": "chocolate bar", "match": "exact"},
+        "name (contains)": {"name": "chocolate", "match": "contains"},
+        "category": {"category": "Chocolate"},
+        "category (exact)": {"category": "Chocolate", "match": "exact"},
+        "price range": {"min_price": 1.0, "max_price": 5.0},
+        "category + price range": {"category": "Chocolate", "min_price": 1.0, "max_price": 5.0},
+        "category (exact) + price": {"category": "Chocolate", "min_price": 1.0, "max_price": 5.0, "match": "exact"},
+    }
+    
+    collection = Sweet.get_motor_collection()
+    for shape, params in shapes.items():
+        query = build_search_query(**params)
+        # Same sort and limit as the paginated endpoints
+        explain = await collection.find(query).sort("_id", 1).limit(args.limit).explain()
+        winning_plan = explain["queryPlanner"]["winningPlan"]
+        indexes = collect_plan_indexes(winning_plan) or ["(none)"]
+        print(f"{shape:<24} {', '.join(indexes)}")
+    return 0
+
+
+async def calibrate_bcrypt_command(args: argparse.Namespace) -> int:
+    """Measure bcrypt on this host and recommend a cost for the time budget."""
+    from app.utils.password import calibrate_bcrypt_rounds
+    
+    rounds, timings = calibrate_bcrypt_rounds(
+        args.target_ms / 1000, min_rounds=args.min_rounds, max_rounds=args.max_rounds
+    )
+    for measured_rounds, seconds in timings.items():
+        marker = " <-" if measured_rounds == rounds else ""
+        print(f"rounds={measured_rounds:<3} {seconds * 1000:8.1f} ms{marker}")
+    print(f"\nSet BCRYPT_ROUNDS={rounds} to target {args.target_ms} ms per hash.")
+    print("Existing hashes are upgraded on each user's next successful login.")
+    return 0
+
+
+async def reconcile_analytics_command(args: argparse.Namespace) -> int:
+    """Recompute the inventory analytics rollups from the sweets."""
+    from app.services.analytics_service import reconcile
+    
+    corrected = await reconcile()
+    print(f"Corrected {corrected} categories")
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Build the command line parser."""
+    parser = argparse.ArgumentParser(description="Sweet Shop admin commands")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    
+    import_parser = subparsers.add_parser("import-sweets", help="Bulk import sweets from NDJSON or CSV")
+    import_parser.add_argument("file", help="Path to the catalog file")
+    import_parser.add_argument("--format", choices=["ndjson", "csv"], help="File format (default: from extension)")
+    import_parser.add_argument("--upsert", action="store_true", help="Update existing sweets matched by name")
+    import_parser.set_defaults(handler=import_sweets_command)
+    
+    explain_parser = subparsers.add_parser("explain-indexes", help="Show which indexes each search shape uses")
+    explain_parser.add_argument("--limit", type=int, default=100, help="Page size to explain with")
+    explain_parser.set_defaults(handler=explain_indexes_command)
+    
+    calibrate_parser = subparsers.add_parser("calibrate-bcrypt", help="Choose a bcrypt cost for a hash time budget")
+    calibrate_parser.add_argument("--target-ms", type=float, default=250, help="Time budget per hash in milliseconds")
+    calibrate_parser.add_argument("--min-rounds", type=int, default=8, help="Lowest cost considered")
+    calibrate_parser.add_argument("--max-rounds", type=int, default=16, help="Highest cost considered")
+    calibrate_parser.set_defaults(handler=calibrate_bcrypt_command, needs_db=False)
+    
+    reconcile_parser = subparsers.add_parser("reconcile-analytics", help="Recompute the inventory analytics rollups")
+    reconcile_parser.set_defaults(handler=reconcile_analytics_command)
+    
+    return parser
+
+
+async def main(argv=None) -> int:
+    """Run the selected command against the configured database."""
+    args = build_parser().parse_args(argv)
+    if not getattr(args, "needs_db", True):
+        return await args.handler(args)
+    
+    await connect_to_mongo()
+    try:
+        return await args.handler(args)
+    finally:
+        from app.services.analytics_service import rollup_buffer
+        from app.services.catalog_service import catalog_version
+        
+        # Write batched counters before the connection goes away
+        await catalog_version.sync()
+        await rollup_buffer.sync()
+        await close_mongo_connection()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
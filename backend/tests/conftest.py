@@ -9,6 +9,7 @@ from beanie import init_beanie
 from motor.motor_asyncio import AsyncIOMotorClient
 from app.models.user import User
 from app.models.sweet import Sweet
+from app.models.idempotency import IdempotencyRecord
 
 
 # Test database configuration
@@ -35,14 +36,37 @@ async def test_db():
     # Initialize Beanie with test database
     await init_beanie(
         database=database,
-        document_models=[User, Sweet]
+        document_models=[User, Sweet, IdempotencyRecord]
     )
     
     yield database
     
+    # Write batched counters now, not into the next test's database state
+    from app.services.analytics_service import rollup_buffer
+    from app.services.catalog_service import catalog_version
+    await catalog_version.sync()
+    await rollup_buffer.sync()
+    
     # Clean up: drop all collections after each test
     await User.delete_all()
     await Sweet.delete_all()
+    await IdempotencyRecord.delete_all()
+    await database["catalog_state"].delete_many({})
+    catalog_version.clear()
+    await database["inventory_rollups"].delete_many({})
+    await database["inventory_rollup_lease"].delete_many({})
+    await database["purchase_orders"].delete_many({})
+    
+    # Bulk deletes bypass document hooks, so reset in-process caches too
+    from app.services.auth_service import invalidate_cached_users
+    from app.services.revocation_service import revocation_list
+    from app.services.catalog_service import search_cache
+    from app.services.snapshot_service import catalog_snapshot
+    invalidate_cached_users()
+    search_cache.clear()
+    catalog_snapshot.clear()
+    revocation_list.refreshed_at = None
+    revocation_list.deleted.clear()
     
     client.close()
 
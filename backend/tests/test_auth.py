@@ -142,3 +142,176 @@ async def test_login_nonexistent_user(client: AsyncClient):
     
     assert response.status_code == 401
     assert "incorrect" in response.json()["detail"].lower()
+
+
+@pytest.mark.asyncio
+async def test_cached_user_invalidated_on_role_change(client: AsyncClient):
+    """Test demoting an admin takes effect despite the user cache."""
+    from app.models.user import User
+    
+    await client.post(
+        "/api/auth/register",
+        json={"email": "admin@example.com", "password": "password123", "name": "Admin"}
+    )
+    user = await User.find_one(User.email == "admin@example.com")
+    user.role = "admin"
+    await user.save()
+    
+    response = await client.post(
+        "/api/auth/login",
+        json={"email": "admin@example.com", "password": "password123"}
+    )
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    
+    # Admin access populates the cache
+    response = await client.get("/api/admin/metrics", headers=headers)
+    assert response.status_code == 200
+    response = await client.get("/api/admin/metrics", headers=headers)
+    assert response.json()["user_cache"]["hits"] >= 1
+    
+    # Demote the user; the cached admin must not be served any more
+    user = await User.find_one(User.email == "admin@example.com")
+    user.role = "user"
+    await user.save()
+    
+    response = await client.get("/api/admin/metrics", headers=headers)
+    assert response.status_code == 403
+
+
+@pytest.mark.asyncio
+async def test_stateless_mode_honours_revocations(client: AsyncClient, monkeypatch):
+    """Test stateless auth trusts claims but rejects demoted and disabled users."""
+    from app.config.database import settings
+    from app.models.user import User
+    
+    monkeypatch.setattr(settings, "auth_stateless", True)
+    
+    await client.post(
+        "/api/auth/register",
+        json={"email": "admin@example.com", "password": "password123", "name": "Admin"}
+    )
+    user = await User.find_one(User.email == "admin@example.com")
+    user.role = "admin"
+    await user.save()
+    
+    response = await client.post(
+        "/api/auth/login",
+        json={"email": "admin@example.com", "password": "password123"}
+    )
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    
+    response = await client.get("/api/admin/metrics", headers=headers)
+    assert response.status_code == 200
+    
+    # Demoted: the admin claim in the token is no longer honoured
+    user.role = "user"
+    await user.save()
+    response = await client.get("/api/admin/metrics", headers=headers)
+    assert response.status_code == 403
+    response = await client.get("/api/sweets", headers=headers)
+    assert response.status_code == 200
+    
+    # Disabled: the token is rejected outright
+    user.is_active = False
+    await user.save()
+    response = await client.get("/api/sweets", headers=headers)
+    assert response.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_login_fails_fast_when_hashing_saturated(client: AsyncClient, monkeypatch):
+    """Test login returns 503 with Retry-After when hashing is saturated."""
+    from app.utils.password import password_admission
+    
+    await client.post(
+        "/api/auth/register",
+        json={"email": "user@example.com", "password": "password123", "name": "User"}
+    )
+    
+    # Simulate every slot busy and the queue full
+    monkeypatch.setattr(password_admission, "queue_depth", 0)
+    monkeypatch.setattr(password_admission._semaphore, "locked", lambda: True)
+    
+    response = await client.post(
+        "/api/auth/login",
+        json={"email": "user@example.com", "password": "password123"}
+    )
+    
+    assert response.status_code == 503
+    assert "Retry-After" in response.headers
+
+
+@pytest.mark.asyncio
+async def test_login_rehashes_outdated_password_hash(client: AsyncClient, monkeypatch):
+    """Test a successful login upgrades a hash made with an old bcrypt cost."""
+    from app.models.user import User
+    from app.utils import password
+    
+    monkeypatch.setattr(password, "pwd_context", password.build_crypt_context(4))
+    await client.post(
+        "/api/auth/register",
+        json={"email": "user@example.com", "password": "password123", "name": "User"}
+    )
+    
+    monkeypatch.setattr(password, "pwd_context", password.build_crypt_context(5))
+    response = await client.post(
+        "/api/auth/login",
+        json={"email": "user@example.com", "password": "password123"}
+    )
+    assert response.status_code == 200
+    
+    user = await User.find_one(User.email == "user@example.com")
+    assert user.password_hash.startswith("$2b$05$")
+
+
+@pytest.mark.asyncio
+async def test_stream_accepts_token_in_query_string(client: AsyncClient):
+    """Test the event stream's auth takes the token from the query string, for EventSource."""
+    from fastapi import HTTPException
+    from app.middleware.auth import get_stream_user
+    
+    await client.post(
+        "/api/auth/register",
+        json={"email": "stream@example.com", "password": "password123", "name": "User"}
+    )
+    response = await client.post(
+        "/api/auth/login",
+        json={"email": "stream@example.com", "password": "password123"}
+    )
+    token = response.json()["access_token"]
+    
+    user = await get_stream_user(credentials=None, access_token=token)
+    assert user.email == "stream@example.com"
+    
+    with pytest.raises(HTTPException) as error:
+        await get_stream_user(credentials=None, access_token="not-a-token")
+    assert error.value.status_code == 401
+    
+    with pytest.raises(HTTPException) as error:
+        await get_stream_user(credentials=None, access_token=None)
+    assert error.value.status_code == 403
+
+
+@pytest.mark.asyncio
+async def test_bulk_user_update_needs_explicit_invalidation(client: AsyncClient):
+    """Test a query-level user update is seen once the user cache is invalidated."""
+    from app.models.user import User
+    from app.services.auth_service import invalidate_cached_users
+    
+    await client.post(
+        "/api/auth/register",
+        json={"email": "bulk@example.com", "password": "password123", "name": "Bulk"}
+    )
+    response = await client.post(
+        "/api/auth/login",
+        json={"email": "bulk@example.com", "password": "password123"}
+    )
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    assert (await client.get("/api/sweets", headers=headers)).status_code == 200
+    
+    # Bypasses the User hooks, so the cached user is still served
+    await User.find(User.email == "bulk@example.com").update({"$set": {"is_active": False}})
+    assert (await client.get("/api/sweets", headers=headers)).status_code == 200
+    
+    invalidate_cached_users()
+    assert (await client.get("/api/sweets", headers=headers)).status_code == 401
@@ -0,0 +1,58 @@
+"""
+Tests for the TTL/LRU cache utility.
+"""
+from app.utils.cache import TTLCache
+
+
+class FakeTimer:
+    """Manually advanced clock."""
+    
+    def __init__(self):
+        self.now = 0.0
+    
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_cache_hit_and_miss_counters():
+    """Test hits and misses are counted."""
+    cache = TTLCache(maxsize=10, ttl=60)
+    
+    assert cache.get("a") is None
+    cache.set("a", 1)
+    assert cache.get("a") == 1
+    
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_cache_entries_expire():
+    """Test entries are dropped after their TTL."""
+    timer = FakeTimer()
+    cache = TTLCache(maxsize=10, ttl=60, timer=timer)
+    
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=5)
+    timer.now = 10
+    
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    
+    timer.now = 61
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_cache_evicts_least_recently_used():
+    """Test the least recently used entry is evicted when full."""
+    cache = TTLCache(maxsize=2, ttl=60)
+    
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
@@ -0,0 +1,31 @@
+"""
+Tests for content-coding negotiation.
+"""
+import gzip
+from app.utils import compression
+from app.utils.compression import compress, negotiate_encoding
+
+# Coding picked when the client accepts brotli; falls back without the module
+BEST = "br" if compression.brotli is not None else "gzip"
+
+
+def test_negotiate_encoding_prefers_brotli_then_gzip():
+    """Test the best supported coding is picked."""
+    assert negotiate_encoding("gzip, deflate, br") == BEST
+    assert negotiate_encoding("gzip, deflate") == "gzip"
+    assert negotiate_encoding("deflate") == "identity"
+    assert negotiate_encoding(None) == "identity"
+
+
+def test_negotiate_encoding_honours_quality_values():
+    """Test codings refused with q=0 are never picked."""
+    assert negotiate_encoding("br;q=0, gzip") == "gzip"
+    assert negotiate_encoding("*;q=0") == "identity"
+    assert negotiate_encoding("*") == BEST
+
+
+def test_compress_gzip_round_trip():
+    """Test gzip bodies decompress to the original."""
+    body = b'[{"name": "Candy"}]' * 50
+    assert gzip.decompress(compress(body, "gzip")) == body
+    assert compress(body, "identity") is body
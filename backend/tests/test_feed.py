@@ -0,0 +1,61 @@
+"""
+Tests for the live inventory feed.
+"""
+import pytest
+from app.services.feed_service import InventoryBroadcaster, sse_events
+
+
+def stock(sweet_id: str, quantity: int) -> dict:
+    return {"op": "stock", "id": sweet_id, "quantity": quantity, "price": 1.0, "version": quantity}
+
+
+@pytest.mark.asyncio
+async def test_feed_coalesces_updates_to_same_sweet():
+    """Test rapid changes to one sweet reach a client as a single delta."""
+    broadcaster = InventoryBroadcaster(max_pending=10)
+    subscriber = broadcaster.subscribe()
+    
+    broadcaster.publish({"op": "upsert", "id": "a", "name": "Candy", "quantity": 5, "price": 1.0, "version": 0})
+    broadcaster.publish(stock("a", 4))
+    broadcaster.publish(stock("a", 3))
+    broadcaster.publish(stock("b", 9))
+    
+    batch = await subscriber.next_batch(timeout=1)
+    assert len(batch) == 2
+    assert batch[0] == {"op": "upsert", "id": "a", "name": "Candy", "quantity": 3, "price": 1.0, "version": 3}
+    assert batch[1]["quantity"] == 9
+
+
+@pytest.mark.asyncio
+async def test_feed_drops_slow_consumer():
+    """Test a client with too many unsent changes is dropped, others are not."""
+    broadcaster = InventoryBroadcaster(max_pending=2)
+    events = sse_events(broadcaster, heartbeat_seconds=1)
+    assert await events.__anext__() == b"retry: 3000\n\n"
+    fast = broadcaster.subscribe()
+    
+    for i in range(3):
+        broadcaster.publish(stock(str(i), 1))
+        if i < 2:
+            await fast.next_batch(timeout=1)
+    
+    assert not fast.dropped
+    assert broadcaster.stats() == {"subscribers": 1, "published": 3, "dropped": 1}
+    
+    assert await events.__anext__() == b"event: reset\ndata: {}\n\n"
+    with pytest.raises(StopAsyncIteration):
+        await events.__anext__()
+
+
+@pytest.mark.asyncio
+async def test_feed_stream_unsubscribes_when_closed():
+    """Test a stream that is never read has no subscriber, and a closed one removes its own."""
+    broadcaster = InventoryBroadcaster(max_pending=2)
+    events = sse_events(broadcaster, heartbeat_seconds=1)
+    assert broadcaster.stats()["subscribers"] == 0
+    
+    await events.__anext__()
+    assert broadcaster.stats()["subscribers"] == 1
+    await events.aclose()
+    assert broadcaster.stats()["subscribers"] == 0
+
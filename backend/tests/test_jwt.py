@@ -0,0 +1,28 @@
+"""
+Tests for JWT token utilities.
+"""
+from datetime import timedelta
+from app.utils.jwt import create_access_token, decode_access_token, token_cache
+
+
+def test_decode_access_token_is_memoized():
+    """Test a reused token is served from the token cache."""
+    token = create_access_token({"sub": "user@example.com", "role": "user"})
+    hits = token_cache.hits
+    
+    first = decode_access_token(token)
+    second = decode_access_token(token)
+    
+    assert first == second
+    assert first["sub"] == "user@example.com"
+    assert token_cache.hits == hits + 1
+
+
+def test_decode_access_token_rejects_invalid_and_expired():
+    """Test invalid and expired tokens are neither accepted nor cached."""
+    expired = create_access_token({"sub": "user@example.com"}, expires_delta=timedelta(seconds=-1))
+    size = len(token_cache)
+    
+    assert decode_access_token("not-a-token") is None
+    assert decode_access_token(expired) is None
+    assert len(token_cache) == size
@@ -0,0 +1,65 @@
+"""
+Tests for password hashing utilities.
+"""
+import pytest
+from app.utils.password import hash_password_async, verify_password_async
+
+
+@pytest.mark.asyncio
+async def test_async_hash_and_verify_roundtrip():
+    """Test the executor-backed password API hashes and verifies."""
+    password_hash = await hash_password_async("password123")
+    
+    assert password_hash != "password123"
+    assert await verify_password_async("password123", password_hash) is True
+    assert await verify_password_async("wrong-password", password_hash) is False
+
+
+@pytest.mark.asyncio
+async def test_hash_admission_rejects_when_queue_full():
+    """Test work beyond concurrency plus queue depth is rejected immediately."""
+    import asyncio
+    import time
+    from app.utils.password import HashAdmission, HashingOverloaded
+    
+    admission = HashAdmission(concurrency=1, queue_depth=1)
+    
+    running = asyncio.create_task(admission.run(time.sleep, 0.2))
+    await asyncio.sleep(0.05)
+    queued = asyncio.create_task(admission.run(time.sleep, 0))
+    await asyncio.sleep(0)
+    
+    with pytest.raises(HashingOverloaded):
+        await admission.run(time.sleep, 0)
+    
+    await asyncio.gather(running, queued)
+    stats = admission.stats()
+    assert stats["admitted"] == 2
+    assert stats["rejected"] == 1
+    assert stats["wait_seconds_max"] > 0
+
+
+def test_verify_and_update_rehashes_outdated_cost(monkeypatch):
+    """Test hashes with a different cost are flagged for rehashing."""
+    from app.utils import password
+    
+    old_hash = password.build_crypt_context(4).hash("password123")
+    monkeypatch.setattr(password, "pwd_context", password.build_crypt_context(5))
+    
+    valid, new_hash = password.verify_and_update_password("password123", old_hash)
+    assert valid is True
+    assert new_hash.startswith("$2b$05$")
+    
+    valid, new_hash = password.verify_and_update_password("password123", new_hash)
+    assert valid is True
+    assert new_hash is None
+
+
+def test_calibrate_bcrypt_rounds_respects_budget():
+    """Test calibration picks the cheapest cost when the budget is tiny."""
+    from app.utils.password import calibrate_bcrypt_rounds
+    
+    rounds, timings = calibrate_bcrypt_rounds(0, min_rounds=4, max_rounds=6, samples=1)
+    
+    assert rounds == 4
+    assert list(timings) == [4]
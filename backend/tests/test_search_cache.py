@@ -0,0 +1,51 @@
+"""
+Tests for the search result cache.
+"""
+import asyncio
+import pytest
+from app.services.catalog_service import SearchCache, search_key
+
+
+@pytest.mark.asyncio
+async def test_search_cache_collapses_concurrent_misses():
+    """Test identical concurrent misses run the query once."""
+    cache = SearchCache(maxsize=10, ttl=60)
+    calls = 0
+    
+    async def load():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return ["result"]
+    
+    key = search_key("filter", {"category_lower": "candy"}, 10)
+    results = await asyncio.gather(*[cache.get_or_load(key, load) for _ in range(5)])
+    
+    assert calls == 1
+    assert all(result == ["result"] for result in results)
+    assert cache.stats()["coalesced"] == 4
+    
+    # Served from the cache afterwards
+    await cache.get_or_load(key, load)
+    assert calls == 1
+
+
+@pytest.mark.asyncio
+async def test_search_cache_bump_invalidates():
+    """Test a catalog change drops cached results and stale in-flight loads."""
+    cache = SearchCache(maxsize=10, ttl=60)
+    key = search_key("filter", {}, 10)
+    
+    async def load_during_write():
+        cache.bump()
+        return "stale"
+    
+    assert await cache.get_or_load(key, load_during_write) == "stale"
+    assert len(cache._results) == 0
+    
+    async def load():
+        return "fresh"
+    
+    assert await cache.get_or_load(key, load) == "fresh"
+    cache.bump()
+    assert len(cache._results) == 0
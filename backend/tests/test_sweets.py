@@ -356,3 +356,1189 @@ async def test_restock_sweet_admin_only(client: AsyncClient):
     assert response.status_code == 200
     data = response.json()
     assert data["quantity"] == 60  # 10 + 50
+
+
+@pytest.mark.asyncio
+async def test_purchase_sweet_concurrent_does_not_oversell(client: AsyncClient):
+    """Test concurrent purchases never take stock below zero."""
+    import asyncio
+    
+    token = await get_auth_token(client)
+    
+    # Create a sweet with limited quantity
+    create_response = await client.post(
+        "/api/sweets",
+        json={"name": "Candy", "category": "Candy", "price": 1.99, "quantity": 5},
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    sweet_id = create_response.json()["id"]
+    
+    # Fire more purchases than there is stock
+    responses = await asyncio.gather(*[
+        client.post(
+            f"/api/sweets/{sweet_id}/purchase",
+            json={"quantity": 1},
+            headers={"Authorization": f"Bearer {token}"}
+        )
+        for _ in range(10)
+    ])
+    
+    succeeded = [r for r in responses if r.status_code == 200]
+    rejected = [r for r in responses if r.status_code == 400]
+    assert len(succeeded) == 5
+    assert len(rejected) == 5
+    assert "available: 0" in rejected[0].json()["detail"].lower()
+
+
+@pytest.mark.asyncio
+async def test_purchase_sweet_not_found(client: AsyncClient):
+    """Test purchasing a missing sweet returns 404."""
+    token = await get_auth_token(client)
+    
+    response = await client.post(
+        "/api/sweets/000000000000000000000000/purchase",
+        json={"quantity": 1},
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_update_sweet_if_match_rejects_stale_version(client: AsyncClient):
+    """Test updating with a stale If-Match version fails with 412."""
+    token = await get_auth_token(client)
+    
+    # Create a sweet
+    create_response = await client.post(
+        "/api/sweets",
+        json={"name": "Original Name", "category": "Candy", "price": 1.99, "quantity": 50},
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    created = create_response.json()
+    sweet_id = created["id"]
+    
+    # First update with the current version succeeds and bumps it
+    response = await client.put(
+        f"/api/sweets/{sweet_id}",
+        json={"price": 2.49},
+        headers={"Authorization": f"Bearer {token}", "If-Match": f'"{created["version"]}"'}
+    )
+    assert response.status_code == 200
+    assert response.json()["version"] == created["version"] + 1
+    assert response.json()["updated_at"] != created["updated_at"]
+    
+    # Second update with the old version is rejected
+    response = await client.put(
+        f"/api/sweets/{sweet_id}",
+        json={"price": 3.49},
+        headers={"Authorization": f"Bearer {token}", "If-Match": f'"{created["version"]}"'}
+    )
+    assert response.status_code == 412
+
+
+@pytest.mark.asyncio
+async def test_purchase_batch_success(client: AsyncClient):
+    """Test purchasing several sweets in one order."""
+    token = await get_auth_token(client)
+    
+    # Create two sweets
+    first = await client.post(
+        "/api/sweets",
+        json={"name": "Candy", "category": "Candy", "price": 1.99, "quantity": 10},
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    second = await client.post(
+        "/api/sweets",
+        json={"name": "Toffee", "category": "Candy", "price": 0.99, "quantity": 20},
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    
+    response = await client.post(
+        "/api/sweets/purchase/batch",
+        json={"items": [
+            {"sweet_id": first.json()["id"], "quantity": 3},
+            {"sweet_id": second.json()["id"], "quantity": 5}
+        ]},
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    
+    assert response.status_code == 200
+    data = response.json()
+    assert [sweet["quantity"] for sweet in data] == [7, 15]
+
+
+@pytest.mark.asyncio
+async def test_purchase_batch_is_all_or_nothing(client: AsyncClient):
+    """Test a batch with one short line leaves all stock untouched."""
+    token = await get_auth_token(client)
+    
+    # Create two sweets, the second with limited quantity
+    first = await client.post(
+        "/api/sweets",
+        json={"name": "Candy", "category": "Candy", "price": 1.99, "quantity": 10},
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    second = await client.post(
+        "/api/sweets",
+        json={"name": "Toffee", "category": "Candy", "price": 0.99, "quantity": 2},
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    
+    response = await client.post(
+        "/api/sweets/purchase/batch",
+        json={"items": [
+            {"sweet_id": first.json()["id"], "quantity": 3},
+            {"sweet_id": second.json()["id"], "quantity": 5}
+        ]},
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    assert response.status_code == 400
+    assert "insufficient" in response.json()["detail"].lower()
+    
+    # The first line must not have been applied
+    response = await client.get(
+        "/api/sweets",
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    quantities = {sweet["name"]: sweet["quantity"] for sweet in response.json()}
+    assert quantities == {"Candy": 10, "Toffee": 2}
+
+
+@pytest.mark.asyncio
+async def test_purchase_batch_abandoned_order_is_rolled_back(client: AsyncClient, test_db, monkeypatch):
+    """Test stock taken by a batch order whose worker died is restored by recovery."""
+    from datetime import datetime, timedelta
+    from app.services import sweets_service
+    
+    token = await get_auth_token(client)
+    headers = {"Authorization": f"Bearer {token}"}
+    first = await client.post(
+        "/api/sweets",
+        json={"name": "Candy", "category": "Candy", "price": 1.99, "quantity": 10},
+        headers=headers
+    )
+    second = await client.post(
+        "/api/sweets",
+        json={"name": "Toffee", "category": "Candy", "price": 0.99, "quantity": 2},
+        headers=headers
+    )
+    
+    # The worker dies after taking the first line, before restoring it
+    async def crash(order):
+        raise ConnectionError("worker died")
+    
+    monkeypatch.setattr(sweets_service, "_roll_back_order", crash)
+    with pytest.raises(ConnectionError):
+        await client.post(
+            "/api/sweets/purchase/batch",
+            json={"items": [
+                {"sweet_id": first.json()["id"], "quantity": 3},
+                {"sweet_id": second.json()["id"], "quantity": 5}
+            ]},
+            headers=headers
+        )
+    monkeypatch.undo()
+    
+    # Not touched while the order's lease runs
+    assert await sweets_service.recover_pending_orders() == 0
+    await test_db["purchase_orders"].update_many(
+        {}, {"$set": {"expires_at": datetime.utcnow() - timedelta(seconds=1)}}
+    )
+    assert await sweets_service.recover_pending_orders() == 1
+    assert await sweets_service.recover_pending_orders() == 0
+    
+    response = await client.get("/api/sweets", headers=headers)
+    quantities = {sweet["name"]: sweet["quantity"] for sweet in response.json()}
+    assert quantities == {"Candy": 10, "Toffee": 2}
+
+
+@pytest.mark.asyncio
+async def test_import_sweets_ndjson_reports_row_errors(client: AsyncClient):
+    """Test bulk import inserts valid rows and reports invalid ones."""
+    admin_token = await get_auth_token(client, "admin@example.com", is_admin=True)
+    
+    body = "\n".join([
+        '{"name": "Candy", "category": "Candy", "price": 1.99, "quantity": 10}',
+        '{"name": "Broken", "category": "Candy", "price": -1}',
+        '{"name": "Toffee", "category": "Candy", "price": 0.99}'
+    ])
+    response = await client.post(
+        "/api/sweets/import",
+        content=body,
+        headers={"Authorization": f"Bearer {admin_token}", "Content-Type": "application/x-ndjson"}
+    )
+    
+    assert response.status_code == 200
+    data = response.json()
+    assert data["inserted"] == 2
+    assert data["failed"] == 1
+    assert data["errors"][0]["row"] == 2
+
+
+@pytest.mark.asyncio
+async def test_import_sweets_csv_upsert_by_name(client: AsyncClient):
+    """Test CSV import in upsert mode updates sweets matched by name."""
+    admin_token = await get_auth_token(client, "admin@example.com", is_admin=True)
+    
+    await client.post(
+        "/api/sweets",
+        json={"name": "Candy", "category": "Candy", "price": 1.99, "quantity": 10},
+        headers={"Authorization": f"Bearer {admin_token}"}
+    )
+    
+    body = "name,category,price,quantity\nCandy,Candy,2.49,40\nToffee,Candy,0.99,5\n"
+    response = await client.post(
+        "/api/sweets/import?format=csv&upsert=true",
+        content=body,
+        headers={"Authorization": f"Bearer {admin_token}", "Content-Type": "text/csv"}
+    )
+    
+    assert response.status_code == 200
+    data = response.json()
+    assert data["inserted"] == 1
+    assert data["updated"] == 1
+    
+    response = await client.get(
+        "/api/sweets",
+        headers={"Authorization": f"Bearer {admin_token}"}
+    )
+    sweets = {sweet["name"]: sweet for sweet in response.json()}
+    assert sweets["Candy"]["price"] == 2.49
+    assert sweets["Candy"]["quantity"] == 40
+
+
+@pytest.mark.asyncio
+async def test_import_sweets_upsert_keeps_missing_columns(client: AsyncClient):
+    """Test upserting rows without optional columns leaves them untouched."""
+    admin_token = await get_auth_token(client, "admin@example.com", is_admin=True)
+    
+    await client.post(
+        "/api/sweets",
+        json={
+            "name": "Candy", "category": "Candy", "price": 1.99, "quantity": 10,
+            "description": "Chewy", "image_url": "https://example.com/candy.png"
+        },
+        headers={"Authorization": f"Bearer {admin_token}"}
+    )
+    
+    response = await client.post(
+        "/api/sweets/import?format=csv&upsert=true",
+        content="name,category,price\ncandy,Candy,2.49\n",
+        headers={"Authorization": f"Bearer {admin_token}", "Content-Type": "text/csv"}
+    )
+    assert response.json()["updated"] == 1
+    
+    response = await client.get(
+        "/api/sweets",
+        headers={"Authorization": f"Bearer {admin_token}"}
+    )
+    [sweet] = response.json()
+    assert sweet["name"] == "Candy"
+    assert sweet["price"] == 2.49
+    assert sweet["quantity"] == 10
+    assert sweet["description"] == "Chewy"
+    assert sweet["image_url"] == "https://example.com/candy.png"
+
+
+@pytest.mark.asyncio
+async def test_import_sweets_failure_still_publishes_written_chunks(client: AsyncClient, monkeypatch):
+    """Test chunks written before an import fails are visible to cached reads."""
+    from app.services import import_service
+    
+    admin_token = await get_auth_token(client, "admin@example.com", is_admin=True)
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    
+    response = await client.get("/api/sweets", headers=headers)
+    etag = response.headers["etag"]
+    
+    write_chunk = import_service._write_chunk
+    
+    async def fail_after_first_chunk(rows, upsert, result):
+        if result.inserted:
+            raise ConnectionError("database unavailable")
+        await write_chunk(rows, upsert, result)
+    
+    monkeypatch.setattr(import_service, "_write_chunk", fail_after_first_chunk)
+    rows = [
+        f'{{"name": "Sweet {i}", "category": "Candy", "price": 1.99}}'
+        for i in range(501)
+    ]
+    with pytest.raises(ConnectionError):
+        await client.post(
+            "/api/sweets/import",
+            content="\n".join(rows),
+            headers={**headers, "Content-Type": "application/x-ndjson"}
+        )
+    
+    response = await client.get("/api/sweets", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()[0]["name"].startswith("Sweet")
+
+
+@pytest.mark.asyncio
+async def test_import_sweets_reports_overlong_line_and_continues(client: AsyncClient):
+    """Test a line over the size limit fails that row only, with counts for the rest."""
+    admin_token = await get_auth_token(client, "admin@example.com", is_admin=True)
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    
+    body = "\n".join([
+        '{"name": "Candy", "category": "Candy", "price": 1.99}',
+        "x" * (65 * 1024),
+        '{"name": "Toffee", "category": "Candy", "price": 0.99}'
+    ])
+    response = await client.post(
+        "/api/sweets/import",
+        content=body,
+        headers={**headers, "Content-Type": "application/x-ndjson"}
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert data["processed"] == 3
+    assert data["inserted"] == 2
+    assert data["failed"] == 1
+    assert data["errors"][0]["row"] == 2
+    assert "exceeds" in data["errors"][0]["error"]
+
+
+@pytest.mark.asyncio
+async def test_import_sweets_csv_quoted_line_breaks(client: AsyncClient):
+    """Test CSV fields may contain line breaks inside quotes."""
+    admin_token = await get_auth_token(client, "admin@example.com", is_admin=True)
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    
+    body = (
+        'name,category,price,description\n'
+        'Candy,Candy,1.99,"Chewy,\nand sweet"\n'
+        'Toffee,Candy,0.99,Hard\n'
+        'Fudge,Candy,abc,"Broken\nrow"\n'
+    )
+    response = await client.post(
+        "/api/sweets/import?format=csv",
+        content=body,
+        headers={**headers, "Content-Type": "text/csv"}
+    )
+    data = response.json()
+    assert data["inserted"] == 2
+    assert data["failed"] == 1
+    # Rows are numbered by the line they start on
+    assert data["errors"][0]["row"] == 5
+    
+    response = await client.get("/api/sweets", headers=headers)
+    sweets = {sweet["name"]: sweet for sweet in response.json()}
+    assert sweets["Candy"]["description"] == "Chewy,\nand sweet"
+    assert sweets["Toffee"]["description"] == "Hard"
+
+
+@pytest.mark.asyncio
+async def test_get_all_sweets_paginates_with_cursor(client: AsyncClient):
+    """Test walking the sweets list page by page with cursors."""
+    token = await get_auth_token(client)
+    
+    for i in range(5):
+        await client.post(
+            "/api/sweets",
+            json={"name": f"Sweet {i}", "category": "Candy", "price": 1.99, "quantity": 10},
+            headers={"Authorization": f"Bearer {token}"}
+        )
+    
+    names = []
+    cursor = None
+    pages = 0
+    while True:
+        params = {"limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        response = await client.get(
+            "/api/sweets",
+            params=params,
+            headers={"Authorization": f"Bearer {token}"}
+        )
+        assert response.status_code == 200
+        assert response.headers["X-Total-Count"] == "5"
+        names.extend(sweet["name"] for sweet in response.json())
+        pages += 1
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+    
+    assert pages == 3
+    assert names == [f"Sweet {i}" for i in range(5)]
+
+
+@pytest.mark.asyncio
+async def test_get_all_sweets_invalid_cursor(client: AsyncClient):
+    """Test a malformed cursor is rejected."""
+    token = await get_auth_token(client)
+    
+    response = await client.get(
+        "/api/sweets?cursor=not-a-cursor",
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_search_sweets_full_text_invalid_cursor(client: AsyncClient):
+    """Test a list cursor is not accepted for ranked results."""
+    from bson import ObjectId
+    from app.services.sweets_service import encode_cursor
+    
+    token = await get_auth_token(client)
+    for cursor in ["not-a-cursor", encode_cursor(ObjectId())]:
+        response = await client.get(
+            "/api/sweets/search",
+            params={"q": "dark", "cursor": cursor},
+            headers={"Authorization": f"Bearer {token}"}
+        )
+        assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_export_sweets_ndjson_with_filters(client: AsyncClient):
+    """Test exporting sweets as NDJSON using search filters."""
+    import json
+    
+    token = await get_auth_token(client)
+    
+    await client.post(
+        "/api/sweets",
+        json={"name": "Chocolate Bar", "category": "Chocolate", "price": 2.99, "quantity": 50},
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    await client.post(
+        "/api/sweets",
+        json={"name": "Gummy Bears", "category": "Candy", "price": 1.99, "quantity": 30},
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    
+    response = await client.get(
+        "/api/sweets/export?category=Chocolate",
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert len(rows) == 1
+    assert rows[0]["name"] == "Chocolate Bar"
+    assert "id" in rows[0]
+
+
+@pytest.mark.asyncio
+async def test_export_sweets_csv(client: AsyncClient):
+    """Test exporting sweets as CSV with a header row."""
+    token = await get_auth_token(client)
+    
+    await client.post(
+        "/api/sweets",
+        json={"name": "Chocolate Bar", "category": "Chocolate", "price": 2.99, "quantity": 50},
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    
+    response = await client.get(
+        "/api/sweets/export?format=csv",
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    
+    assert response.status_code == 200
+    lines = response.text.splitlines()
+    assert lines[0].startswith("id,name,category,price,quantity")
+    assert len(lines) == 2
+
+
+@pytest.mark.asyncio
+async def test_export_sweets_contains_match_is_time_limited(client: AsyncClient, monkeypatch):
+    """Test the contains slow path keeps its server-side time limit when exported."""
+    from app.config.database import settings
+    from app.services import export_service
+    
+    token = await get_auth_token(client)
+    limits = []
+    
+    async def export_sweets(query, format="ndjson", max_time_ms=None):
+        limits.append(max_time_ms)
+        yield b""
+    
+    monkeypatch.setattr(export_service, "export_sweets", export_sweets)
+    for match in ("contains", "prefix"):
+        response = await client.get(
+            f"/api/sweets/export?match={match}&name=bar",
+            headers={"Authorization": f"Bearer {token}"}
+        )
+        assert response.status_code == 200
+    
+    assert limits == [settings.search_contains_max_time_ms, None]
+
+
+@pytest.mark.asyncio
+async def test_sweet_indexes_are_created(test_db):
+    """Test the indexes declared on Sweet exist after initialization."""
+    from app.models.sweet import Sweet
+    
+    index_names = set(await Sweet.get_motor_collection().index_information())
+    
+    assert {
+        "name_lower_id", "category_lower_id_price", "price", "updated_at", "quantity", "sweet_text"
+    } <= index_names
+
+
+@pytest.mark.asyncio
+async def test_search_sweets_match_modes(client: AsyncClient):
+    """Test exact, prefix and contains name matching."""
+    token = await get_auth_token(client)
+    
+    for name in ["Chocolate Bar", "Dark Chocolate", "Chocolate"]:
+        await client.post(
+            "/api/sweets",
+            json={"name": name, "category": "Chocolate", "price": 2.99, "quantity": 50},
+            headers={"Authorization": f"Bearer {token}"}
+        )
+    
+    async def search(match: str) -> set:
+        response = await client.get(
+            f"/api/sweets/search?name=chocolate&match={match}",
+            headers={"Authorization": f"Bearer {token}"}
+        )
+        assert response.status_code == 200
+        return {sweet["name"] for sweet in response.json()}
+    
+    assert await search("exact") == {"Chocolate"}
+    assert await search("prefix") == {"Chocolate", "Chocolate Bar"}
+    assert await search("contains") == {"Chocolate", "Chocolate Bar", "Dark Chocolate"}
+
+
+@pytest.mark.asyncio
+async def test_search_sweets_escapes_regex_input(client: AsyncClient):
+    """Test regex metacharacters in search input are matched literally."""
+    token = await get_auth_token(client)
+    
+    await client.post(
+        "/api/sweets",
+        json={"name": "Candy (Mixed)", "category": "Candy", "price": 1.99, "quantity": 50},
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    await client.post(
+        "/api/sweets",
+        json={"name": "Candy Cane", "category": "Candy", "price": 1.99, "quantity": 50},
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    
+    response = await client.get(
+        "/api/sweets/search",
+        params={"name": "Candy (", "match": "contains"},
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    assert response.status_code == 200
+    assert [sweet["name"] for sweet in response.json()] == ["Candy (Mixed)"]
+    
+    response = await client.get(
+        "/api/sweets/search",
+        params={"name": ".*"},
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    assert response.status_code == 200
+    assert response.json() == []
+
+
+@pytest.mark.asyncio
+async def test_search_sweets_full_text_ranked(client: AsyncClient):
+    """Test full-text search ranks name matches first and honours price filters."""
+    token = await get_auth_token(client)
+    
+    await client.post(
+        "/api/sweets",
+        json={"name": "Dark Chocolate Bar", "category": "Chocolate", "price": 3.99, "quantity": 50},
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    await client.post(
+        "/api/sweets",
+        json={
+            "name": "Truffle Box", "category": "Chocolate", "price": 9.99, "quantity": 10,
+            "description": "Assorted dark truffles"
+        },
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    await client.post(
+        "/api/sweets",
+        json={"name": "Gummy Bears", "category": "Candy", "price": 1.99, "quantity": 30},
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    
+    response = await client.get(
+        "/api/sweets/search?q=dark bar",
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert [sweet["name"] for sweet in data] == ["Dark Chocolate Bar", "Truffle Box"]
+    assert data[0]["score"] > data[1]["score"]
+    
+    # Ranked results page like the list
+    response = await client.get(
+        "/api/sweets/search?q=dark bar&limit=1",
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    assert [sweet["name"] for sweet in response.json()] == ["Dark Chocolate Bar"]
+    response = await client.get(
+        "/api/sweets/search",
+        params={"q": "dark bar", "limit": 1, "cursor": response.headers["X-Next-Cursor"]},
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    assert [sweet["name"] for sweet in response.json()] == ["Truffle Box"]
+    assert "X-Next-Cursor" not in response.headers
+    
+    response = await client.get(
+        "/api/sweets/search?q=dark&max_price=5",
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    assert [sweet["name"] for sweet in response.json()] == ["Dark Chocolate Bar"]
+
+
+@pytest.mark.asyncio
+async def test_get_sweet_by_id(client: AsyncClient):
+    """Test getting a single sweet."""
+    token = await get_auth_token(client)
+    
+    create_response = await client.post(
+        "/api/sweets",
+        json={"name": "Candy", "category": "Candy", "price": 1.99, "quantity": 50},
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    sweet_id = create_response.json()["id"]
+    
+    response = await client.get(
+        f"/api/sweets/{sweet_id}",
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    
+    assert response.status_code == 200
+    assert response.json()["name"] == "Candy"
+
+
+@pytest.mark.asyncio
+async def test_sparse_fieldsets(client: AsyncClient):
+    """Test fields= limits the returned fields on list, search and get."""
+    token = await get_auth_token(client)
+    
+    create_response = await client.post(
+        "/api/sweets",
+        json={
+            "name": "Candy", "category": "Candy", "price": 1.99, "quantity": 50,
+            "description": "Long description"
+        },
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    sweet_id = create_response.json()["id"]
+    
+    for url in ["/api/sweets", "/api/sweets/search?name=candy"]:
+        response = await client.get(
+            f"{url}{'&' if '?' in url else '?'}fields=name,price,quantity",
+            headers={"Authorization": f"Bearer {token}"}
+        )
+        assert response.status_code == 200
+        assert response.json() == [{"id": sweet_id, "name": "Candy", "price": 1.99, "quantity": 50}]
+    
+    response = await client.get(
+        f"/api/sweets/{sweet_id}?fields=name",
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    assert response.json() == {"id": sweet_id, "name": "Candy"}
+    
+    response = await client.get(
+        "/api/sweets?fields=name,password",
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_list_and_search_match_single_sweet_representation(client: AsyncClient):
+    """Test list and search (raw read path) return the same shape as a single get."""
+    token = await get_auth_token(client)
+    
+    create_response = await client.post(
+        "/api/sweets",
+        json={"name": "Fudge", "category": "Candy", "price": 3.5, "quantity": 12},
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    sweet = create_response.json()
+    
+    single = await client.get(
+        f"/api/sweets/{sweet['id']}",
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    for url in ["/api/sweets", "/api/sweets/search?name=fudge"]:
+        response = await client.get(url, headers={"Authorization": f"Bearer {token}"})
+        assert response.status_code == 200
+        assert response.json() == [single.json()]
+        assert "name_lower" not in response.json()[0]
+
+
+@pytest.mark.asyncio
+async def test_search_results_cached_until_catalog_changes(client: AsyncClient):
+    """Test repeated searches hit the cache and writes invalidate it."""
+    from app.services.catalog_service import search_cache
+    
+    token = await get_auth_token(client)
+    headers = {"Authorization": f"Bearer {token}"}
+    
+    create_response = await client.post(
+        "/api/sweets",
+        json={"name": "Toffee", "category": "Candy", "price": 1.5, "quantity": 10},
+        headers=headers
+    )
+    sweet_id = create_response.json()["id"]
+    
+    await client.get("/api/sweets/search?category=CANDY", headers=headers)
+    hits = search_cache.stats()["hits"]
+    # Equivalent after normalization, so served from the cache
+    response = await client.get("/api/sweets/search?category=%20candy", headers=headers)
+    assert search_cache.stats()["hits"] == hits + 1
+    assert response.json()[0]["quantity"] == 10
+    
+    await client.post(f"/api/sweets/{sweet_id}/purchase", json={"quantity": 4}, headers=headers)
+    response = await client.get("/api/sweets/search?category=candy", headers=headers)
+    assert response.json()[0]["quantity"] == 6
+
+
+@pytest.mark.asyncio
+async def test_list_and_search_conditional_get(client: AsyncClient):
+    """Test list and search answer If-None-Match with 304 until the catalog changes."""
+    token = await get_auth_token(client)
+    headers = {"Authorization": f"Bearer {token}"}
+    
+    create_response = await client.post(
+        "/api/sweets",
+        json={"name": "Nougat", "category": "Candy", "price": 2.0, "quantity": 10},
+        headers=headers
+    )
+    sweet_id = create_response.json()["id"]
+    
+    for url in ["/api/sweets", "/api/sweets/search?category=candy"]:
+        response = await client.get(url, headers=headers)
+        etag = response.headers["ETag"]
+        assert response.headers["Cache-Control"] == "private, no-cache"
+        
+        response = await client.get(url, headers={**headers, "If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["ETag"] == etag
+    
+    await client.post(f"/api/sweets/{sweet_id}/purchase", json={"quantity": 1}, headers=headers)
+    
+    response = await client.get("/api/sweets", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert response.json()[0]["quantity"] == 9
+
+
+@pytest.mark.asyncio
+async def test_catalog_etag_expires_after_lost_version_bump(client: AsyncClient, monkeypatch):
+    """Test a write whose version bump was lost stops matching old ETags once they age out."""
+    import time
+    from app.config.database import settings
+    from app.models.sweet import Sweet
+    from app.services.catalog_service import catalog_version
+    
+    token = await get_auth_token(client)
+    headers = {"Authorization": f"Bearer {token}"}
+    await client.post(
+        "/api/sweets",
+        json={"name": "Nougat", "category": "Candy", "price": 2.0, "quantity": 10},
+        headers=headers
+    )
+    response = await client.get("/api/sweets", headers=headers)
+    etag = response.headers["ETag"]
+    reads = catalog_version.stats()["reads"]
+    
+    # Another worker wrote and crashed before flushing its bump
+    await Sweet.find_one(Sweet.name == "Nougat").update({"$set": {"quantity": 3}})
+    response = await client.get("/api/sweets", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 304
+    # Served from the cached version, without reading it again
+    assert catalog_version.stats()["reads"] == reads
+    
+    later = time.time() + settings.catalog_version_max_age_seconds
+    monkeypatch.setattr(time, "time", lambda: later)
+    response = await client.get("/api/sweets", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()[0]["quantity"] == 3
+
+
+@pytest.mark.asyncio
+async def test_get_sweet_conditional_get(client: AsyncClient):
+    """Test a single sweet's ETag is its version, usable for 304s and If-Match."""
+    token = await get_auth_token(client)
+    headers = {"Authorization": f"Bearer {token}"}
+    
+    create_response = await client.post(
+        "/api/sweets",
+        json={"name": "Brittle", "category": "Candy", "price": 2.0, "quantity": 10},
+        headers=headers
+    )
+    sweet_id = create_response.json()["id"]
+    
+    response = await client.get(f"/api/sweets/{sweet_id}", headers=headers)
+    etag = response.headers["ETag"]
+    assert etag == '"0"'
+    
+    response = await client.get(f"/api/sweets/{sweet_id}", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 304
+    
+    response = await client.put(
+        f"/api/sweets/{sweet_id}",
+        json={"price": 2.5},
+        headers={**headers, "If-Match": etag}
+    )
+    assert response.status_code == 200
+    
+    response = await client.get(
+        f"/api/sweets/{sweet_id}?fields=price",
+        headers={**headers, "If-None-Match": etag}
+    )
+    assert response.status_code == 200
+    assert response.headers["ETag"] == '"1"'
+    assert response.json() == {"id": sweet_id, "price": 2.5}
+
+
+@pytest.mark.asyncio
+async def test_get_all_sweets_served_from_compressed_snapshot(client: AsyncClient):
+    """Test the default list page is served from a snapshot per Accept-Encoding."""
+    from app.services.snapshot_service import catalog_snapshot
+    
+    token = await get_auth_token(client)
+    headers = {"Authorization": f"Bearer {token}"}
+    
+    create_response = await client.post(
+        "/api/sweets",
+        json={"name": "Praline", "category": "Chocolate", "price": 4.0, "quantity": 8},
+        headers=headers
+    )
+    sweet_id = create_response.json()["id"]
+    builds = catalog_snapshot.stats()["builds"]
+    
+    gzip_response = await client.get("/api/sweets", headers={**headers, "Accept-Encoding": "gzip"})
+    assert gzip_response.headers["Content-Encoding"] == "gzip"
+    assert gzip_response.headers["Vary"] == "Accept-Encoding"
+    
+    plain_response = await client.get("/api/sweets", headers={**headers, "Accept-Encoding": "identity"})
+    assert "Content-Encoding" not in plain_response.headers
+    assert plain_response.json() == gzip_response.json()
+    assert plain_response.headers["ETag"] != gzip_response.headers["ETag"]
+    assert plain_response.headers["X-Total-Count"] == "1"
+    assert catalog_snapshot.stats()["builds"] == builds + 1
+    
+    # A write makes the next request rebuild the snapshot
+    await client.post(f"/api/sweets/{sweet_id}/purchase", json={"quantity": 3}, headers=headers)
+    response = await client.get("/api/sweets", headers=headers)
+    assert response.json()[0]["quantity"] == 5
+    assert catalog_snapshot.stats()["builds"] == builds + 2
+
+
+@pytest.mark.asyncio
+async def test_purchase_publishes_stock_delta(client: AsyncClient):
+    """Test sweet writes are pushed to feed subscribers as SSE frames."""
+    from app.services.feed_service import inventory_feed, sse_events
+    
+    token = await get_auth_token(client)
+    headers = {"Authorization": f"Bearer {token}"}
+    
+    create_response = await client.post(
+        "/api/sweets",
+        json={"name": "Marzipan", "category": "Candy", "price": 2.0, "quantity": 10},
+        headers=headers
+    )
+    sweet_id = create_response.json()["id"]
+    
+    subscribers = inventory_feed.stats()["subscribers"]
+    events = sse_events(inventory_feed, heartbeat_seconds=1)
+    await events.__anext__()
+    try:
+        await client.post(f"/api/sweets/{sweet_id}/purchase", json={"quantity": 4}, headers=headers)
+        frame = await events.__anext__()
+    finally:
+        await events.aclose()
+    
+    assert frame.startswith(b"event: delta\ndata: ")
+    assert b'"op":"stock"' in frame
+    assert b'"quantity":6' in frame
+    assert inventory_feed.stats()["subscribers"] == subscribers
+
+
+@pytest.mark.asyncio
+async def test_purchase_coalescing_allocates_in_arrival_order(client: AsyncClient, monkeypatch):
+    """Test coalesced purchases are applied in one write, first come first served."""
+    import asyncio
+    from app.services.purchase_coalescer import purchase_coalescer
+    
+    monkeypatch.setattr(purchase_coalescer, "window", 0.05)
+    token = await get_auth_token(client)
+    headers = {"Authorization": f"Bearer {token}"}
+    
+    create_response = await client.post(
+        "/api/sweets",
+        json={"name": "Flash Sale Fudge", "category": "Candy", "price": 1.0, "quantity": 10},
+        headers=headers
+    )
+    sweet_id = create_response.json()["id"]
+    batches = purchase_coalescer.stats()["batches"]
+    
+    responses = await asyncio.gather(*[
+        client.post(f"/api/sweets/{sweet_id}/purchase", json={"quantity": quantity}, headers=headers)
+        for quantity in [4, 8, 2, 3]
+    ])
+    
+    # 4 fits (6 left) and 8 does not; 2 and 3 would fit but queue behind 8
+    assert [response.status_code for response in responses] == [200, 400, 409, 409]
+    assert purchase_coalescer.stats()["batches"] == batches + 1
+    assert responses[0].json()["quantity"] == 6
+    assert "Available: 6" in responses[1].json()["detail"]
+    
+    sweet = await client.get(f"/api/sweets/{sweet_id}", headers=headers)
+    assert sweet.json()["quantity"] == 6
+    assert sweet.json()["version"] == 1
+
+
+@pytest.mark.asyncio
+async def test_purchase_idempotency_key_replays_response(client: AsyncClient):
+    """Test a retried purchase with the same Idempotency-Key is not applied twice."""
+    import asyncio
+    
+    token = await get_auth_token(client)
+    headers = {"Authorization": f"Bearer {token}"}
+    
+    create_response = await client.post(
+        "/api/sweets",
+        json={"name": "Caramel", "category": "Candy", "price": 1.0, "quantity": 10},
+        headers=headers
+    )
+    sweet_id = create_response.json()["id"]
+    retry_headers = {**headers, "Idempotency-Key": "order-1"}
+    
+    # A concurrent duplicate waits for the original instead of racing it
+    first, duplicate = await asyncio.gather(*[
+        client.post(f"/api/sweets/{sweet_id}/purchase", json={"quantity": 3}, headers=retry_headers)
+        for _ in range(2)
+    ])
+    replay = await client.post(f"/api/sweets/{sweet_id}/purchase", json={"quantity": 3}, headers=retry_headers)
+    
+    assert first.status_code == duplicate.status_code == replay.status_code == 200
+    assert first.json() == duplicate.json() == replay.json()
+    assert replay.headers["Idempotent-Replayed"] == "true"
+    
+    sweet = await client.get(f"/api/sweets/{sweet_id}", headers=headers)
+    assert sweet.json()["quantity"] == 7
+    assert sweet.json()["version"] == 1
+    
+    # The same key cannot be reused for a different purchase
+    response = await client.post(f"/api/sweets/{sweet_id}/purchase", json={"quantity": 5}, headers=retry_headers)
+    assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_restock_idempotency_key_replays_errors(client: AsyncClient):
+    """Test client errors are stored and replayed for the same Idempotency-Key."""
+    token = await get_auth_token(client, "admin@example.com", is_admin=True)
+    headers = {"Authorization": f"Bearer {token}", "Idempotency-Key": "restock-1"}
+    
+    missing_id = "507f1f77bcf86cd799439011"
+    first = await client.post(f"/api/sweets/{missing_id}/restock", json={"quantity": 5}, headers=headers)
+    replay = await client.post(f"/api/sweets/{missing_id}/restock", json={"quantity": 5}, headers=headers)
+    
+    assert first.status_code == replay.status_code == 404
+    assert first.json() == replay.json() == {"detail": "Sweet not found"}
+    assert replay.headers["Idempotent-Replayed"] == "true"
+
+
+@pytest.mark.asyncio
+async def test_purchase_idempotency_key_released_after_conflict(client: AsyncClient, monkeypatch):
+    """Test a retryable 409 is not replayed, so the client's retry can succeed."""
+    from fastapi import HTTPException
+    from app.services import sweets_service
+    
+    token = await get_auth_token(client)
+    headers = {"Authorization": f"Bearer {token}"}
+    
+    create_response = await client.post(
+        "/api/sweets",
+        json={"name": "Caramel", "category": "Candy", "price": 1.0, "quantity": 10},
+        headers=headers
+    )
+    sweet_id = create_response.json()["id"]
+    headers["Idempotency-Key"] = "order-2"
+    
+    purchase_sweet = sweets_service.purchase_sweet
+    calls = 0
+    
+    async def contended_once(sweet_id, quantity):
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            raise HTTPException(status_code=409, detail="Inventory changed during checkout, please retry")
+        return await purchase_sweet(sweet_id, quantity)
+    
+    monkeypatch.setattr(sweets_service, "purchase_sweet", contended_once)
+    
+    first = await client.post(f"/api/sweets/{sweet_id}/purchase", json={"quantity": 3}, headers=headers)
+    retry = await client.post(f"/api/sweets/{sweet_id}/purchase", json={"quantity": 3}, headers=headers)
+    
+    assert first.status_code == 409
+    assert retry.status_code == 200
+    assert "Idempotent-Replayed" not in retry.headers
+    assert retry.json()["quantity"] == 7
+
+
+@pytest.mark.asyncio
+async def test_inventory_analytics_follow_writes(client: AsyncClient):
+    """Test the analytics rollups are kept current by every write path."""
+    token = await get_auth_token(client, "admin@example.com", is_admin=True)
+    headers = {"Authorization": f"Bearer {token}"}
+    
+    sweet_ids = []
+    for name, category, price, quantity in [
+        ("Truffle", "Chocolate", 2.0, 20),
+        ("Bonbon", "Chocolate", 1.5, 5),
+        ("Lolly", "Candy", 0.5, 0),
+    ]:
+        response = await client.post(
+            "/api/sweets",
+            json={"name": name, "category": category, "price": price, "quantity": quantity},
+            headers=headers
+        )
+        sweet_ids.append(response.json()["id"])
+    
+    await client.post(f"/api/sweets/{sweet_ids[0]}/purchase", json={"quantity": 12}, headers=headers)
+    await client.post(f"/api/sweets/{sweet_ids[2]}/restock", json={"quantity": 30}, headers=headers)
+    await client.put(f"/api/sweets/{sweet_ids[1]}", json={"category": "Candy", "price": 2.0}, headers=headers)
+    await client.delete(f"/api/sweets/{sweet_ids[0]}", headers=headers)
+    
+    response = await client.get("/api/admin/analytics", headers=headers)
+    assert response.status_code == 200
+    analytics = response.json()
+    assert analytics["total_sweets"] == 2
+    assert analytics["total_units"] == 35
+    assert analytics["total_value"] == 25.0
+    assert analytics["low_stock"] == 1
+    assert analytics["out_of_stock"] == 0
+    assert analytics["categories"] == [
+        {"category": "Candy", "sweets": 2, "units": 35, "value": 25.0, "low_stock": 1, "out_of_stock": 0}
+    ]
+
+
+@pytest.mark.asyncio
+async def test_inventory_analytics_reconciler_corrects_drift(client: AsyncClient, test_db, monkeypatch):
+    """Test the reconciler restores rollups changed behind the service's back."""
+    from app.config.database import settings
+    from app.services import analytics_service
+    
+    monkeypatch.setattr(settings, "analytics_reconcile_settle_ms", 10)
+    token = await get_auth_token(client, "admin@example.com", is_admin=True)
+    headers = {"Authorization": f"Bearer {token}"}
+    
+    await client.post(
+        "/api/sweets",
+        json={"name": "Gobstopper", "category": "Candy", "price": 1.0, "quantity": 4},
+        headers=headers
+    )
+    expected = (await client.get("/api/admin/analytics", headers=headers)).json()
+    
+    await test_db["inventory_rollups"].update_one({"_id": "candy"}, {"$inc": {"units": 100, "value": 3.3}})
+    await test_db["inventory_rollups"].insert_one({"_id": "ghost", "category": "Ghost", "sweets": 1, "units": 1})
+    
+    assert await analytics_service.reconcile() == 2
+    assert (await client.get("/api/admin/analytics", headers=headers)).json() == expected
+    assert await analytics_service.reconcile() == 0
+
+
+@pytest.mark.asyncio
+async def test_inventory_analytics_reconciles_one_run_at_a_time(client: AsyncClient, test_db, monkeypatch):
+    """Test concurrent reconciliations do not apply the same correction twice."""
+    import asyncio
+    from datetime import datetime, timedelta
+    from app.config.database import settings
+    from app.services import analytics_service
+    
+    monkeypatch.setattr(settings, "analytics_reconcile_settle_ms", 10)
+    token = await get_auth_token(client, "admin@example.com", is_admin=True)
+    headers = {"Authorization": f"Bearer {token}"}
+    
+    await client.post(
+        "/api/sweets",
+        json={"name": "Gobstopper", "category": "Candy", "price": 1.0, "quantity": 4},
+        headers=headers
+    )
+    expected = (await client.get("/api/admin/analytics", headers=headers)).json()
+    
+    await test_db["inventory_rollups"].update_one({"_id": "candy"}, {"$inc": {"units": 100}})
+    results = await asyncio.gather(analytics_service.reconcile(), analytics_service.reconcile())
+    assert sorted(results) == [0, 1]
+    assert (await client.get("/api/admin/analytics", headers=headers)).json() == expected
+    
+    # A run elsewhere holds the lease: the periodic reconciler skips its turn
+    await test_db["inventory_rollup_lease"].insert_one(
+        {"_id": "reconcile", "owner": "other", "expires_at": datetime.utcnow() + timedelta(minutes=1)}
+    )
+    assert await analytics_service.reconcile(wait=False) is None
+
+
+@pytest.mark.asyncio
+async def test_inventory_analytics_reconciler_skips_changing_categories(client: AsyncClient, test_db, monkeypatch):
+    """Test a change another worker flushes during reconciliation is not counted twice."""
+    import asyncio
+    from app.config.database import settings
+    from app.services import analytics_service
+    
+    monkeypatch.setattr(settings, "analytics_reconcile_settle_ms", 200)
+    token = await get_auth_token(client, "admin@example.com", is_admin=True)
+    headers = {"Authorization": f"Bearer {token}"}
+    
+    await client.post(
+        "/api/sweets",
+        json={"name": "Gobstopper", "category": "Candy", "price": 1.0, "quantity": 4},
+        headers=headers
+    )
+    await analytics_service.rollup_buffer.sync()
+    
+    # Another worker restocked, and flushes its rollup change while the
+    # reconciliation is running
+    await test_db["sweets"].update_one({"name": "Gobstopper"}, {"$inc": {"quantity": 6}})
+    
+    async def flush_elsewhere():
+        await asyncio.sleep(0.05)
+        await test_db["inventory_rollups"].update_one(
+            {"_id": "candy"}, {"$inc": {"units": 6, "value": 6.0, "low_stock": 0, "rev": 1}}
+        )
+    
+    corrected, _ = await asyncio.gather(analytics_service.reconcile(), flush_elsewhere())
+    assert corrected == 0
+    analytics = (await client.get("/api/admin/analytics", headers=headers)).json()
+    assert analytics["total_units"] == 10
+    assert analytics["total_value"] == 10.0
+
+
+@pytest.mark.asyncio
+async def test_inventory_analytics_concurrent_deletes_count_once(client: AsyncClient):
+    """Test a delete that loses the race to another one leaves the rollups alone."""
+    import asyncio
+    
+    token = await get_auth_token(client, "admin@example.com", is_admin=True)
+    headers = {"Authorization": f"Bearer {token}"}
+    
+    for name in ("Gobstopper", "Toffee"):
+        response = await client.post(
+            "/api/sweets",
+            json={"name": name, "category": "Candy", "price": 1.0, "quantity": 4},
+            headers=headers
+        )
+    sweet_id = response.json()["id"]
+    
+    responses = await asyncio.gather(*(
+        client.delete(f"/api/sweets/{sweet_id}", headers=headers) for _ in range(2)
+    ))
+    assert sorted(response.status_code for response in responses) == [200, 404]
+    
+    analytics = (await client.get("/api/admin/analytics", headers=headers)).json()
+    assert analytics["total_sweets"] == 1
+    assert analytics["total_units"] == 4
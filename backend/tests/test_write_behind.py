@@ -0,0 +1,66 @@
+"""
+Tests for write-behind batching.
+"""
+import asyncio
+import pytest
+from app.utils.write_behind import WriteBehind
+
+
+@pytest.mark.asyncio
+async def test_write_behind_batches_changes_into_one_flush():
+    """Test changes recorded within the delay are written together."""
+    written = []
+    pending = []
+    
+    async def flush():
+        written.append(list(pending))
+        pending.clear()
+    
+    writer = WriteBehind(delay=0.01, flush=flush, name="test")
+    for change in range(5):
+        pending.append(change)
+        writer.mark()
+    assert written == []
+    
+    await asyncio.sleep(0.05)
+    assert written == [[0, 1, 2, 3, 4]]
+    assert writer.stats() == {"pending": 0, "flushes": 1, "failures": 0}
+
+
+@pytest.mark.asyncio
+async def test_write_behind_sync_flushes_without_waiting():
+    """Test sync writes pending changes right away."""
+    written = []
+    
+    async def flush():
+        written.append(True)
+    
+    writer = WriteBehind(delay=60, flush=flush, name="test")
+    writer.mark()
+    await asyncio.wait_for(writer.sync(), 1)
+    assert written == [True]
+    
+    # Nothing left to write
+    await writer.sync()
+    assert written == [True]
+
+
+@pytest.mark.asyncio
+async def test_write_behind_retries_failed_flush():
+    """Test a failed flush is reported to sync and retried."""
+    attempts = 0
+    
+    async def flush():
+        nonlocal attempts
+        attempts += 1
+        if attempts == 1:
+            raise ConnectionError("database unavailable")
+    
+    writer = WriteBehind(delay=0.01, flush=flush, name="test")
+    writer.mark()
+    with pytest.raises(ConnectionError):
+        await writer.sync()
+    
+    await writer.sync()
+    assert attempts == 2
+    assert writer.stats() == {"pending": 0, "flushes": 1, "failures": 1}